@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Anonimização em lote de arquivos DICOM / .img (conjuntos WL, conversões)
+
+Regras por perfil (remover, substituir ou hash de cada tag) e remapeamento
+de UIDs consistente em toda a sessão. Apenas o header é reescrito: os dados
+de pixel são copiados como bytes brutos do arquivo original, sem decodificar.
+O progresso é gravado em um log JSONL em uma pasta de estado separada da
+saída, permitindo retomar uma anonimização interrompida.
+"""
+
+import pydicom
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import generate_uid, UID
+from pydicom.datadict import keyword_for_tag, tag_for_keyword
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dicom_memmap import locate_pixel_data
+from fix_dicom_header import source_transfer_syntax
+import argparse
+import hashlib
+import json
+import secrets
+import shutil
+import time
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+# Perfil padrão (pode ser substituído por um JSON com as mesmas chaves)
+DEFAULT_PROFILE = {
+    "description": "Remove identificação do paciente, mantém dados de geometria e tratamento",
+    "remove": [
+        "PatientBirthDate", "PatientBirthTime", "PatientAddress", "PatientTelephoneNumbers",
+        "OtherPatientIDs", "OtherPatientNames", "PatientMotherBirthName", "MilitaryRank",
+        "EthnicGroup", "PatientComments", "ReferringPhysicianName", "PerformingPhysicianName",
+        "OperatorsName", "PhysiciansOfRecord", "InstitutionAddress", "AccessionNumber",
+    ],
+    "replace": {
+        "PatientName": "ANONIMO",
+        "PatientSex": "O",
+        "InstitutionName": "ANONIMO",
+    },
+    "hash": ["PatientID"],
+    "remove_private": False,
+    "remap_uids": True,
+}
+
+# UIDs que identificam classes/sintaxes (não identificam a instância) e não são remapeados
+PRESERVED_UID_KEYWORDS = {
+    "SOPClassUID", "MediaStorageSOPClassUID", "TransferSyntaxUID",
+    "ImplementationClassUID", "ReferencedSOPClassUID",
+}
+
+PROGRESS_FILE = "anonimizacao_progresso.jsonl"
+SESSION_FILE = "anonimizacao_sessao.json"
+
+# Sal e log (UID original → novo) nunca ficam na pasta de saída enviada ao
+# fornecedor: com o sal, os hashes de PatientID podem ser revertidos por força bruta
+STATE_ROOT = os.path.join(os.path.expanduser("~"), ".conversor_dicom", "anonimizacao")
+COPY_BUFFER_SIZE = 1024 * 1024
+HASH_LENGTH = 16
+
+
+def load_profile(path=None):
+    """Carregar perfil de anonimização (JSON) ou o perfil padrão"""
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile.update(json.load(f))
+
+    for keyword in list(profile["remove"]) + list(profile["replace"]) + list(profile["hash"]):
+        if tag_for_keyword(keyword) is None:
+            raise ValueError(f"Tag desconhecida no perfil: {keyword}")
+    return profile
+
+
+def hash_value(value, salt):
+    """Hash determinístico (por sessão) de um valor de tag"""
+    digest = hashlib.sha256(f"{salt}:{value}".encode('utf-8')).hexdigest()
+    return digest[:HASH_LENGTH].upper()
+
+
+def remap_uid(uid, salt):
+    """Novo UID determinístico: o mesmo UID original gera sempre o mesmo UID na sessão"""
+    return generate_uid(entropy_srcs=[salt, str(uid)])
+
+
+def _is_instance_uid(elem):
+    """UID que identifica estudo/série/instância (e não uma classe ou sintaxe padrão)"""
+    if elem.VR != 'UI' or not elem.value:
+        return False
+    if keyword_for_tag(elem.tag) in PRESERVED_UID_KEYWORDS:
+        return False
+    values = elem.value if elem.VM > 1 else [elem.value]
+    return not any(UID(str(v)).name != str(v) for v in values)
+
+
+def anonymize_dataset(ds, profile, salt):
+    """Aplicar as regras do perfil ao dataset (in-place), inclusive em sequências"""
+    for keyword in profile["remove"]:
+        if keyword in ds:
+            delattr(ds, keyword)
+
+    for keyword, value in profile["replace"].items():
+        if keyword in ds:
+            setattr(ds, keyword, value)
+
+    for keyword in profile["hash"]:
+        if keyword in ds and ds.data_element(keyword).value not in (None, ''):
+            setattr(ds, keyword, hash_value(ds.data_element(keyword).value, salt))
+
+    if profile.get("remove_private"):
+        ds.remove_private_tags()
+
+    for elem in ds:
+        if elem.VR == 'SQ':
+            for item in elem.value:
+                anonymize_dataset(item, profile, salt)
+        elif profile.get("remap_uids") and _is_instance_uid(elem):
+            if elem.VM > 1:
+                elem.value = [remap_uid(v, salt) for v in elem.value]
+            else:
+                elem.value = remap_uid(elem.value, salt)
+
+    return ds
+
+
+def anonymize_file(input_path, output_path, profile, salt):
+    """
+    Anonimizar um arquivo: reescreve o header e copia os dados de pixel
+    (e o que vier depois deles) como bytes brutos do arquivo original.
+
+    Retorna (SOPInstanceUID original, SOPInstanceUID novo).
+    """
+    info = locate_pixel_data(input_path)
+    if info is None:
+        ds = pydicom.dcmread(input_path, force=True)
+        tail_offset = None
+    else:
+        ds = info['dataset']
+        tail_offset = info['tag_offset']
+
+    original_uid = str(getattr(ds, 'SOPInstanceUID', ''))
+
+    # O header precisa ser gravado na mesma codificação dos bytes de pixel copiados
+    if not getattr(ds, 'file_meta', None):
+        ds.file_meta = FileMetaDataset()
+    if 'TransferSyntaxUID' not in ds.file_meta:
+        ds.file_meta.TransferSyntaxUID = source_transfer_syntax(ds)
+
+    anonymize_dataset(ds, profile, salt)
+
+    if 'SOPClassUID' in ds:
+        ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    if 'SOPInstanceUID' in ds:
+        ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'wb') as out:
+        pydicom.dcmwrite(out, ds, write_like_original=False)
+        if tail_offset is not None:
+            with open(input_path, 'rb') as src:
+                src.seek(tail_offset)
+                shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+
+    return original_uid, str(getattr(ds, 'SOPInstanceUID', ''))
+
+
+def _anonymize_worker(job):
+    """Worker do pool: anonimizar um arquivo e medir tempo/tamanho"""
+    input_path, output_path, relative, profile, salt = job
+    start_time = time.perf_counter()
+    try:
+        original_uid, new_uid = anonymize_file(input_path, output_path, profile, salt)
+        return {
+            'arquivo': relative,
+            'status': 'ok',
+            'uid_original': original_uid,
+            'uid_novo': new_uid,
+            'bytes': os.path.getsize(input_path),
+            'segundos': round(time.perf_counter() - start_time, 4),
+        }
+    except Exception as e:
+        return {
+            'arquivo': relative,
+            'status': 'erro',
+            'erro': str(e),
+            'bytes': 0,
+            'segundos': round(time.perf_counter() - start_time, 4),
+        }
+
+
+def find_input_files(input_dir, extensions):
+    """Listar arquivos com as extensões indicadas na pasta e subpastas"""
+    found = []
+    for root, _, names in os.walk(input_dir):
+        for name in names:
+            if name.lower().endswith(extensions):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def default_state_dir(output_dir):
+    """Pasta de estado padrão de uma pasta de saída (fora da árvore de saída)"""
+    key = hashlib.sha1(os.path.abspath(output_dir).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(STATE_ROOT, key)
+
+
+def resolve_state_dir(output_dir, state_dir=None):
+    """Validar a pasta de estado e mover para ela o estado antigo deixado na saída"""
+    state_dir = os.path.abspath(state_dir or default_state_dir(output_dir))
+    output_dir = os.path.abspath(output_dir)
+    try:
+        inside = os.path.commonpath([state_dir, output_dir]) == output_dir
+    except ValueError:
+        inside = False   # unidades diferentes (Windows)
+    if inside:
+        raise ValueError("A pasta de estado (sal e log de UIDs) não pode ficar dentro da pasta de saída")
+
+    os.makedirs(state_dir, exist_ok=True)
+    for name in (SESSION_FILE, PROGRESS_FILE):
+        legacy = os.path.join(output_dir, name)
+        if os.path.exists(legacy) and not os.path.exists(os.path.join(state_dir, name)):
+            shutil.move(legacy, os.path.join(state_dir, name))
+            print(f"  {name} movido da pasta de saída para {state_dir}")
+    return state_dir
+
+
+def load_session(state_dir, salt=None):
+    """Carregar (ou criar) a sessão: o sal garante UIDs/hashes consistentes ao retomar"""
+    session_path = os.path.join(state_dir, SESSION_FILE)
+    if os.path.exists(session_path):
+        with open(session_path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        if salt and salt != session['salt']:
+            raise ValueError("Sal diferente do usado na sessão existente nesta pasta de saída")
+        return session
+
+    session = {
+        'salt': salt or secrets.token_hex(16),
+        'criada_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    os.makedirs(state_dir, exist_ok=True)
+    with open(session_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, indent=2)
+    return session
+
+
+def load_completed(state_dir):
+    """Arquivos já anonimizados com sucesso (log de progresso)"""
+    completed = set()
+    progress_path = os.path.join(state_dir, PROGRESS_FILE)
+    if not os.path.exists(progress_path):
+        return completed
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # linha incompleta de uma execução interrompida
+            if record.get('status') == 'ok':
+                completed.add(record['arquivo'])
+    return completed
+
+
+def anonymize_folder(input_dir, output_dir, profile, salt=None, workers=None,
+                     extensions=('.dcm', '.img'), state_dir=None):
+    """
+    Anonimizar uma árvore de pastas em paralelo, retomando do log de progresso.
+    Sessão e log ficam em state_dir (padrão: default_state_dir(output_dir)).
+    """
+    state_dir = resolve_state_dir(output_dir, state_dir)
+    session = load_session(state_dir, salt)
+    completed = load_completed(state_dir)
+
+    files = find_input_files(input_dir, tuple(e.lower() for e in extensions))
+    jobs = []
+    for input_path in files:
+        relative = os.path.relpath(input_path, input_dir)
+        if relative in completed:
+            continue
+        output_path = os.path.join(output_dir, os.path.splitext(relative)[0] + '.dcm')
+        jobs.append((input_path, output_path, relative, profile, session['salt']))
+
+    print(f"\nArquivos encontrados: {len(files)} | já anonimizados: {len(files) - len(jobs)} | "
+          f"pendentes: {len(jobs)}")
+    if not jobs:
+        return []
+
+    start_time = time.perf_counter()
+    results = []
+    progress_path = os.path.join(state_dir, PROGRESS_FILE)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(progress_path, 'a', encoding='utf-8') as log, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_anonymize_worker, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            log.write(json.dumps(result, ensure_ascii=False) + "\n")
+            log.flush()
+
+            status = "✓" if result['status'] == 'ok' else f"✗ {result['erro']}"
+            print(f"  [{done}/{len(jobs)}] {result['arquivo']}: {status}")
+
+    elapsed = time.perf_counter() - start_time
+    ok = [r for r in results if r['status'] == 'ok']
+    total_mb = sum(r['bytes'] for r in ok) / (1024 * 1024)
+
+    print("\n" + "="*80)
+    print(f"Anonimizados: {len(ok)}/{len(results)} | Erros: {len(results) - len(ok)}")
+    if elapsed > 0:
+        print(f"Tempo: {elapsed:.2f} s — {len(ok) / elapsed:.1f} arquivos/s, {total_mb / elapsed:.1f} MB/s")
+    print(f"Log de progresso: {progress_path}")
+    print("="*80)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anonimização em lote de arquivos DICOM / .img")
+    parser.add_argument('entrada', help="Pasta com os arquivos originais")
+    parser.add_argument('saida', help="Pasta de saída (estrutura espelhada, apenas os arquivos anonimizados)")
+    parser.add_argument('--perfil', help="Perfil de anonimização (JSON com remove/replace/hash)")
+    parser.add_argument('--sal', help="Sal da sessão (padrão: gerado e salvo na pasta de estado)")
+    parser.add_argument('--estado',
+                        help="Pasta de estado com sal e log de progresso, fora da saída "
+                             f"(padrão: subpasta de {STATE_ROOT})")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs)")
+    parser.add_argument('--extensoes', nargs='+', default=['.dcm', '.img'],
+                        help="Extensões processadas (padrão: .dcm .img)")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("ANONIMIZAÇÃO DICOM EM LOTE")
+    print("="*80)
+
+    profile = load_profile(args.perfil)
+    print(f"Perfil: {profile['description']}")
+    anonymize_folder(args.entrada, args.saida, profile, args.sal, args.processos, args.extensoes, args.estado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de memória da conversão em lote TIFF → DICOM
+
+Gera um lote de TIFFs sintéticos e converte cada arquivo em um processo
+separado por modo, medindo o pico de memória (RSS) e o tempo:
+
+  original - caminho anterior do conversor: image.tiff_to_dicom() do
+             pylinac (FileImage) + save_as
+  uint16   - caminho atual: TiffFrameReader + frame_to_rt_image, pixels
+             mantidos em uint16 (float32 reescalado com RescaleSlope/Intercept)
+
+Uso:
+  python benchmark_memoria_lote.py --arquivos 500 --tamanho 1024
+  python benchmark_memoria_lote.py --tipo float32
+"""
+
+import numpy as np
+from PIL import Image
+import subprocess
+import argparse
+import tempfile
+import shutil
+import time
+import json
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+MODES = ("original", "uint16")
+SID = 1000.0
+DPI = 400.0
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo atual (MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 ** 2
+    except (ImportError, AttributeError):
+        return None
+
+
+def create_batch(folder, count, size, pixel_type):
+    """Gerar TIFFs sintéticos (campo quadrado com BB no centro)"""
+    rng = np.random.default_rng(0)
+    base = rng.normal(1000, 20, (size, size)).astype(np.float32)
+    half = size // 10
+    center = size // 2
+    base[center - half:center + half, center - half:center + half] += 20000
+    base[center - 4:center + 4, center - 4:center + 4] -= 8000
+
+    for index in range(count):
+        frame = base + index % 7
+        if pixel_type == "uint16":
+            image = Image.fromarray(np.clip(frame, 0, 65535).astype(np.uint16))
+        else:
+            image = Image.fromarray(frame, mode="F")
+        image.save(os.path.join(folder, f"img_{index:04d}.tif"), dpi=(DPI, DPI))
+
+
+def convert_original(path, output_path):
+    """Referência: caminho anterior do conversor (pylinac tiff_to_dicom + save_as)"""
+    from pylinac import image
+    ds = image.tiff_to_dicom(path, sid=SID, gantry=0, coll=0, couch=0, dpi=DPI)
+    ds.save_as(output_path, write_like_original=False)
+
+
+def convert_uint16(path, output_path):
+    """Caminho do conversor: TiffFrameReader + frame_to_rt_image (sem float64)"""
+    from conversor_dicom_unificado import TiffFrameReader, frame_to_rt_image, save_dataset
+    with TiffFrameReader(path) as reader:
+        frame = reader.frame(0)
+    ds = frame_to_rt_image(frame, sid=SID, gantry=0, coll=0, couch=0, dpi=DPI)
+    save_dataset(ds, output_path)
+
+
+def run_mode(mode, input_folder, output_folder):
+    """Converter o lote em um modo (executado em processo separado)"""
+    convert = convert_original if mode == "original" else convert_uint16
+    files = sorted(f for f in os.listdir(input_folder) if f.lower().endswith('.tif'))
+
+    # Importações fora da medição de tempo (mesmo custo nos dois modos)
+    from pylinac import image  # noqa: F401
+    import conversor_dicom_unificado  # noqa: F401
+    baseline = peak_rss_mb()
+
+    start_time = time.perf_counter()
+    for name in files:
+        convert(os.path.join(input_folder, name),
+                os.path.join(output_folder, os.path.splitext(name)[0] + ".dcm"))
+    elapsed = time.perf_counter() - start_time
+
+    print(json.dumps({
+        'modo': mode,
+        'arquivos': len(files),
+        'segundos': elapsed,
+        'rss_base_mb': baseline,
+        'rss_pico_mb': peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória da conversão em lote TIFF → DICOM")
+    parser.add_argument('--arquivos', type=int, default=500, help="Número de TIFFs do lote (padrão: 500)")
+    parser.add_argument('--tamanho', type=int, default=1024, help="Lado da imagem em pixels (padrão: 1024)")
+    parser.add_argument('--tipo', choices=("uint16", "float32"), default="uint16",
+                        help="Tipo de pixel dos TIFFs gerados (padrão: uint16)")
+    parser.add_argument('--pasta', help="Pasta de trabalho (padrão: temporária, removida ao final)")
+    parser.add_argument('--executar', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    work_folder = args.pasta or tempfile.mkdtemp(prefix="benchmark_lote_")
+    input_folder = os.path.join(work_folder, "tiff")
+
+    if args.executar:
+        output_folder = os.path.join(work_folder, f"dicom_{args.executar}")
+        os.makedirs(output_folder, exist_ok=True)
+        run_mode(args.executar, input_folder, output_folder)
+        return
+
+    print("="*80)
+    print("BENCHMARK DE MEMÓRIA - CONVERSÃO EM LOTE")
+    print("="*80)
+    print(f"Lote: {args.arquivos} TIFFs {args.tamanho}×{args.tamanho} ({args.tipo})")
+    print(f"Pasta de trabalho: {work_folder}")
+
+    try:
+        os.makedirs(input_folder, exist_ok=True)
+        create_batch(input_folder, args.arquivos, args.tamanho, args.tipo)
+
+        results = []
+        for mode in MODES:
+            print(f"\nConvertendo ({mode})...")
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--executar', mode, '--pasta', work_folder],
+                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            if completed.returncode != 0:
+                print(f"  ✗ Erro:\n{completed.stderr}")
+                continue
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        print("\n" + "="*80)
+        print(f"{'Modo':<10} {'Tempo (s)':>10} {'Arquivos/s':>11} {'RSS base (MB)':>14} {'RSS pico (MB)':>14} {'Acréscimo (MB)':>15}")
+        for result in results:
+            base = result['rss_base_mb']
+            peak = result['rss_pico_mb']
+            extra = f"{peak - base:.1f}" if base is not None and peak is not None else "-"
+            print(f"{result['modo']:<10} {result['segundos']:>10.2f} "
+                  f"{result['arquivos'] / result['segundos']:>11.1f} "
+                  f"{base if base is not None else float('nan'):>14.1f} "
+                  f"{peak if peak is not None else float('nan'):>14.1f} {extra:>15}")
+        print("="*80)
+    finally:
+        if not args.pasta:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,16 @@ Comparação detalhada: DICOM gerado de .img vs DICOM gerado de TIFF
 import pydicom
 import os
 import sys
+import time
+import numpy as np
+from dicom_memmap import open_dicom_memmap, roi_statistics
+
+try:
+    from scipy import fft as fft_backend     # suporta float32 e múltiplas threads
+    FFT_KWARGS = {'workers': -1}
+except ImportError:
+    fft_backend = np.fft
+    FFT_KWARGS = {}
 
 # Configurar codificação UTF-8
 if sys.platform == 'win32':
@@ -16,255 +26,544 @@ if sys.platform == 'win32':
     except:
         pass
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
+# Linhas processadas por bloco nas etapas de reamostragem e estatística
+CHUNK_ROWS = 512
 
-# Arquivos para comparar
-file_img = os.path.join(current_dir, "WL_fixed.dcm")        # De .img (nosso conversor)
-file_tiff = os.path.join(current_dir, "gantry_0.dcm")       # De TIFF (pylinac)
+# Alinhamento em duas etapas: correlação na imagem reduzida (fator) e
+# refinamento em resolução total numa janela central (lado em pixels)
+ALIGN_COARSE_FACTOR = 2
+ALIGN_REFINE_SIZE = 1024
 
-print("="*80)
-print("COMPARAÇÃO: DICOM GERADO DE .IMG vs DICOM GERADO DE TIFF")
-print("="*80)
 
-print(f"\nArquivo 1 (de .img): {os.path.basename(file_img)}")
-print(f"  Fonte: Elekta iView .img → Nosso conversor")
-print(f"  Tamanho: {os.path.getsize(file_img) / 1024:.1f} KB")
+def pixel_spacing_mm(ds):
+    """Pixel spacing (linha, coluna) em mm do header DICOM"""
+    spacing = getattr(ds, 'ImagePlanePixelSpacing', None) or getattr(ds, 'PixelSpacing', None)
+    if not spacing:
+        return 1.0, 1.0
+    return float(spacing[0]), float(spacing[1])
 
-print(f"\nArquivo 2 (de TIFF): {os.path.basename(file_tiff)}")
-print(f"  Fonte: TIFF → pylinac.image.tiff_to_dicom()")
-print(f"  Tamanho: {os.path.getsize(file_tiff) / 1024:.1f} KB")
 
-# Ler arquivos
-print("\nCarregando arquivos DICOM...")
-try:
-    ds_img = pydicom.dcmread(file_img)
-    print(f"✓ Arquivo .img→DICOM lido")
-except Exception as e:
-    print(f"✗ Erro ao ler {file_img}: {e}")
-    ds_img = None
+def load_pixels(path):
+    """Pixels do primeiro frame (memmap quando possível, senão pixel_array)"""
+    try:
+        pixels, _ = open_dicom_memmap(path)
+    except Exception:
+        pixels = pydicom.dcmread(path).pixel_array
+    if pixels.ndim == 3:
+        pixels = pixels[0]
+    return pixels
+
+
+def resample_to_spacing(array, spacing, target_spacing, chunk_rows=CHUNK_ROWS):
+    """Reamostrar (bilinear, vetorizado por blocos de linhas) para o pixel spacing alvo"""
+    rows, cols = array.shape
+    scale_r = target_spacing[0] / spacing[0]
+    scale_c = target_spacing[1] / spacing[1]
+    new_rows = max(int(round(rows / scale_r)), 1)
+    new_cols = max(int(round(cols / scale_c)), 1)
+
+    if new_rows == rows and new_cols == cols:
+        return np.asarray(array, dtype=np.float32)
+
+    src_r = np.clip((np.arange(new_rows, dtype=np.float32) + 0.5) * scale_r - 0.5, 0, rows - 1)
+    src_c = np.clip((np.arange(new_cols, dtype=np.float32) + 0.5) * scale_c - 0.5, 0, cols - 1)
+    r0 = np.floor(src_r).astype(np.intp)
+    c0 = np.floor(src_c).astype(np.intp)
+    r1 = np.minimum(r0 + 1, rows - 1)
+    c1 = np.minimum(c0 + 1, cols - 1)
+    wr = (src_r - r0)[:, None]
+    wc = (src_c - c0)[None, :]
+
+    output = np.empty((new_rows, new_cols), dtype=np.float32)
+    for start in range(0, new_rows, chunk_rows):
+        block = slice(start, start + chunk_rows)
+        top = np.asarray(array[r0[block]], dtype=np.float32)
+        bottom = np.asarray(array[r1[block]], dtype=np.float32)
+        top = top[:, c0] * (1 - wc) + top[:, c1] * wc
+        bottom = bottom[:, c0] * (1 - wc) + bottom[:, c1] * wc
+        output[block] = top * (1 - wr[block]) + bottom * wr[block]
+    return output
+
+
+def center_crop(array, shape):
+    """Recorte central (view) com o formato indicado"""
+    y0 = (array.shape[0] - shape[0]) // 2
+    x0 = (array.shape[1] - shape[1]) // 2
+    return array[y0:y0 + shape[0], x0:x0 + shape[1]]
+
+
+def _parabolic_offset(before, peak, after):
+    """Refinamento sub-pixel do pico por ajuste de parábola em 3 pontos"""
+    denominator = before - 2 * peak + after
+    if denominator == 0:
+        return 0.0
+    return 0.5 * (before - after) / denominator
+
+
+def downsample(array, factor):
+    """Redução factor×factor (soma de fatias com passo, em float32; a escala não altera a correlação)"""
+    rows = array.shape[0] // factor * factor
+    cols = array.shape[1] // factor * factor
+    output = np.zeros((rows // factor, cols // factor), dtype=np.float32)
+    for row in range(factor):
+        for col in range(factor):
+            output += array[row:rows:factor, col:cols:factor]
+    return output
+
+
+def correlation_peak(reference, moving):
+    """Pico da correlação cruzada (FFT real) com refinamento sub-pixel"""
+    a = reference - np.float32(reference.mean())
+    b = moving - np.float32(moving.mean())
+
+    spectrum = fft_backend.rfft2(a, **FFT_KWARGS)
+    spectrum *= np.conj(fft_backend.rfft2(b, **FFT_KWARGS))
+    correlation = fft_backend.irfft2(spectrum, s=a.shape, **FFT_KWARGS)
+    del spectrum
+
+    rows, cols = correlation.shape
+    py, px = np.unravel_index(int(np.argmax(correlation)), correlation.shape)
+    dy = py + _parabolic_offset(correlation[(py - 1) % rows, px], correlation[py, px], correlation[(py + 1) % rows, px])
+    dx = px + _parabolic_offset(correlation[py, (px - 1) % cols], correlation[py, px], correlation[py, (px + 1) % cols])
+
+    # Deslocamentos acima de meia imagem correspondem a valores negativos
+    if dy > rows / 2:
+        dy -= rows
+    if dx > cols / 2:
+        dx -= cols
+    return float(dy), float(dx)
+
+
+def fft_align(reference, moving, factor=ALIGN_COARSE_FACTOR, refine_size=ALIGN_REFINE_SIZE):
+    """
+    Deslocamento (dy, dx) em pixels tal que reference(y, x) ≈ moving(y - dy, x - dx),
+    obtido pelo pico da correlação cruzada calculada por FFT (com refinamento sub-pixel).
+
+    Imagens grandes: deslocamento inteiro pela correlação das imagens reduzidas
+    e resíduo sub-pixel pela correlação em resolução total numa janela central
+    já alinhada (uma FFT de refine_size² em vez da imagem inteira). Imagens
+    pequenas: o resíduo é recalculado na região sobreposta após o deslocamento
+    inteiro, o que remove o viés para zero da correlação circular.
+    """
+    direct = factor <= 1 or min(reference.shape) < 2 * refine_size
+    if direct:
+        coarse_y, coarse_x = correlation_peak(reference, moving)
+        coarse_y, coarse_x = int(round(coarse_y)), int(round(coarse_x))
+    else:
+        coarse_y, coarse_x = correlation_peak(downsample(reference, factor), downsample(moving, factor))
+        coarse_y, coarse_x = int(round(coarse_y * factor)), int(round(coarse_x * factor))
+
+    overlap_ref, overlap_mov = overlap_views(reference, moving, coarse_y, coarse_x)
+    if not direct:
+        size = (min(refine_size, overlap_ref.shape[0]), min(refine_size, overlap_ref.shape[1]))
+        overlap_ref, overlap_mov = center_crop(overlap_ref, size), center_crop(overlap_mov, size)
+    residual_y, residual_x = correlation_peak(overlap_ref, overlap_mov)
+
+    # Resíduo maior que a incerteza da primeira etapa: janela sem estrutura suficiente
+    if max(abs(residual_y), abs(residual_x)) > max(factor, 1):
+        return correlation_peak(reference, moving)
+    return coarse_y + residual_y, coarse_x + residual_x
+
+
+def overlap_views(reference, moving, dy, dx):
+    """Views das regiões sobrepostas após deslocamento inteiro (dy, dx)"""
+    dy, dx = int(round(dy)), int(round(dx))
+    rows, cols = reference.shape
+    ref_y, mov_y = max(dy, 0), max(-dy, 0)
+    ref_x, mov_x = max(dx, 0), max(-dx, 0)
+    height = rows - abs(dy)
+    width = cols - abs(dx)
+    if height <= 0 or width <= 0:
+        raise ValueError("Deslocamento maior que a imagem: sem região sobreposta")
+    return (reference[ref_y:ref_y + height, ref_x:ref_x + width],
+            moving[mov_y:mov_y + height, mov_x:mov_x + width])
+
+
+def difference_statistics(reference, moving, chunk_rows=CHUNK_ROWS, max_samples=1_000_000):
+    """
+    Correlação e estatísticas de diferença, processadas por blocos de linhas.
+
+    A imagem moving é ajustada à reference por ganho/offset (mínimos quadrados)
+    antes da diferença, então os valores ficam nas unidades da reference.
+    Percentis de |diferença| são estimados numa amostra regular de até
+    max_samples pixels.
+    """
+    n = 0
+    sum_a = sum_b = sum_aa = sum_bb = sum_ab = 0.0
+    for start in range(0, reference.shape[0], chunk_rows):
+        a = reference[start:start + chunk_rows].astype(np.float64).ravel()
+        b = moving[start:start + chunk_rows].astype(np.float64).ravel()
+        n += a.size
+        sum_a += a.sum()
+        sum_b += b.sum()
+        sum_aa += np.dot(a, a)
+        sum_bb += np.dot(b, b)
+        sum_ab += np.dot(a, b)
+
+    mean_a, mean_b = sum_a / n, sum_b / n
+    var_a = sum_aa / n - mean_a ** 2
+    var_b = sum_bb / n - mean_b ** 2
+    covariance = sum_ab / n - mean_a * mean_b
+    correlation = covariance / np.sqrt(var_a * var_b) if var_a > 0 and var_b > 0 else 0.0
+    gain = np.float32(covariance / var_b if var_b > 0 else 1.0)
+    offset = np.float32(mean_a - gain * mean_b)
+
+    total = total_sq = total_abs = 0.0
+    max_abs = 0.0
+    for start in range(0, reference.shape[0], chunk_rows):
+        diff = reference[start:start + chunk_rows].astype(np.float32)
+        diff -= gain * moving[start:start + chunk_rows].astype(np.float32)
+        diff -= offset
+        flat = diff.ravel()
+        total += float(flat.sum(dtype=np.float64))
+        total_sq += float(np.dot(flat.astype(np.float64), flat.astype(np.float64)))
+        np.abs(flat, out=flat)
+        total_abs += float(flat.sum(dtype=np.float64))
+        max_abs = max(max_abs, float(flat.max()))
+
+    step = max(int(np.ceil(np.sqrt(n / max_samples))), 1)
+    sample = reference[::step, ::step].astype(np.float32)
+    sample -= gain * moving[::step, ::step].astype(np.float32)
+    sample -= offset
+    p50, p95, p99 = np.percentile(np.abs(sample, out=sample), [50, 95, 99])
+
+    mean = total / n
+    return {
+        'pixels': n,
+        'correlation': float(correlation),
+        'gain': float(gain),
+        'offset': float(offset),
+        'mean': mean,
+        'std': max(total_sq / n - mean ** 2, 0.0) ** 0.5,
+        'mean_abs': total_abs / n,
+        'max_abs': max_abs,
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+    }
+
+
+def compare_pixels(pixels_a, spacing_a, pixels_b, spacing_b):
+    """Reamostrar para spacing comum, alinhar por FFT e comparar pixels de duas imagens"""
+    start_time = time.perf_counter()
+
+    # Spacing comum: o mais grosso dos dois (não inventa resolução)
+    target = (max(spacing_a[0], spacing_b[0]), max(spacing_a[1], spacing_b[1]))
+    a = resample_to_spacing(pixels_a, spacing_a, target)
+    b = resample_to_spacing(pixels_b, spacing_b, target)
+
+    shape = (min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1]))
+    a = center_crop(a, shape)
+    b = center_crop(b, shape)
+
+    dy, dx = fft_align(a, b)
+    overlap_a, overlap_b = overlap_views(a, b, dy, dx)
+    result = difference_statistics(overlap_a, overlap_b)
+
+    result.update({
+        'spacing': target,
+        'shape': shape,
+        'shift_px': (dy, dx),
+        'shift_mm': (dy * target[0], dx * target[1]),
+        'elapsed': time.perf_counter() - start_time,
+    })
+    return result
+
+
+def main():
+    """Comparar WL_fixed.dcm (de .img) com gantry_0.dcm (de TIFF) na pasta do script"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Arquivos para comparar
+    file_img = os.path.join(current_dir, "WL_fixed.dcm")        # De .img (nosso conversor)
+    file_tiff = os.path.join(current_dir, "gantry_0.dcm")       # De TIFF (pylinac)
+
+    print("="*80)
+    print("COMPARAÇÃO: DICOM GERADO DE .IMG vs DICOM GERADO DE TIFF")
+    print("="*80)
+
+    print(f"\nArquivo 1 (de .img): {os.path.basename(file_img)}")
+    print(f"  Fonte: Elekta iView .img → Nosso conversor")
+    print(f"  Tamanho: {os.path.getsize(file_img) / 1024:.1f} KB")
+
+    print(f"\nArquivo 2 (de TIFF): {os.path.basename(file_tiff)}")
+    print(f"  Fonte: TIFF → pylinac.image.tiff_to_dicom()")
+    print(f"  Tamanho: {os.path.getsize(file_tiff) / 1024:.1f} KB")
+
+    # Ler arquivos
+    print("\nCarregando arquivos DICOM...")
+    try:
+        ds_img = pydicom.dcmread(file_img, stop_before_pixels=True)
+        print(f"✓ Arquivo .img→DICOM lido")
+    except Exception as e:
+        print(f"✗ Erro ao ler {file_img}: {e}")
+        ds_img = None
 
-try:
-    ds_tiff = pydicom.dcmread(file_tiff)
-    print(f"✓ Arquivo TIFF→DICOM lido")
-except Exception as e:
-    print(f"✗ Erro ao ler {file_tiff}: {e}")
-    ds_tiff = None
-
-if not ds_img or not ds_tiff:
-    print("\nNão foi possível ler um ou ambos os arquivos!")
-    sys.exit(1)
-
-print("\n" + "="*80)
-print("COMPARAÇÃO DE TAGS PRINCIPAIS")
-print("="*80)
-
-# Tags para comparar
-important_tags = [
-    # Informações do Paciente
-    'PatientName',
-    'PatientID',
-    'PatientBirthDate',
-    'PatientSex',
-
-    # Informações do Estudo
-    'Modality',
-    'StudyDescription',
-    'StudyDate',
-    'StudyTime',
-    'StudyInstanceUID',
-    'SeriesInstanceUID',
-    'SeriesDescription',
-
-    # Informações do Equipamento
-    'Manufacturer',
-    'ManufacturerModelName',
-    'StationName',
-    'InstitutionName',
-
-    # RT Image específico
-    'RTImageLabel',
-    'RTImageDescription',
-    'RTImageName',
-
-    # Parâmetros de Radioterapia
-    'GantryAngle',
-    'BeamLimitingDeviceAngle',
-    'PatientSupportAngle',
-    'RTImageSID',
-    'RadiationMachineSAD',
-    'RadiationMachineSSD',
-    'PrimaryDosimeterUnit',
-
-    # Informações da Imagem
-    'Rows',
-    'Columns',
-    'BitsAllocated',
-    'BitsStored',
-    'HighBit',
-    'PixelRepresentation',
-    'PhotometricInterpretation',
-    'SamplesPerPixel',
-    'PixelSpacing',
-    'ImagePlanePixelSpacing',
-
-    # Técnico
-    'SOPClassUID',
-    'SOPInstanceUID',
-]
-
-print(f"\n{'TAG':<35} {'DE .IMG':<30} {'DE TIFF':<30}")
-print("-" * 95)
-
-differences = []
-img_only = []
-tiff_only = []
-
-for tag_name in important_tags:
-    val_img = getattr(ds_img, tag_name, None)
-    val_tiff = getattr(ds_tiff, tag_name, None)
-
-    # Converter para string
-    str_img = str(val_img) if val_img is not None else ""
-    str_tiff = str(val_tiff) if val_tiff is not None else ""
-
-    # Truncar strings longas
-    display_img = str_img[:28] + ".." if len(str_img) > 28 else str_img
-    display_tiff = str_tiff[:28] + ".." if len(str_tiff) > 28 else str_tiff
-
-    # Marcar diferenças
-    marker = ""
-    if val_img is None and val_tiff is not None:
-        tiff_only.append((tag_name, val_tiff))
-        marker = " ← APENAS TIFF"
-    elif val_img is not None and val_tiff is None:
-        img_only.append((tag_name, val_img))
-        marker = " ← APENAS IMG"
-    elif str_img != str_tiff:
-        differences.append((tag_name, val_img, val_tiff))
-        marker = " ← DIFERENTE"
-
-    print(f"{tag_name:<35} {display_img:<30} {display_tiff:<30}{marker}")
-
-# File Meta Information
-print("\n" + "="*80)
-print("FILE META INFORMATION HEADER")
-print("="*80)
-
-print(f"\n{'CAMPO':<35} {'DE .IMG':<30} {'DE TIFF':<30}")
-print("-" * 95)
-
-meta_fields = [
-    'FileMetaInformationVersion',
-    'MediaStorageSOPClassUID',
-    'MediaStorageSOPInstanceUID',
-    'TransferSyntaxUID',
-    'ImplementationClassUID',
-    'ImplementationVersionName',
-]
-
-for field in meta_fields:
-    val_img = getattr(ds_img.file_meta, field, None) if hasattr(ds_img, 'file_meta') else None
-    val_tiff = getattr(ds_tiff.file_meta, field, None) if hasattr(ds_tiff, 'file_meta') else None
-
-    str_img = str(val_img)[:28] if val_img else "N/A"
-    str_tiff = str(val_tiff)[:28] if val_tiff else "N/A"
-
-    marker = " ← DIFERENTE" if val_img != val_tiff else ""
-    print(f"{field:<35} {str_img:<30} {str_tiff:<30}{marker}")
-
-# Resumo das diferenças
-print("\n" + "="*80)
-print("RESUMO DAS DIFERENÇAS")
-print("="*80)
-
-if differences:
-    print(f"\nTags com valores diferentes: {len(differences)}")
-    for tag_name, val_img, val_tiff in differences:
-        print(f"\n{tag_name}:")
-        print(f"  De .img:  {val_img}")
-        print(f"  De TIFF:  {val_tiff}")
-
-if img_only:
-    print(f"\nTags presentes APENAS no arquivo de .img: {len(img_only)}")
-    for tag_name, val in img_only[:10]:
-        print(f"  {tag_name}: {val}")
-    if len(img_only) > 10:
-        print(f"  ... e mais {len(img_only) - 10} tags")
-
-if tiff_only:
-    print(f"\nTags presentes APENAS no arquivo de TIFF: {len(tiff_only)}")
-    for tag_name, val in tiff_only[:10]:
-        print(f"  {tag_name}: {val}")
-    if len(tiff_only) > 10:
-        print(f"  ... e mais {len(tiff_only) - 10} tags")
-
-# Análise de compatibilidade
-print("\n" + "="*80)
-print("ANÁLISE DE COMPATIBILIDADE COM PYLINAC")
-print("="*80)
-
-# Tags essenciais para Winston-Lutz
-required_wl_tags = {
-    'GantryAngle': 'Ângulo do gantry',
-    'Modality': 'Modalidade (deve ser RTIMAGE)',
-    'Rows': 'Número de linhas da imagem',
-    'Columns': 'Número de colunas da imagem',
-    'SOPClassUID': 'Tipo de objeto DICOM',
-}
-
-print("\nTags essenciais para Winston-Lutz:")
-print(f"{'TAG':<20} {'DE .IMG':<15} {'DE TIFF':<15} {'DESCRIÇÃO':<30}")
-print("-" * 80)
-
-for tag, desc in required_wl_tags.items():
-    val_img = getattr(ds_img, tag, None)
-    val_tiff = getattr(ds_tiff, tag, None)
-
-    str_img = str(val_img)[:13] if val_img else "N/A"
-    str_tiff = str(val_tiff)[:13] if val_tiff else "N/A"
-
-    status = "✓" if val_img and val_tiff else "✗"
-    print(f"{tag:<20} {str_img:<15} {str_tiff:<15} {desc:<30} {status}")
-
-# Conclusão
-print("\n" + "="*80)
-print("CONCLUSÃO")
-print("="*80)
-
-print("\nCOMPATIBILIDADE:")
-print(f"  Arquivo de .img:  {'✓ Compatível' if all(hasattr(ds_img, tag) for tag in required_wl_tags) else '✗ Incompatível'}")
-print(f"  Arquivo de TIFF:  {'✓ Compatível' if all(hasattr(ds_tiff, tag) for tag in required_wl_tags) else '✗ Incompatível'}")
-
-print("\nPRINCIPAIS DIFERENÇAS:")
-print(f"  1. Origem dos dados:")
-print(f"     - .img: Arquivo real do acelerador Elekta")
-print(f"     - TIFF: Imagem convertida com parâmetros sintéticos")
-
-print(f"\n  2. Informações do paciente:")
-print(f"     - .img: Dados reais (WINSTON-LUTZ^WL, ID: WL2025)")
-print(f"     - TIFF: Dados sintéticos (Pylinac array, ID: 123456789)")
-
-print(f"\n  3. Informações do equipamento:")
-if hasattr(ds_img, 'Manufacturer'):
-    print(f"     - .img: {ds_img.Manufacturer}, {getattr(ds_img, 'StationName', 'N/A')}")
-else:
-    print(f"     - .img: Informações não disponíveis")
-if hasattr(ds_tiff, 'Manufacturer'):
-    print(f"     - TIFF: {getattr(ds_tiff, 'Manufacturer', 'N/A')}")
-else:
-    print(f"     - TIFF: Informações sintéticas do pylinac")
-
-print(f"\n  4. Transfer Syntax:")
-if hasattr(ds_img, 'file_meta'):
-    print(f"     - .img: {ds_img.file_meta.TransferSyntaxUID}")
-if hasattr(ds_tiff, 'file_meta'):
-    print(f"     - TIFF: {ds_tiff.file_meta.TransferSyntaxUID}")
-
-print("\nRECOMENDAÇÃO:")
-print("  Ambos os arquivos são compatíveis com pylinac!")
-print("  - Use arquivos de .img quando disponíveis (dados reais)")
-print("  - Use conversão TIFF quando necessário (testes, simulações)")
-
-# Salvar relatório
-output_file = os.path.join(current_dir, "comparacao_img_vs_tiff.txt")
-print(f"\n\nRelatório completo salvo em: {output_file}")
+    try:
+        ds_tiff = pydicom.dcmread(file_tiff, stop_before_pixels=True)
+        print(f"✓ Arquivo TIFF→DICOM lido")
+    except Exception as e:
+        print(f"✗ Erro ao ler {file_tiff}: {e}")
+        ds_tiff = None
+
+    if not ds_img or not ds_tiff:
+        print("\nNão foi possível ler um ou ambos os arquivos!")
+        sys.exit(1)
+
+    print("\n" + "="*80)
+    print("COMPARAÇÃO DE TAGS PRINCIPAIS")
+    print("="*80)
+
+    # Tags para comparar
+    important_tags = [
+        # Informações do Paciente
+        'PatientName',
+        'PatientID',
+        'PatientBirthDate',
+        'PatientSex',
+
+        # Informações do Estudo
+        'Modality',
+        'StudyDescription',
+        'StudyDate',
+        'StudyTime',
+        'StudyInstanceUID',
+        'SeriesInstanceUID',
+        'SeriesDescription',
+
+        # Informações do Equipamento
+        'Manufacturer',
+        'ManufacturerModelName',
+        'StationName',
+        'InstitutionName',
+
+        # RT Image específico
+        'RTImageLabel',
+        'RTImageDescription',
+        'RTImageName',
+
+        # Parâmetros de Radioterapia
+        'GantryAngle',
+        'BeamLimitingDeviceAngle',
+        'PatientSupportAngle',
+        'RTImageSID',
+        'RadiationMachineSAD',
+        'RadiationMachineSSD',
+        'PrimaryDosimeterUnit',
+
+        # Informações da Imagem
+        'Rows',
+        'Columns',
+        'BitsAllocated',
+        'BitsStored',
+        'HighBit',
+        'PixelRepresentation',
+        'PhotometricInterpretation',
+        'SamplesPerPixel',
+        'PixelSpacing',
+        'ImagePlanePixelSpacing',
+
+        # Técnico
+        'SOPClassUID',
+        'SOPInstanceUID',
+    ]
+
+    print(f"\n{'TAG':<35} {'DE .IMG':<30} {'DE TIFF':<30}")
+    print("-" * 95)
+
+    differences = []
+    img_only = []
+    tiff_only = []
+
+    for tag_name in important_tags:
+        val_img = getattr(ds_img, tag_name, None)
+        val_tiff = getattr(ds_tiff, tag_name, None)
+
+        # Converter para string
+        str_img = str(val_img) if val_img is not None else ""
+        str_tiff = str(val_tiff) if val_tiff is not None else ""
+
+        # Truncar strings longas
+        display_img = str_img[:28] + ".." if len(str_img) > 28 else str_img
+        display_tiff = str_tiff[:28] + ".." if len(str_tiff) > 28 else str_tiff
+
+        # Marcar diferenças
+        marker = ""
+        if val_img is None and val_tiff is not None:
+            tiff_only.append((tag_name, val_tiff))
+            marker = " ← APENAS TIFF"
+        elif val_img is not None and val_tiff is None:
+            img_only.append((tag_name, val_img))
+            marker = " ← APENAS IMG"
+        elif str_img != str_tiff:
+            differences.append((tag_name, val_img, val_tiff))
+            marker = " ← DIFERENTE"
+
+        print(f"{tag_name:<35} {display_img:<30} {display_tiff:<30}{marker}")
+
+    # File Meta Information
+    print("\n" + "="*80)
+    print("FILE META INFORMATION HEADER")
+    print("="*80)
+
+    print(f"\n{'CAMPO':<35} {'DE .IMG':<30} {'DE TIFF':<30}")
+    print("-" * 95)
+
+    meta_fields = [
+        'FileMetaInformationVersion',
+        'MediaStorageSOPClassUID',
+        'MediaStorageSOPInstanceUID',
+        'TransferSyntaxUID',
+        'ImplementationClassUID',
+        'ImplementationVersionName',
+    ]
+
+    for field in meta_fields:
+        val_img = getattr(ds_img.file_meta, field, None) if hasattr(ds_img, 'file_meta') else None
+        val_tiff = getattr(ds_tiff.file_meta, field, None) if hasattr(ds_tiff, 'file_meta') else None
+
+        str_img = str(val_img)[:28] if val_img else "N/A"
+        str_tiff = str(val_tiff)[:28] if val_tiff else "N/A"
+
+        marker = " ← DIFERENTE" if val_img != val_tiff else ""
+        print(f"{field:<35} {str_img:<30} {str_tiff:<30}{marker}")
+
+    # Resumo das diferenças
+    print("\n" + "="*80)
+    print("RESUMO DAS DIFERENÇAS")
+    print("="*80)
+
+    if differences:
+        print(f"\nTags com valores diferentes: {len(differences)}")
+        for tag_name, val_img, val_tiff in differences:
+            print(f"\n{tag_name}:")
+            print(f"  De .img:  {val_img}")
+            print(f"  De TIFF:  {val_tiff}")
+
+    if img_only:
+        print(f"\nTags presentes APENAS no arquivo de .img: {len(img_only)}")
+        for tag_name, val in img_only[:10]:
+            print(f"  {tag_name}: {val}")
+        if len(img_only) > 10:
+            print(f"  ... e mais {len(img_only) - 10} tags")
+
+    if tiff_only:
+        print(f"\nTags presentes APENAS no arquivo de TIFF: {len(tiff_only)}")
+        for tag_name, val in tiff_only[:10]:
+            print(f"  {tag_name}: {val}")
+        if len(tiff_only) > 10:
+            print(f"  ... e mais {len(tiff_only) - 10} tags")
+
+    # Estatísticas de pixels via memmap (sem carregar o frame inteiro)
+    print("\n" + "="*80)
+    print("ESTATÍSTICAS DE PIXELS (memmap)")
+    print("="*80)
+
+    for label, path in (("Arquivo de .img", file_img), ("Arquivo de TIFF", file_tiff)):
+        try:
+            pixels, _ = open_dicom_memmap(path)
+            stats = roi_statistics(pixels)
+            print(f"\n{label}: {pixels.shape[-1]} x {pixels.shape[-2]} pixels, {pixels.dtype}")
+            print(f"  Min: {stats['min']:.0f}  Max: {stats['max']:.0f}  "
+                  f"Média: {stats['mean']:.1f}  Desvio: {stats['std']:.1f}")
+        except Exception as e:
+            print(f"\n{label}: ✗ Não foi possível mapear os pixels: {e}")
+
+    # Comparação pixel a pixel
+    print("\n" + "="*80)
+    print("COMPARAÇÃO DE PIXELS (reamostragem + alinhamento por FFT)")
+    print("="*80)
+
+    try:
+        pixel_result = compare_pixels(
+            load_pixels(file_img), pixel_spacing_mm(ds_img),
+            load_pixels(file_tiff), pixel_spacing_mm(ds_tiff)
+        )
+        print(f"\nSpacing comum: {pixel_result['spacing'][0]:.4f} x {pixel_result['spacing'][1]:.4f} mm")
+        print(f"Região comparada: {pixel_result['shape'][1]} x {pixel_result['shape'][0]} pixels")
+        print(f"Deslocamento (TIFF → .img): dy={pixel_result['shift_px'][0]:+.2f} px, dx={pixel_result['shift_px'][1]:+.2f} px "
+              f"({pixel_result['shift_mm'][0]:+.2f} mm, {pixel_result['shift_mm'][1]:+.2f} mm)")
+        print(f"Coeficiente de correlação: {pixel_result['correlation']:.4f}")
+        print(f"Ajuste de intensidade (TIFF → .img): ganho={pixel_result['gain']:.4g}, offset={pixel_result['offset']:.4g}")
+        print(f"\nDiferença após alinhamento (unidades do arquivo de .img):")
+        print(f"  Média: {pixel_result['mean']:.2f}  Desvio: {pixel_result['std']:.2f}  |Média|: {pixel_result['mean_abs']:.2f}")
+        print(f"  Máx |dif|: {pixel_result['max_abs']:.2f}")
+        print(f"  Percentis |dif|: P50={pixel_result['p50']:.2f}  P95={pixel_result['p95']:.2f}  P99={pixel_result['p99']:.2f}")
+        print(f"\nTempo da comparação: {pixel_result['elapsed']:.3f} s")
+    except Exception as e:
+        print(f"\n✗ Não foi possível comparar os pixels: {e}")
+
+    # Análise de compatibilidade
+    print("\n" + "="*80)
+    print("ANÁLISE DE COMPATIBILIDADE COM PYLINAC")
+    print("="*80)
+
+    # Tags essenciais para Winston-Lutz
+    required_wl_tags = {
+        'GantryAngle': 'Ângulo do gantry',
+        'Modality': 'Modalidade (deve ser RTIMAGE)',
+        'Rows': 'Número de linhas da imagem',
+        'Columns': 'Número de colunas da imagem',
+        'SOPClassUID': 'Tipo de objeto DICOM',
+    }
+
+    print("\nTags essenciais para Winston-Lutz:")
+    print(f"{'TAG':<20} {'DE .IMG':<15} {'DE TIFF':<15} {'DESCRIÇÃO':<30}")
+    print("-" * 80)
+
+    for tag, desc in required_wl_tags.items():
+        val_img = getattr(ds_img, tag, None)
+        val_tiff = getattr(ds_tiff, tag, None)
+
+        str_img = str(val_img)[:13] if val_img else "N/A"
+        str_tiff = str(val_tiff)[:13] if val_tiff else "N/A"
+
+        status = "✓" if val_img and val_tiff else "✗"
+        print(f"{tag:<20} {str_img:<15} {str_tiff:<15} {desc:<30} {status}")
+
+    # Conclusão
+    print("\n" + "="*80)
+    print("CONCLUSÃO")
+    print("="*80)
+
+    print("\nCOMPATIBILIDADE:")
+    print(f"  Arquivo de .img:  {'✓ Compatível' if all(hasattr(ds_img, tag) for tag in required_wl_tags) else '✗ Incompatível'}")
+    print(f"  Arquivo de TIFF:  {'✓ Compatível' if all(hasattr(ds_tiff, tag) for tag in required_wl_tags) else '✗ Incompatível'}")
+
+    print("\nPRINCIPAIS DIFERENÇAS:")
+    print(f"  1. Origem dos dados:")
+    print(f"     - .img: Arquivo real do acelerador Elekta")
+    print(f"     - TIFF: Imagem convertida com parâmetros sintéticos")
+
+    print(f"\n  2. Informações do paciente:")
+    print(f"     - .img: Dados reais (WINSTON-LUTZ^WL, ID: WL2025)")
+    print(f"     - TIFF: Dados sintéticos (Pylinac array, ID: 123456789)")
+
+    print(f"\n  3. Informações do equipamento:")
+    if hasattr(ds_img, 'Manufacturer'):
+        print(f"     - .img: {ds_img.Manufacturer}, {getattr(ds_img, 'StationName', 'N/A')}")
+    else:
+        print(f"     - .img: Informações não disponíveis")
+    if hasattr(ds_tiff, 'Manufacturer'):
+        print(f"     - TIFF: {getattr(ds_tiff, 'Manufacturer', 'N/A')}")
+    else:
+        print(f"     - TIFF: Informações sintéticas do pylinac")
+
+    print(f"\n  4. Transfer Syntax:")
+    if hasattr(ds_img, 'file_meta'):
+        print(f"     - .img: {ds_img.file_meta.TransferSyntaxUID}")
+    if hasattr(ds_tiff, 'file_meta'):
+        print(f"     - TIFF: {ds_tiff.file_meta.TransferSyntaxUID}")
+
+    print("\nRECOMENDAÇÃO:")
+    print("  Ambos os arquivos são compatíveis com pylinac!")
+    print("  - Use arquivos de .img quando disponíveis (dados reais)")
+    print("  - Use conversão TIFF quando necessário (testes, simulações)")
+
+    # Salvar relatório
+    output_file = os.path.join(current_dir, "comparacao_img_vs_tiff.txt")
+    print(f"\n\nRelatório completo salvo em: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,12 @@ Script para comparar estruturas de arquivos DICOM
 import pydicom
 import os
 import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dicom_memmap import open_dicom_memmap, roi_statistics
 
 # Configurar codificação UTF-8
 if sys.platform == 'win32':
@@ -16,222 +22,491 @@ if sys.platform == 'win32':
     except:
         pass
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Arquivos a comparar
-file_valid = os.path.join(current_dir, "gantry180.dcm")  # Arquivo válido
-file_converted = os.path.join(current_dir, "DCM4_Processed_converted.dcm")  # Arquivo convertido
-
-print("="*80)
-print("COMPARAÇÃO DE ESTRUTURAS DICOM")
-print("="*80)
-
-print(f"\nArquivo VÁLIDO: {os.path.basename(file_valid)}")
-print(f"Arquivo CONVERTIDO: {os.path.basename(file_converted)}")
-
-# Ler arquivos
-try:
-    ds_valid = pydicom.dcmread(file_valid)
-    print(f"\n✓ Arquivo válido lido com sucesso")
-except Exception as e:
-    print(f"\n✗ Erro ao ler arquivo válido: {str(e)}")
-    ds_valid = None
-
-try:
-    ds_converted = pydicom.dcmread(file_converted)
-    print(f"✓ Arquivo convertido lido com sucesso")
-except Exception as e:
-    print(f"⚠ Erro ao ler arquivo convertido: {str(e)}")
-    print(f"  Tentando com force=True...")
+
+# Extensões consideradas no modo pasta-vs-pasta (além de arquivos sem extensão)
+DICOM_EXTENSIONS = ('.dcm', '.img', '.ima', '.dicom')
+
+
+def find_dicom_files(folder):
+    """Listar arquivos DICOM (caminhos relativos) de uma pasta e subpastas"""
+    files = []
+    for root, _, names in os.walk(folder):
+        for name in names:
+            ext = os.path.splitext(name)[1].lower()
+            if ext in DICOM_EXTENSIONS or not ext:
+                files.append(os.path.relpath(os.path.join(root, name), folder))
+    return sorted(files)
+
+
+def element_value(elem):
+    """Representação textual de um elemento para comparação"""
+    if elem.VR == 'SQ':
+        return f"<SQ {len(elem.value)} itens> " + str(elem.value)
+    return str(elem.value)
+
+
+def read_header_tags(path):
+    """Ler apenas o header (sem pixels) e retornar {tag: valor} incluindo File Meta"""
+    ds = pydicom.dcmread(path, stop_before_pixels=True, force=True)
+    tags = {}
+    file_meta = getattr(ds, 'file_meta', None)
+    if file_meta:
+        for elem in file_meta:
+            tags[f"FileMeta.{elem.keyword or elem.tag}"] = element_value(elem)
+    for elem in ds:
+        tags[elem.keyword or str(elem.tag)] = element_value(elem)
+    return tags
+
+
+def read_instance_uid(path):
+    """Worker: (caminho, SOPInstanceUID) lendo apenas a tag necessária"""
+    try:
+        ds = pydicom.dcmread(path, stop_before_pixels=True, force=True,
+                             specific_tags=['SOPInstanceUID'])
+        return path, str(getattr(ds, 'SOPInstanceUID', '')) or None
+    except Exception:
+        return path, None
+
+
+def compare_pair(job):
+    """Worker: comparar tags e File Meta de um par (referência, novo)"""
+    name, ref_path, new_path, ignored = job
+    try:
+        ref_tags = read_header_tags(ref_path)
+        new_tags = read_header_tags(new_path)
+    except Exception as e:
+        return {'name': name, 'error': str(e), 'differences': []}
+
+    differences = []
+    for tag in sorted(set(ref_tags) | set(new_tags)):
+        if tag in ignored:
+            continue
+        ref_value = ref_tags.get(tag)
+        new_value = new_tags.get(tag)
+        if ref_value is None:
+            differences.append((tag, 'only_new', None, new_value))
+        elif new_value is None:
+            differences.append((tag, 'only_ref', ref_value, None))
+        elif ref_value != new_value:
+            differences.append((tag, 'different', ref_value, new_value))
+    return {'name': name, 'error': None, 'differences': differences}
+
+
+def pair_files(ref_folder, new_folder, by_uid=False, executor=None):
+    """
+    Parear arquivos das duas pastas por nome (caminho relativo) ou SOPInstanceUID.
+
+    Retorna (pares, sem_par_referência, sem_par_novos, uids_duplicados). Um UID
+    repetido numa das pastas é pareado na ordem dos nomes; as cópias que
+    sobram ficam sem par e o UID é listado em uids_duplicados.
+    """
+    ref_files = find_dicom_files(ref_folder)
+    new_files = find_dicom_files(new_folder)
+
+    if not by_uid:
+        new_set = set(new_files)
+        pairs = [(f, os.path.join(ref_folder, f), os.path.join(new_folder, f))
+                 for f in ref_files if f in new_set]
+        paired = {f for f, _, _ in pairs}
+        return (pairs,
+                [f for f in ref_files if f not in paired],
+                [f for f in new_files if f not in paired],
+                [])
+
+    ref_paths = [os.path.join(ref_folder, f) for f in ref_files]
+    new_paths = [os.path.join(new_folder, f) for f in new_files]
+    chunksize = max(1, (len(ref_paths) + len(new_paths)) // 64)
+    ref_uids = dict(executor.map(read_instance_uid, ref_paths, chunksize=chunksize))
+    new_by_uid = {}
+    for path, uid in executor.map(read_instance_uid, new_paths, chunksize=chunksize):
+        if uid:
+            new_by_uid.setdefault(uid, []).append(path)
+
+    ref_counts = {}
+    for uid in ref_uids.values():
+        if uid:
+            ref_counts[uid] = ref_counts.get(uid, 0) + 1
+    duplicates = sorted(uid for uid in set(ref_counts) | set(new_by_uid)
+                        if ref_counts.get(uid, 0) > 1 or len(new_by_uid.get(uid, ())) > 1)
+
+    pairs = []
+    unpaired_ref = []
+    for path in ref_paths:
+        uid = ref_uids.get(path)
+        if uid and new_by_uid.get(uid):
+            new_path = new_by_uid[uid].pop(0)
+            pairs.append((os.path.relpath(path, ref_folder), path, new_path))
+        else:
+            unpaired_ref.append(os.path.relpath(path, ref_folder))
+    unpaired_new = sorted(os.path.relpath(p, new_folder) for paths in new_by_uid.values() for p in paths)
+    return pairs, unpaired_ref, unpaired_new, duplicates
+
+
+def aggregate_differences(results, max_examples=3):
+    """Agregar diferenças por tag: contagens por tipo e alguns exemplos"""
+    by_tag = {}
+    for result in results:
+        for tag, kind, ref_value, new_value in result['differences']:
+            entry = by_tag.setdefault(tag, {'different': 0, 'only_ref': 0, 'only_new': 0, 'examples': []})
+            entry[kind] += 1
+            if len(entry['examples']) < max_examples:
+                entry['examples'].append({
+                    'file': result['name'],
+                    'kind': kind,
+                    'reference': ref_value[:200] if ref_value else ref_value,
+                    'new': new_value[:200] if new_value else new_value,
+                })
+    return dict(sorted(
+        by_tag.items(),
+        key=lambda item: item[1]['different'] + item[1]['only_ref'] + item[1]['only_new'],
+        reverse=True
+    ))
+
+
+def write_folder_report(output_path, summary, by_tag):
+    """Salvar relatório agregado em CSV ou JSON (pela extensão do arquivo)"""
+    if output_path.lower().endswith('.json'):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'tags': by_tag}, f, indent=2, ensure_ascii=False)
+        return
+
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['tag', 'diferentes', 'apenas_referencia', 'apenas_novo',
+                         'exemplo_arquivo', 'exemplo_referencia', 'exemplo_novo'])
+        for tag, entry in by_tag.items():
+            example = entry['examples'][0] if entry['examples'] else {}
+            writer.writerow([tag, entry['different'], entry['only_ref'], entry['only_new'],
+                             example.get('file', ''), example.get('reference', ''), example.get('new', '')])
+
+
+def compare_folders(ref_folder, new_folder, output_path, by_uid=False, workers=None, ignored=()):
+    """Comparar muitos arquivos (pasta de referência vs pasta nova) em paralelo"""
+    start_time = time.perf_counter()
+    ignored = frozenset(ignored)
+
+    print("="*80)
+    print("COMPARAÇÃO DICOM: PASTA vs PASTA")
+    print("="*80)
+    print(f"\nReferência: {ref_folder}")
+    print(f"Novos:      {new_folder}")
+    print(f"Pareamento: {'SOPInstanceUID' if by_uid else 'nome do arquivo'}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pairs, unpaired_ref, unpaired_new, duplicates = pair_files(ref_folder, new_folder, by_uid, executor)
+        print(f"\nPares encontrados: {len(pairs)}")
+
+        jobs = [(name, ref_path, new_path, ignored) for name, ref_path, new_path in pairs]
+        chunksize = max(1, len(jobs) // 64)
+        results = list(executor.map(compare_pair, jobs, chunksize=chunksize))
+
+    errors = [r for r in results if r['error']]
+    files_with_diffs = sum(1 for r in results if r['differences'])
+    by_tag = aggregate_differences(results)
+    elapsed = time.perf_counter() - start_time
+
+    summary = {
+        'reference_folder': ref_folder,
+        'new_folder': new_folder,
+        'pairing': 'SOPInstanceUID' if by_uid else 'name',
+        'pairs': len(pairs),
+        'files_with_differences': files_with_diffs,
+        'unpaired_reference': unpaired_ref,
+        'unpaired_new': unpaired_new,
+        'duplicate_uids': duplicates,
+        'errors': {r['name']: r['error'] for r in errors},
+        'ignored_tags': sorted(ignored),
+        'elapsed_seconds': round(elapsed, 3),
+    }
+    write_folder_report(output_path, summary, by_tag)
+
+    print(f"Arquivos com diferenças: {files_with_diffs}/{len(pairs)}")
+    if unpaired_ref:
+        print(f"Sem par na pasta nova: {len(unpaired_ref)}")
+    if unpaired_new:
+        print(f"Sem par na referência: {len(unpaired_new)}")
+    if duplicates:
+        print(f"⚠ SOPInstanceUID repetido: {len(duplicates)} (cópias extras ficaram sem par)")
+    if errors:
+        print(f"Erros de leitura: {len(errors)}")
+
+    if by_tag:
+        print(f"\n{'TAG':<45} {'DIFERENTE':>10} {'SÓ REF':>8} {'SÓ NOVO':>8}")
+        print("-" * 75)
+        for tag, entry in list(by_tag.items())[:30]:
+            print(f"{tag:<45} {entry['different']:>10} {entry['only_ref']:>8} {entry['only_new']:>8}")
+        if len(by_tag) > 30:
+            print(f"... e mais {len(by_tag) - 30} tags")
+    else:
+        print("\n✓ Nenhuma diferença encontrada!")
+
+    print(f"\nTempo total: {elapsed:.2f} s ({len(pairs) / elapsed if elapsed else 0:.0f} pares/s)")
+    print(f"Relatório salvo em: {output_path}")
+    return summary
+
+
+def compare_single(file_valid, file_converted):
+    """Comparar um arquivo válido com um arquivo convertido (relatório detalhado)"""
+    print("="*80)
+    print("COMPARAÇÃO DE ESTRUTURAS DICOM")
+    print("="*80)
+
+    print(f"\nArquivo VÁLIDO: {os.path.basename(file_valid)}")
+    print(f"Arquivo CONVERTIDO: {os.path.basename(file_converted)}")
+
+    # Ler arquivos
+    try:
+        ds_valid = pydicom.dcmread(file_valid, stop_before_pixels=True)
+        print(f"\n✓ Arquivo válido lido com sucesso")
+    except Exception as e:
+        print(f"\n✗ Erro ao ler arquivo válido: {str(e)}")
+        ds_valid = None
+
     try:
-        ds_converted = pydicom.dcmread(file_converted, force=True)
-        print(f"✓ Arquivo convertido lido com force=True")
-    except Exception as e2:
-        print(f"✗ Falhou mesmo com force=True: {str(e2)}")
-        ds_converted = None
-
-if not ds_valid or not ds_converted:
-    print("\nNão foi possível ler um ou ambos os arquivos!")
-    sys.exit(1)
-
-print("\n" + "="*80)
-print("COMPARAÇÃO DE TAGS PRINCIPAIS")
-print("="*80)
-
-# Tags importantes para análise
-important_tags = [
-    'SOPClassUID',
-    'SOPInstanceUID',
-    'Modality',
-    'Manufacturer',
-    'ManufacturerModelName',
-    'StationName',
-    'StudyInstanceUID',
-    'SeriesInstanceUID',
-    'FrameOfReferenceUID',
-    'PatientName',
-    'PatientID',
-    'StudyDate',
-    'StudyTime',
-    'SeriesDate',
-    'SeriesTime',
-    'AcquisitionDate',
-    'AcquisitionTime',
-    'ContentDate',
-    'ContentTime',
-    'Rows',
-    'Columns',
-    'BitsAllocated',
-    'BitsStored',
-    'HighBit',
-    'PixelRepresentation',
-    'PhotometricInterpretation',
-    'SamplesPerPixel',
-    'PixelSpacing',
-    'ImageOrientationPatient',
-    'ImagePositionPatient',
-    'SliceThickness',
-    'RTImageLabel',
-    'RTImageName',
-    'RTImageDescription',
-    'RTImagePlane',
-    'XRayImageReceptorTranslation',
-    'XRayImageReceptorAngle',
-    'RTImageOrientation',
-    'ImagePlanePixelSpacing',
-    'RTImagePosition',
-    'RadiationMachineName',
-    'RadiationMachineSAD',
-    'RadiationMachineSSD',
-    'RTImageSID',
-    'PrimaryDosimeterUnit',
-    'GantryAngle',
-    'BeamLimitingDeviceAngle',
-    'PatientSupportAngle',
-    'TableTopVerticalPosition',
-    'TableTopLongitudinalPosition',
-    'TableTopLateralPosition',
-    'IsocenterPosition',
-]
-
-print("\nTAG                                  VÁLIDO                    CONVERTIDO")
-print("-" * 80)
-
-differences = []
-
-for tag_name in important_tags:
-    val_valid = getattr(ds_valid, tag_name, None)
-    val_converted = getattr(ds_converted, tag_name, None)
-
-    # Converter para string para comparação
-    str_valid = str(val_valid) if val_valid is not None else "N/A"
-    str_converted = str(val_converted) if val_converted is not None else "N/A"
-
-    # Truncar strings longas
-    if len(str_valid) > 25:
-        str_valid = str_valid[:22] + "..."
-    if len(str_converted) > 25:
-        str_converted = str_converted[:22] + "..."
-
-    # Verificar se são diferentes
-    if val_valid != val_converted:
-        marker = " ← DIFERENTE"
-        differences.append((tag_name, val_valid, val_converted))
+        ds_converted = pydicom.dcmread(file_converted, stop_before_pixels=True)
+        print(f"✓ Arquivo convertido lido com sucesso")
+    except Exception as e:
+        print(f"⚠ Erro ao ler arquivo convertido: {str(e)}")
+        print(f"  Tentando com force=True...")
+        try:
+            ds_converted = pydicom.dcmread(file_converted, force=True, stop_before_pixels=True)
+            print(f"✓ Arquivo convertido lido com force=True")
+        except Exception as e2:
+            print(f"✗ Falhou mesmo com force=True: {str(e2)}")
+            ds_converted = None
+
+    if not ds_valid or not ds_converted:
+        print("\nNão foi possível ler um ou ambos os arquivos!")
+        return False
+
+    print("\n" + "="*80)
+    print("COMPARAÇÃO DE TAGS PRINCIPAIS")
+    print("="*80)
+
+    # Tags importantes para análise
+    important_tags = [
+        'SOPClassUID',
+        'SOPInstanceUID',
+        'Modality',
+        'Manufacturer',
+        'ManufacturerModelName',
+        'StationName',
+        'StudyInstanceUID',
+        'SeriesInstanceUID',
+        'FrameOfReferenceUID',
+        'PatientName',
+        'PatientID',
+        'StudyDate',
+        'StudyTime',
+        'SeriesDate',
+        'SeriesTime',
+        'AcquisitionDate',
+        'AcquisitionTime',
+        'ContentDate',
+        'ContentTime',
+        'Rows',
+        'Columns',
+        'BitsAllocated',
+        'BitsStored',
+        'HighBit',
+        'PixelRepresentation',
+        'PhotometricInterpretation',
+        'SamplesPerPixel',
+        'PixelSpacing',
+        'ImageOrientationPatient',
+        'ImagePositionPatient',
+        'SliceThickness',
+        'RTImageLabel',
+        'RTImageName',
+        'RTImageDescription',
+        'RTImagePlane',
+        'XRayImageReceptorTranslation',
+        'XRayImageReceptorAngle',
+        'RTImageOrientation',
+        'ImagePlanePixelSpacing',
+        'RTImagePosition',
+        'RadiationMachineName',
+        'RadiationMachineSAD',
+        'RadiationMachineSSD',
+        'RTImageSID',
+        'PrimaryDosimeterUnit',
+        'GantryAngle',
+        'BeamLimitingDeviceAngle',
+        'PatientSupportAngle',
+        'TableTopVerticalPosition',
+        'TableTopLongitudinalPosition',
+        'TableTopLateralPosition',
+        'IsocenterPosition',
+    ]
+
+    print("\nTAG                                  VÁLIDO                    CONVERTIDO")
+    print("-" * 80)
+
+    differences = []
+
+    for tag_name in important_tags:
+        val_valid = getattr(ds_valid, tag_name, None)
+        val_converted = getattr(ds_converted, tag_name, None)
+
+        # Converter para string para comparação
+        str_valid = str(val_valid) if val_valid is not None else "N/A"
+        str_converted = str(val_converted) if val_converted is not None else "N/A"
+
+        # Truncar strings longas
+        if len(str_valid) > 25:
+            str_valid = str_valid[:22] + "..."
+        if len(str_converted) > 25:
+            str_converted = str_converted[:22] + "..."
+
+        # Verificar se são diferentes
+        if val_valid != val_converted:
+            marker = " ← DIFERENTE"
+            differences.append((tag_name, val_valid, val_converted))
+        else:
+            marker = ""
+
+        print(f"{tag_name:35} {str_valid:25} {str_converted:25}{marker}")
+
+    # Resumo das diferenças
+    print("\n" + "="*80)
+    print("RESUMO DAS DIFERENÇAS ENCONTRADAS")
+    print("="*80)
+
+    if not differences:
+        print("\n✓ Nenhuma diferença encontrada nas tags principais!")
     else:
-        marker = ""
-
-    print(f"{tag_name:35} {str_valid:25} {str_converted:25}{marker}")
-
-# Resumo das diferenças
-print("\n" + "="*80)
-print("RESUMO DAS DIFERENÇAS ENCONTRADAS")
-print("="*80)
-
-if not differences:
-    print("\n✓ Nenhuma diferença encontrada nas tags principais!")
-else:
-    print(f"\n✗ Encontradas {len(differences)} diferenças:\n")
-
-    for tag_name, val_valid, val_converted in differences:
-        print(f"\n{tag_name}:")
-        print(f"  Válido:     {val_valid}")
-        print(f"  Convertido: {val_converted}")
-
-# Verificar File Meta Information Header
-print("\n" + "="*80)
-print("FILE META INFORMATION HEADER")
-print("="*80)
-
-print("\nArquivo VÁLIDO:")
-if hasattr(ds_valid, 'file_meta'):
-    print(f"  Transfer Syntax UID: {ds_valid.file_meta.TransferSyntaxUID}")
-    print(f"  Implementation Class UID: {getattr(ds_valid.file_meta, 'ImplementationClassUID', 'N/A')}")
-    print(f"  Implementation Version Name: {getattr(ds_valid.file_meta, 'ImplementationVersionName', 'N/A')}")
-else:
-    print("  ✗ Sem File Meta Information Header")
-
-print("\nArquivo CONVERTIDO:")
-if hasattr(ds_converted, 'file_meta'):
-    print(f"  Transfer Syntax UID: {ds_converted.file_meta.TransferSyntaxUID}")
-    print(f"  Implementation Class UID: {getattr(ds_converted.file_meta, 'ImplementationClassUID', 'N/A')}")
-    print(f"  Implementation Version Name: {getattr(ds_converted.file_meta, 'ImplementationVersionName', 'N/A')}")
-else:
-    print("  ✗ Sem File Meta Information Header")
-
-# Verificar tags presentes em cada arquivo
-print("\n" + "="*80)
-print("TAGS PRESENTES EM CADA ARQUIVO")
-print("="*80)
-
-tags_valid = set(ds_valid.dir())
-tags_converted = set(ds_converted.dir())
-
-only_in_valid = tags_valid - tags_converted
-only_in_converted = tags_converted - tags_valid
-
-if only_in_valid:
-    print(f"\n✗ Tags presentes APENAS no arquivo VÁLIDO ({len(only_in_valid)}):")
-    for tag in sorted(list(only_in_valid)[:20]):  # Mostrar apenas as primeiras 20
-        print(f"  - {tag}: {getattr(ds_valid, tag, 'N/A')}")
-    if len(only_in_valid) > 20:
-        print(f"  ... e mais {len(only_in_valid) - 20} tags")
-
-if only_in_converted:
-    print(f"\n✗ Tags presentes APENAS no arquivo CONVERTIDO ({len(only_in_converted)}):")
-    for tag in sorted(list(only_in_converted)[:20]):
-        print(f"  - {tag}: {getattr(ds_converted, tag, 'N/A')}")
-    if len(only_in_converted) > 20:
-        print(f"  ... e mais {len(only_in_converted) - 20} tags")
-
-# Salvar relatório
-output_file = os.path.join(current_dir, "comparacao_dicom.txt")
-with open(output_file, 'w', encoding='utf-8') as f:
-    f.write("="*80 + "\n")
-    f.write("RELATÓRIO DE COMPARAÇÃO DICOM\n")
-    f.write("="*80 + "\n\n")
-
-    f.write(f"Arquivo VÁLIDO: {os.path.basename(file_valid)}\n")
-    f.write(f"Arquivo CONVERTIDO: {os.path.basename(file_converted)}\n\n")
-
-    f.write("DIFERENÇAS ENCONTRADAS:\n")
-    f.write("-"*80 + "\n\n")
-
-    if differences:
+        print(f"\n✗ Encontradas {len(differences)} diferenças:\n")
+
         for tag_name, val_valid, val_converted in differences:
-            f.write(f"{tag_name}:\n")
-            f.write(f"  Válido:     {val_valid}\n")
-            f.write(f"  Convertido: {val_converted}\n\n")
+            print(f"\n{tag_name}:")
+            print(f"  Válido:     {val_valid}")
+            print(f"  Convertido: {val_converted}")
+
+    # Verificar File Meta Information Header
+    print("\n" + "="*80)
+    print("FILE META INFORMATION HEADER")
+    print("="*80)
+
+    print("\nArquivo VÁLIDO:")
+    if hasattr(ds_valid, 'file_meta'):
+        print(f"  Transfer Syntax UID: {ds_valid.file_meta.TransferSyntaxUID}")
+        print(f"  Implementation Class UID: {getattr(ds_valid.file_meta, 'ImplementationClassUID', 'N/A')}")
+        print(f"  Implementation Version Name: {getattr(ds_valid.file_meta, 'ImplementationVersionName', 'N/A')}")
+    else:
+        print("  ✗ Sem File Meta Information Header")
+
+    print("\nArquivo CONVERTIDO:")
+    if hasattr(ds_converted, 'file_meta'):
+        print(f"  Transfer Syntax UID: {ds_converted.file_meta.TransferSyntaxUID}")
+        print(f"  Implementation Class UID: {getattr(ds_converted.file_meta, 'ImplementationClassUID', 'N/A')}")
+        print(f"  Implementation Version Name: {getattr(ds_converted.file_meta, 'ImplementationVersionName', 'N/A')}")
     else:
-        f.write("Nenhuma diferença encontrada.\n\n")
+        print("  ✗ Sem File Meta Information Header")
+
+    # Verificar tags presentes em cada arquivo
+    print("\n" + "="*80)
+    print("TAGS PRESENTES EM CADA ARQUIVO")
+    print("="*80)
+
+    tags_valid = set(ds_valid.dir())
+    tags_converted = set(ds_converted.dir())
+
+    only_in_valid = tags_valid - tags_converted
+    only_in_converted = tags_converted - tags_valid
 
     if only_in_valid:
-        f.write(f"\nTags presentes APENAS no arquivo VÁLIDO:\n")
-        for tag in sorted(only_in_valid):
-            f.write(f"  - {tag}\n")
+        print(f"\n✗ Tags presentes APENAS no arquivo VÁLIDO ({len(only_in_valid)}):")
+        for tag in sorted(list(only_in_valid)[:20]):  # Mostrar apenas as primeiras 20
+            print(f"  - {tag}: {getattr(ds_valid, tag, 'N/A')}")
+        if len(only_in_valid) > 20:
+            print(f"  ... e mais {len(only_in_valid) - 20} tags")
 
     if only_in_converted:
-        f.write(f"\nTags presentes APENAS no arquivo CONVERTIDO:\n")
-        for tag in sorted(only_in_converted):
-            f.write(f"  - {tag}\n")
-
-print(f"\n\nRelatório completo salvo em: {output_file}")
+        print(f"\n✗ Tags presentes APENAS no arquivo CONVERTIDO ({len(only_in_converted)}):")
+        for tag in sorted(list(only_in_converted)[:20]):
+            print(f"  - {tag}: {getattr(ds_converted, tag, 'N/A')}")
+        if len(only_in_converted) > 20:
+            print(f"  ... e mais {len(only_in_converted) - 20} tags")
+
+    # Estatísticas de pixels via memmap (sem carregar o frame inteiro)
+    print("\n" + "="*80)
+    print("ESTATÍSTICAS DE PIXELS (memmap)")
+    print("="*80)
+
+    for label, path in (("Arquivo VÁLIDO", file_valid), ("Arquivo CONVERTIDO", file_converted)):
+        try:
+            pixels, _ = open_dicom_memmap(path)
+            stats = roi_statistics(pixels)
+            print(f"\n{label}: {pixels.shape[-1]} x {pixels.shape[-2]} pixels, {pixels.dtype}")
+            print(f"  Min: {stats['min']:.0f}  Max: {stats['max']:.0f}  "
+                  f"Média: {stats['mean']:.1f}  Desvio: {stats['std']:.1f}")
+        except Exception as e:
+            print(f"\n{label}: ✗ Não foi possível mapear os pixels: {e}")
+
+    # Salvar relatório
+    output_file = os.path.join(os.path.dirname(file_converted), "comparacao_dicom.txt")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("="*80 + "\n")
+        f.write("RELATÓRIO DE COMPARAÇÃO DICOM\n")
+        f.write("="*80 + "\n\n")
+
+        f.write(f"Arquivo VÁLIDO: {os.path.basename(file_valid)}\n")
+        f.write(f"Arquivo CONVERTIDO: {os.path.basename(file_converted)}\n\n")
+
+        f.write("DIFERENÇAS ENCONTRADAS:\n")
+        f.write("-"*80 + "\n\n")
+
+        if differences:
+            for tag_name, val_valid, val_converted in differences:
+                f.write(f"{tag_name}:\n")
+                f.write(f"  Válido:     {val_valid}\n")
+                f.write(f"  Convertido: {val_converted}\n\n")
+        else:
+            f.write("Nenhuma diferença encontrada.\n\n")
+
+        if only_in_valid:
+            f.write(f"\nTags presentes APENAS no arquivo VÁLIDO:\n")
+            for tag in sorted(only_in_valid):
+                f.write(f"  - {tag}\n")
+
+        if only_in_converted:
+            f.write(f"\nTags presentes APENAS no arquivo CONVERTIDO:\n")
+            for tag in sorted(only_in_converted):
+                f.write(f"  - {tag}\n")
+
+    print(f"\n\nRelatório completo salvo em: {output_file}")
+
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar estruturas de arquivos DICOM")
+    parser.add_argument('--pastas', nargs=2, metavar=('REFERENCIA', 'NOVOS'),
+                        help="Modo pasta-vs-pasta: compara todos os arquivos pareados")
+    parser.add_argument('--por-uid', action='store_true',
+                        help="Parear arquivos por SOPInstanceUID em vez do nome")
+    parser.add_argument('--saida', default='diferencas_dicom.csv',
+                        help="Relatório agregado (.csv ou .json)")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs)")
+    parser.add_argument('--ignorar', nargs='*', default=[],
+                        help="Tags a ignorar (ex: SOPInstanceUID FileMeta.MediaStorageSOPInstanceUID)")
+    args = parser.parse_args()
+
+    if args.pastas:
+        compare_folders(args.pastas[0], args.pastas[1], args.saida,
+                        by_uid=args.por_uid, workers=args.processos, ignored=args.ignorar)
+        return
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Arquivos a comparar
+    file_valid = os.path.join(current_dir, "gantry180.dcm")  # Arquivo válido
+    file_converted = os.path.join(current_dir, "DCM4_Processed_converted.dcm")  # Arquivo convertido
+
+    if not compare_single(file_valid, file_converted):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,27 @@ from pydicom.dataset import FileMetaDataset
 from pydicom.uid import ExplicitVRLittleEndian, generate_uid
 import os
 import sys
+import io
+import argparse
+import copy
+import socket
 import json
+import time
+import shutil
+import hashlib
+import fnmatch
+import tempfile
+import threading
+import queue
+import asyncio
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image, ImageTk
+from fix_dicom_header import transcode_to_explicit_le, source_transfer_syntax
+from dicom_memmap import roi_statistics, open_dicom_memmap
 
 # Configurar codificação UTF-8
 if sys.platform == 'win32':
@@ -72,6 +91,2657 @@ class ToolTip:
             self.tooltip_window = None
 
 
+# ============================================================================
+# CLASSE: Lista virtualizada (Treeview)
+# ============================================================================
+
+VIRTUAL_LIST_ROW_HEIGHT = 20
+VIRTUAL_LIST_HEADER_HEIGHT = 24
+
+
+class VirtualList:
+    """
+    Lista (Treeview) virtualizada: só as linhas visíveis existem no widget.
+
+    Os dados ficam fora do widget (row_count/row_values); rolar, editar ou
+    mover itens apenas reescreve os valores das linhas visíveis. Expõe a
+    parte da interface do Listbox usada pelas janelas (curselection,
+    selection_set, selection_clear, nearest, see).
+
+    columns: lista de (chave, título, largura, alinhamento)
+    """
+    def __init__(self, parent, columns, row_count, row_values, height=15):
+        self.row_count = row_count
+        self.row_values = row_values
+        self.visible_rows = height
+        self.top = 0
+        self.selected = None
+        self.slots = []
+        self.row_height = VIRTUAL_LIST_ROW_HEIGHT
+        self.header_height = VIRTUAL_LIST_HEADER_HEIGHT
+
+        self.frame = ttk.Frame(parent)
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(
+            self.frame, columns=[c[0] for c in columns], show="headings", selectmode="browse", height=height
+        )
+        for key, title, width, anchor in columns:
+            self.tree.heading(key, text=title, anchor=anchor)
+            self.tree.column(key, width=width, minwidth=20, anchor=anchor, stretch=(anchor == tk.W))
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<MouseWheel>', lambda e: self.yview('scroll', -1 if e.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda e: self.yview('scroll', -1, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.yview('scroll', 1, 'units'))
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def bind(self, sequence, func):
+        self.tree.bind(sequence, func, add='+')
+
+    def winfo_height(self):
+        return self.tree.winfo_height()
+
+    def refresh(self, first=None, last=None):
+        """Reescrever as linhas visíveis (ou só as dos índices first..last, se visíveis)"""
+        count = self.row_count()
+        self.top = max(0, min(self.top, count - self.visible_rows))
+        shown = max(0, min(self.visible_rows, count - self.top))
+
+        while len(self.slots) < shown:
+            self.slots.append(self.tree.insert('', tk.END, values=()))
+            first = None
+        while len(self.slots) > shown:
+            self.tree.delete(self.slots.pop())
+
+        for row, iid in enumerate(self.slots):
+            index = self.top + row
+            if first is not None and not first <= index <= last:
+                continue
+            self.tree.item(iid, values=self.row_values(index))
+
+        self.show_selection()
+        if count > self.visible_rows:
+            self.scrollbar.set(self.top / count, (self.top + shown) / count)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def show_selection(self):
+        """Refletir a seleção (índice de dados) nas linhas visíveis"""
+        row = None if self.selected is None else self.selected - self.top
+        if row is not None and 0 <= row < len(self.slots):
+            if self.tree.selection() != (self.slots[row],):
+                self.tree.selection_set(self.slots[row])
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+    def on_select(self, event=None):
+        """Seleção feita pelo usuário: guardar o índice de dados"""
+        selection = self.tree.selection()
+        if selection and selection[0] in self.slots:
+            self.selected = self.top + self.slots.index(selection[0])
+
+    def on_resize(self, event):
+        """Recalcular o número de linhas visíveis pela altura do widget"""
+        if self.slots:
+            bbox = self.tree.bbox(self.slots[0])
+            if bbox:
+                self.header_height, self.row_height = bbox[1], max(bbox[3], 1)
+        rows = max(1, (event.height - self.header_height) // self.row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+
+    def yview(self, *args):
+        """Comando da barra de rolagem (moveto / scroll)"""
+        count = self.row_count()
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * count)
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.refresh()
+
+    def see(self, index):
+        """Rolar até o índice ficar visível"""
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible_rows:
+            self.top = index - self.visible_rows + 1
+        self.refresh()
+
+    def curselection(self):
+        count = self.row_count()
+        return (self.selected,) if self.selected is not None and self.selected < count else ()
+
+    def selection_set(self, index):
+        self.selected = index
+        self.see(index)
+
+    def selection_clear(self, *args):
+        self.selected = None
+        self.show_selection()
+
+    def nearest(self, y):
+        """Índice de dados da linha mais próxima da coordenada y"""
+        iid = self.tree.identify_row(y)
+        if iid in self.slots:
+            return self.top + self.slots.index(iid)
+        if not self.slots or y < self.header_height:
+            return self.top
+        return self.top + len(self.slots) - 1
+
+
+# ============================================================================
+# FUNÇÕES: Leitura de TIFF multi-página e criação de RT Image
+# ============================================================================
+
+class TiffFrameReader:
+    """Leitor preguiçoso de TIFF multi-página (apenas um frame em memória por vez)"""
+    def __init__(self, path):
+        self.path = path
+        self._img = Image.open(path)
+        self.n_frames = getattr(self._img, 'n_frames', 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        for index in range(self.n_frames):
+            yield index, self.frame(index)
+
+    def close(self):
+        """Fechar arquivo TIFF"""
+        if self._img is not None:
+            self._img.close()
+            self._img = None
+
+    def frame(self, index):
+        """Ler apenas a página indicada como array NumPy 2D"""
+        self._img.seek(index)
+        page = self._img
+        # Mesma regra do pylinac: imagens multicanal viram int32
+        if len(page.getbands()) > 1:
+            page = page.convert("I")
+        return np.array(page)
+
+    def frame_info(self):
+        """Metadados (info do PIL) da página atual"""
+        return self._img.info
+
+
+def count_tiff_frames(path):
+    """Retorna o número de páginas (frames) de um arquivo TIFF"""
+    with Image.open(path) as img:
+        return getattr(img, 'n_frames', 1)
+
+
+def read_tiff_info(path):
+    """Metadados (info do PIL) da primeira página de um TIFF"""
+    with Image.open(path) as img:
+        return dict(img.info)
+
+
+def iter_tiff_sequence(paths):
+    """Itera todos os frames de uma sequência de TIFFs (multi-página ou arquivos sequenciais)"""
+    for path in paths:
+        with TiffFrameReader(path) as reader:
+            for _, frame in reader:
+                yield frame
+
+
+def integrate_frames(frames, mode="sum"):
+    """
+    Integrar frames de cine em uma única imagem (mode = "sum" ou "mean").
+
+    Usa um acumulador único (uint32 para inteiros sem sinal até 16 bits,
+    float32 nos demais casos) e somas in-place, então o pico de memória
+    é de aproximadamente dois frames, independente do tamanho do cine.
+    A média de inteiros é exata: soma uint32, divisão arredondada só no fim.
+    Retorna (imagem, número de frames).
+    """
+    accumulator = None
+    count = 0
+
+    for frame in frames:
+        if accumulator is None:
+            integer_input = np.issubdtype(frame.dtype, np.unsignedinteger) and frame.itemsize <= 2
+            accumulator = np.zeros(frame.shape, dtype=np.uint32 if integer_input else np.float32)
+        elif frame.shape != accumulator.shape:
+            raise ValueError(
+                f"Frame {count + 1} tem dimensões {frame.shape}, "
+                f"esperado {accumulator.shape}"
+            )
+        np.add(accumulator, frame, out=accumulator, casting='unsafe')
+        count += 1
+
+    if accumulator is None:
+        raise ValueError("Nenhum frame encontrado para integrar")
+
+    if mode == "mean":
+        if integer_input:
+            # Divisão inteira arredondada (metade para cima), in-place no acumulador
+            accumulator += count // 2
+            accumulator //= count
+            return accumulator.astype(np.uint16), count
+        accumulator /= count
+
+    return accumulator, count
+
+
+def resolve_tiff_dpi(info, dpi, sid):
+    """DPI efetivo no isocentro (mesma regra de FileImage.dpi do pylinac)"""
+    tag_dpi = None
+    for key in ("dpi", "resolution"):
+        value = info.get(key)
+        if value is not None:
+            value = float(value[0])
+            if value >= 3:
+                tag_dpi = value
+            break
+
+    effective_dpi = tag_dpi if tag_dpi is not None else dpi
+    if not effective_dpi:
+        raise ValueError("DPI não encontrado no TIFF. Informe o DPI manualmente.")
+    return effective_dpi * sid / 1000
+
+
+# Opções de BitsStored (pixels sempre gravados em uint16)
+BITS_STORED_OPTIONS = ["16", "14", "12"]
+
+
+def stored_pixels(array, bits_stored=16):
+    """
+    Pixels para gravação em uint16 com BitsStored bits, sem intermediários
+    float64. uint8/uint16 que cabem em BitsStored passam sem cópia; os demais
+    (uint16 acima de BitsStored, soma uint32, int32, float32) são reescalados
+    em um único temporário (uint32/int64 ou float32) e convertidos para
+    uint16. O array de entrada não é modificado.
+
+    Retorna (pixels, slope, intercept): valor real = pixel × slope + intercept.
+    """
+    max_stored = (1 << bits_stored) - 1
+    if array.dtype in (np.uint8, np.uint16) and int(array.max()) <= max_stored:
+        return array, 1.0, 0.0
+
+    if np.issubdtype(array.dtype, np.integer):
+        low, high = int(array.min()), int(array.max())
+        if low >= 0 and high <= max_stored:
+            return array.astype(np.uint16), 1.0, 0.0
+        # Slope inteiro: reescala exata em aritmética inteira (arredondada),
+        # em um tipo largo o bastante para (valor - low + slope / 2)
+        slope = max(1, -(-(high - low) // max_stored))
+        unsigned = np.issubdtype(array.dtype, np.unsignedinteger)
+        if unsigned and high - low + slope // 2 <= np.iinfo(np.uint32).max:
+            work_dtype = np.uint32
+        else:
+            work_dtype = np.int64
+        work = array.astype(work_dtype)
+        work -= low
+        work += slope // 2
+        work //= slope
+        np.minimum(work, max_stored, out=work)
+        return work.astype(np.uint16), float(slope), float(low)
+
+    # Ponto flutuante: slope/intercept com a precisão gravada no DICOM (DS)
+    low, high = float(array.min()), float(array.max())
+    slope = float(f"{(high - low) / max_stored * (1 + 1e-7):.8g}") or 1.0
+    intercept = float(f"{low:.8g}")
+    work = np.subtract(array, intercept, dtype=np.promote_types(array.dtype, np.float32))
+    np.multiply(work, 1.0 / slope, out=work)
+    np.rint(work, out=work)
+    np.clip(work, 0, max_stored, out=work)
+    return work.astype(np.uint16), slope, intercept
+
+
+def frame_to_rt_image(array, sid, gantry, coll, couch, dpi, position=None, rescale=None, bits_stored=16):
+    """
+    Criar dataset RT Image a partir de um frame (equivalente a tiff_to_dicom).
+    position: RTImagePosition (mm) do frame recortado, ou None para o frame
+    inteiro (rt_image_position, em mm reais nos dois casos).
+    Pixels fora de uint8/uint16 são reescalados (stored_pixels) e gravados
+    com RescaleSlope/RescaleIntercept; rescale = (slope, intercept) de
+    pixels já reescalados.
+    """
+    from pylinac import image
+    if rescale is None:
+        array, slope, intercept = stored_pixels(array, bits_stored)
+    else:
+        slope, intercept = rescale
+
+    ds = image.array_to_dicom(
+        array=array,
+        sid=sid,
+        gantry=gantry,
+        coll=coll,
+        couch=couch,
+        dpi=dpi
+    )
+    ds.BitsStored = min(bits_stored, ds.BitsAllocated)
+    ds.HighBit = ds.BitsStored - 1
+    if (slope, intercept) != (1.0, 0.0):
+        ds.RescaleSlope = f"{slope:.8g}"
+        ds.RescaleIntercept = f"{intercept:.8g}"
+        ds.RescaleType = "US"
+    if position is None:
+        position = rt_image_position(array.shape, dpi)
+    ds.RTImagePosition = [float(position[0]), float(position[1])]
+    return ds
+
+
+def save_dataset(ds, target):
+    """Gravar o dataset (caminho ou buffer)"""
+    ds.save_as(target, write_like_original=False)
+
+
+# Modos de integração de cine (rótulo na interface → modo de integrate_frames)
+INTEGRATION_MODES = {
+    "Soma": "sum",
+    "Média": "mean",
+}
+
+# Conversor em lote: rótulo → (modo, escopo). Escopo "file" integra cada TIFF
+# multi-página; "folder" integra todos os TIFFs sequenciais da pasta
+BATCH_INTEGRATION_MODES = {
+    "Soma por arquivo": ("sum", "file"),
+    "Média por arquivo": ("mean", "file"),
+    "Soma da pasta": ("sum", "folder"),
+    "Média da pasta": ("mean", "folder"),
+}
+
+
+def frame_output_name(base_name, index):
+    """Nome de saída de um frame de TIFF multi-página"""
+    return f"{base_name}_f{index:03d}"
+
+
+def make_conversion_job(sources, page, name, item, gantry=None, integrate=None):
+    """Criar uma entrada da lista de conversões"""
+    return {
+        "tiff_file": sources[0],
+        "sources": sources,
+        "page": page,
+        "integrate": integrate,
+        "name": name,
+        "gantry": float(item['gantry']) if gantry is None else gantry,
+        "coll": float(item['coll']),
+        "couch": float(item['couch'])
+    }
+
+
+def plan_conversion_jobs(tiff_files, items, page_count, integration=None,
+                         split_pages=False, page_angles="Template", page_step=0):
+    """
+    Montar lista de conversões (arquivo, página, nome e ângulos) a partir dos
+    arquivos em ordem e dos itens do template.
+
+    page_count(arquivo) → número de páginas; integration = (modo, escopo) de
+    BATCH_INTEGRATION_MODES ou None; page_angles "Template" ou "Passo angular".
+    """
+    jobs = []
+
+    if integration:
+        mode, scope = integration
+        if scope == "folder":
+            if tiff_files and items:
+                jobs.append(make_conversion_job(list(tiff_files), None, items[0]['name'], items[0], integrate=mode))
+        else:
+            for tiff_file, item in zip(tiff_files, items):
+                jobs.append(make_conversion_job([tiff_file], None, item['name'], item, integrate=mode))
+        return jobs
+
+    if not split_pages:
+        for tiff_file, item in zip(tiff_files, items):
+            jobs.append(make_conversion_job([tiff_file], None, item['name'], item))
+        return jobs
+
+    if page_angles == "Template":
+        # Cada página consome o próximo item do template
+        remaining = iter(items)
+        for tiff_file in tiff_files:
+            for page in range(page_count(tiff_file)):
+                item = next(remaining, None)
+                if item is None:
+                    return jobs
+                jobs.append(make_conversion_job([tiff_file], page, item['name'], item))
+        return jobs
+
+    # Passo angular: um item por arquivo, gantry incrementado por página
+    step = float(page_step)
+    for tiff_file, item in zip(tiff_files, items):
+        n_pages = page_count(tiff_file)
+        for page in range(n_pages):
+            name = item['name'] if n_pages == 1 else frame_output_name(item['name'], page)
+            gantry = (float(item['gantry']) + page * step) % 360
+            jobs.append(make_conversion_job([tiff_file], page, name, item, gantry=gantry))
+    return jobs
+
+
+# ============================================================================
+# FUNÇÕES: Verificação prévia de qualidade (pre-flight)
+# ============================================================================
+
+# Maior lado da vista reduzida usada na verificação (pixels)
+PREFLIGHT_MAX_SIZE = 512
+
+# Limites da verificação prévia
+PREFLIGHT_LIMITS = {
+    'max_saturation': 0.01,     # fração dos pixels do campo no valor de saturação
+    'min_cnr': 8.0,             # contraste campo/fundo em unidades de ruído (abaixo: imagem em branco)
+    'min_coverage': 0.0005,     # fração da imagem ocupada pelo campo
+    'max_coverage': 0.6,
+    'max_offset': 0.25,         # distância do centro do campo ao centro da imagem (fração)
+    'min_snr': 20.0,            # nível do campo / ruído do fundo
+    'bb_sigma': 6.0,            # profundidade mínima da BB (média móvel) em unidades de ruído
+    'min_bb_contrast': 0.03,    # profundidade mínima da BB (fração do nível do campo)
+}
+
+# Busca da BB: o campo é amostrado com ~PREFLIGHT_BB_FIELD_SIZE pixels de
+# largura e a média móvel tem lado = largura do campo / divisor (menor que a BB)
+PREFLIGHT_BB_FIELD_SIZE = 128
+PREFLIGHT_BB_BOX_DIVISOR = 8
+
+
+def downsample_view(array, max_size=PREFLIGHT_MAX_SIZE):
+    """Vista reduzida por passo (sem cópia) com o maior lado <= max_size"""
+    step = max(1, -(-max(array.shape[-2:]) // max_size))
+    return array[..., ::step, ::step]
+
+
+def box_mean(array, size):
+    """Média móvel size × size (imagem integral, só NumPy), apenas posições completas"""
+    integral = np.zeros((array.shape[0] + 1, array.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(array, axis=0, dtype=np.float64), axis=1, out=integral[1:, 1:])
+    total = integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+    return total / (size * size)
+
+
+def preflight_check(array, max_size=PREFLIGHT_MAX_SIZE, limits=PREFLIGHT_LIMITS, bits_stored=None):
+    """
+    Verificação rápida de uma imagem WL antes da conversão (vista reduzida).
+
+    Calcula saturação, contraste, cobertura e centralização do campo, SNR
+    e presença da BB: depressão compacta no interior do campo, procurada na
+    média móvel (lado ~ fração da largura do campo) para que o ruído de
+    pixels isolados não conte como BB.
+    O campo pode ser mais claro ou mais escuro que o fundo. Saturação é
+    medida em (1 << bits_stored) − 1, ou no máximo do frame quando ele é
+    2^n − 1 (painéis de 12/14 bits gravados em uint16). Retorna dicionário
+    com as métricas, 'issues' (lista de problemas) e 'ok'.
+    """
+    view = np.asarray(downsample_view(array, max_size), dtype=np.float32)
+    issues = []
+
+    # Fundo e ruído pela borda da imagem
+    border = max(1, min(view.shape) // 20)
+    edges = np.concatenate([
+        view[:border].ravel(), view[-border:].ravel(),
+        view[border:-border, :border].ravel(), view[border:-border, -border:].ravel(),
+    ])
+    background = float(np.median(edges))
+    noise = max(1.4826 * float(np.median(np.abs(edges - background))), 1e-6)
+
+    # Percentis extremos: o campo de WL pode ocupar bem menos de 1% da imagem
+    low, high = np.percentile(view, [0.01, 99.99])
+    bright_field = high - background >= background - low
+    if bright_field:
+        signal = view - background
+        peak = float(high - background)
+    else:
+        signal = background - view
+        peak = float(background - low)
+    cnr = peak / noise
+
+    field = signal > 0.5 * peak
+    coverage = float(field.mean())
+
+    saturation = 0.0
+    if np.issubdtype(array.dtype, np.integer):
+        ceiling = np.iinfo(array.dtype).max
+        if bits_stored:
+            ceiling = min(ceiling, (1 << bits_stored) - 1)
+        top = int(view.max())
+        if 255 <= top < ceiling and top & (top + 1) == 0:
+            ceiling = top
+        saturated = view >= ceiling
+        saturation = np.count_nonzero(saturated & field) / max(np.count_nonzero(field), 1)
+    field_level = float(np.median(signal[field])) if field.any() else 0.0
+    snr = field_level / noise
+
+    offset = 1.0
+    bb_found = False
+    if field.any():
+        rows = np.flatnonzero(field.any(axis=1))
+        cols = np.flatnonzero(field.any(axis=0))
+        center_row = (rows[0] + rows[-1]) / 2
+        center_col = (cols[0] + cols[-1]) / 2
+        offset = max(abs(center_row / view.shape[0] - 0.5), abs(center_col / view.shape[1] - 0.5))
+
+        # BB: depressão no interior do campo (sem penumbra), procurada no
+        # frame original com passo próprio (campos pequenos somem na vista).
+        # A média móvel de size² pixels reduz o ruído para σ / size; a
+        # depressão precisa ter bb_sigma desse ruído e ocupar só uma parte do
+        # interior (abaixo da mediana do interior). σ é o maior entre o ruído do fundo e o do campo
+        # (diferenças entre vizinhos, que ignoram o perfil do campo)
+        step = max(1, -(-max(array.shape[-2:]) // max_size))
+        r0, r1 = rows[0] * step, rows[-1] * step + 1
+        c0, c1 = cols[0] * step, cols[-1] * step + 1
+        margin_r = max(1, (r1 - r0) // 6)
+        margin_c = max(1, (c1 - c0) // 6)
+        inner_step = max(1, min(r1 - r0, c1 - c0) // PREFLIGHT_BB_FIELD_SIZE)
+        inner = np.asarray(array[r0 + margin_r:r1 - margin_r:inner_step,
+                                 c0 + margin_c:c1 - margin_c:inner_step], dtype=np.float32)
+        inner = inner - background if bright_field else background - inner
+        if min(inner.shape) >= 2:
+            steps = np.diff(inner, axis=1)
+            field_noise = 1.4826 * float(np.median(np.abs(steps - np.median(steps)))) / np.sqrt(2)
+            size = max(2, min(r1 - r0, c1 - c0) // inner_step // PREFLIGHT_BB_BOX_DIVISOR)
+            size = min(size, *inner.shape)
+            smoothed = box_mean(inner, size)
+            inner_level = float(np.median(inner))
+            depth = inner_level - float(smoothed.min())
+            threshold = max(limits['bb_sigma'] * max(noise, field_noise) / size,
+                            limits['min_bb_contrast'] * inner_level)
+            if depth > threshold:
+                # Depressão compacta, sem tocar a borda do interior (queda do perfil do campo)
+                dip = smoothed < inner_level - depth / 2
+                edge = dip[0].any() or dip[-1].any() or dip[:, 0].any() or dip[:, -1].any()
+                bb_found = bool(not edge and np.count_nonzero(dip) < 0.6 * dip.size)
+
+    if saturation > limits['max_saturation']:
+        issues.append(f"saturação: {saturation:.1%} do campo no valor máximo")
+    if cnr < limits['min_cnr']:
+        issues.append(f"imagem em branco (contraste/ruído {cnr:.1f})")
+    elif coverage < limits['min_coverage']:
+        issues.append("campo não encontrado")
+    elif coverage > limits['max_coverage']:
+        issues.append(f"campo grande demais ({coverage:.0%} da imagem)")
+    elif offset > limits['max_offset']:
+        issues.append("campo fora do centro da imagem")
+    if cnr >= limits['min_cnr'] and snr < limits['min_snr']:
+        issues.append(f"SNR baixo ({snr:.1f})")
+    if cnr >= limits['min_cnr'] and coverage >= limits['min_coverage'] and not bb_found:
+        issues.append("BB não detectada no campo")
+
+    return {
+        'saturation': saturation,
+        'cnr': cnr,
+        'coverage': coverage,
+        'offset': offset,
+        'snr': snr,
+        'bb': bb_found,
+        'issues': issues,
+        'ok': not issues,
+    }
+
+
+# ============================================================================
+# FUNÇÕES: Estimativa rápida BB / centro do campo
+# ============================================================================
+
+# Meia-largura da ROI (pixels da imagem original) usada no refinamento da BB
+BB_ROI_HALF_SIZE = 24
+
+
+def edge_center(profile, level):
+    """Centro entre as bordas (cruzamento de 'level', interpolado) de um perfil"""
+    above = np.flatnonzero(profile > level)
+    if above.size == 0:
+        return None
+    first, last = above[0], above[-1]
+    left = float(first)
+    if first > 0:
+        left = first - (profile[first] - level) / (profile[first] - profile[first - 1])
+    right = float(last)
+    if last < profile.size - 1:
+        right = last + (profile[last] - level) / (profile[last] - profile[last + 1])
+    return float(left + right) / 2
+
+
+def estimate_bb_offset(array, dpi=None, max_size=PREFLIGHT_MAX_SIZE):
+    """
+    Estimativa rápida (só NumPy) do deslocamento BB → centro do campo.
+
+    Limiar de 50% e centro do campo pelas bordas interpoladas dos perfis;
+    BB localizada na vista reduzida e refinada (centróide ponderado pela
+    atenuação) em uma ROI pequena da imagem original. dpi é a resolução no
+    isocentro; sem dpi o resultado fica em pixels. Retorna dicionário com
+    campo, bb (linha, coluna), dx, dy, r e unidade, ou None se não encontrar.
+    """
+    start_time = time.perf_counter()
+    view = np.asarray(downsample_view(array, max_size), dtype=np.float32)
+    step = max(1, -(-max(array.shape[-2:]) // max_size))
+
+    # Fundo pela borda; campo pode ser mais claro ou mais escuro que o fundo
+    border = max(1, min(view.shape) // 20)
+    background = float(np.median(np.concatenate([view[:border].ravel(), view[-border:].ravel()])))
+    low, high = np.percentile(view, [0.01, 99.99])
+    sign = 1.0 if high - background >= background - low else -1.0
+    signal = sign * (view - background)
+    field = signal > 0.5 * float(signal.max())
+    if not field.any():
+        return None
+
+    rows = np.flatnonzero(field.any(axis=1))
+    cols = np.flatnonzero(field.any(axis=0))
+    field_level = float(np.median(signal[field]))
+
+    # Centro do campo: perfis médios pelo miolo do campo (imagem original)
+    r0, r1 = rows[0] * step, rows[-1] * step + 1
+    c0, c1 = cols[0] * step, cols[-1] * step + 1
+    mid_r = slice(r0 + (r1 - r0) // 4, r1 - (r1 - r0) // 4 + 1)
+    mid_c = slice(c0 + (c1 - c0) // 4, c1 - (c1 - c0) // 4 + 1)
+    row_profile = sign * (array[:, mid_c].mean(axis=1, dtype=np.float32) - background)
+    col_profile = sign * (array[mid_r, :].mean(axis=0, dtype=np.float32) - background)
+    field_row = edge_center(row_profile, 0.5 * field_level)
+    field_col = edge_center(col_profile, 0.5 * field_level)
+    if field_row is None or field_col is None:
+        return None
+
+    # BB (aproximada): ponto mais atenuado no interior do campo (vista reduzida)
+    margin_r = max(1, (rows[-1] - rows[0]) // 6)
+    margin_c = max(1, (cols[-1] - cols[0]) // 6)
+    inner = signal[rows[0] + margin_r:rows[-1] - margin_r + 1, cols[0] + margin_c:cols[-1] - margin_c + 1]
+    if inner.size == 0:
+        return None
+    coarse_r, coarse_c = np.unravel_index(np.argmin(inner), inner.shape)
+    coarse_r = (coarse_r + rows[0] + margin_r) * step
+    coarse_c = (coarse_c + cols[0] + margin_c) * step
+
+    # Refinamento sub-pixel: centróide da atenuação em uma ROI pequena,
+    # limitada ao interior do campo (a penumbra deslocaria o centróide)
+    half = BB_ROI_HALF_SIZE + step
+    roi_r0 = max((rows[0] + margin_r) * step, coarse_r - half)
+    roi_c0 = max((cols[0] + margin_c) * step, coarse_c - half)
+    roi_r1 = min((rows[-1] - margin_r + 1) * step, coarse_r + half + 1)
+    roi_c1 = min((cols[-1] - margin_c + 1) * step, coarse_c + half + 1)
+    roi = sign * (np.asarray(array[roi_r0:roi_r1, roi_c0:roi_c1], dtype=np.float32) - background)
+    if roi.size == 0:
+        return None
+    local_level = float(np.percentile(roi, 90))
+    weights = np.clip(local_level - roi, 0, None)
+    weights[weights < 0.5 * float(weights.max())] = 0
+    total = float(weights.sum())
+    if total <= 0:
+        return None
+    grid_r, grid_c = np.indices(roi.shape)
+    bb_row = roi_r0 + float((weights * grid_r).sum()) / total
+    bb_col = roi_c0 + float((weights * grid_c).sum()) / total
+
+    scale = 25.4 / dpi if dpi else 1.0
+    dx = (bb_col - field_col) * scale
+    dy = (bb_row - field_row) * scale
+    return {
+        'field': (field_row, field_col),
+        'bb': (bb_row, bb_col),
+        'dx': dx,
+        'dy': dy,
+        'r': float(np.hypot(dx, dy)),
+        'unit': 'mm' if dpi else 'px',
+        'ms': (time.perf_counter() - start_time) * 1000,
+    }
+
+
+# ============================================================================
+# FUNÇÕES: Correção flat-field / dark-field
+# ============================================================================
+
+# Mapas de calibração convertidos (float32 .npy, abertos em memmap)
+CALIBRATION_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".conversor_dicom", "calibracao")
+
+# Calibrações já abertas neste processo (chave: arquivos dark/flood)
+_calibration_cache = {}
+
+
+def calibration_key(*paths):
+    """Chave dos mapas de calibração: caminho, tamanho e data de modificação dos arquivos"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def load_calibration_map(path):
+    """Mapa de calibração como float32 (.npy, ou TIFF com média das páginas)"""
+    if path.lower().endswith('.npy'):
+        return np.load(path).astype(np.float32, copy=False)
+    total, count = integrate_frames(iter_tiff_sequence([path]), "sum")
+    return np.divide(total, count, dtype=np.float32)
+
+
+def save_array_atomic(path, array):
+    """Gravar .npy via arquivo temporário + os.replace"""
+    temp_path = path + ".parcial"
+    with open(temp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(temp_path, path)
+
+
+class FlatFieldCalibration:
+    """
+    Correção de ganho do painel: (raw - dark) / (flood - dark).
+
+    Na primeira vez os mapas são convertidos para float32 no cache local:
+    o dark e o ganho já normalizado pela média de (flood - dark), então a
+    imagem corrigida mantém a escala original. Depois são apenas abertos
+    em memmap. A correção é in-place, com um único buffer de trabalho
+    reutilizado entre arquivos (uso por uma thread por vez).
+    """
+    def __init__(self, dark_path, flood_path, cache_dir=CALIBRATION_CACHE_DIR):
+        key = calibration_key(dark_path, flood_path)
+        dark_file = os.path.join(cache_dir, f"{key}_dark.npy")
+        gain_file = os.path.join(cache_dir, f"{key}_ganho.npy")
+        if not (os.path.exists(dark_file) and os.path.exists(gain_file)):
+            os.makedirs(cache_dir, exist_ok=True)
+            self.build(dark_path, flood_path, dark_file, gain_file)
+
+        self.dark = np.load(dark_file, mmap_mode='r')
+        self.gain = np.load(gain_file, mmap_mode='r')
+        self.shape = self.dark.shape
+        self._work = None
+
+    @staticmethod
+    def build(dark_path, flood_path, dark_file, gain_file):
+        """Converter os mapas dark/flood em dark + ganho normalizado (float32)"""
+        dark = load_calibration_map(dark_path)
+        flood = load_calibration_map(flood_path)
+        if dark.shape != flood.shape:
+            raise ValueError(f"Dark {dark.shape} e flood {flood.shape} têm dimensões diferentes")
+
+        np.subtract(flood, dark, out=flood)
+        valid = flood > 0
+        if not valid.any():
+            raise ValueError("Flood não é maior que o dark em nenhum pixel")
+
+        # Pixels sem resposta no flood (mortos) ficam com ganho 0
+        gain = np.zeros_like(flood)
+        np.divide(float(flood[valid].mean()), flood, out=gain, where=valid)
+
+        save_array_atomic(dark_file, dark)
+        save_array_atomic(gain_file, gain)
+
+    def apply(self, pixels, frames=1):
+        """
+        Corrigir o frame in-place, mantendo o tipo de pixel. frames é o número
+        de frames somados (imagem integrada por soma: dark × frames).
+        """
+        if pixels.shape != self.shape:
+            raise ValueError(f"Imagem {pixels.shape} e mapas de calibração {self.shape} têm dimensões diferentes")
+        if self._work is None:
+            self._work = np.empty(self.shape, dtype=np.float32)
+        work = self._work
+
+        if frames == 1:
+            np.subtract(pixels, self.dark, out=work)
+        else:
+            np.multiply(self.dark, frames, out=work)
+            np.subtract(pixels, work, out=work)
+        np.multiply(work, self.gain, out=work)
+
+        if np.issubdtype(pixels.dtype, np.integer):
+            limits = np.iinfo(pixels.dtype)
+            np.rint(work, out=work)
+            np.clip(work, limits.min, limits.max, out=work)
+        np.copyto(pixels, work, casting='unsafe')
+        return pixels
+
+
+def load_calibration(dark_path, flood_path):
+    """Calibração flat-field carregada uma vez e reutilizada (cache do processo)"""
+    key = calibration_key(dark_path, flood_path)
+    if key not in _calibration_cache:
+        _calibration_cache[key] = FlatFieldCalibration(dark_path, flood_path)
+    return _calibration_cache[key]
+
+
+# ============================================================================
+# FUNÇÕES: Orientação (rotação/espelhamento sem cópia)
+# ============================================================================
+
+# Orientação (rótulo na interface / chave "orientation" do template) →
+# (rotações de 90° no sentido anti-horário, espelhamento horizontal depois)
+ORIENTATION_MODES = {
+    "Original": (0, False),
+    "Girar 90° (anti-horário)": (1, False),
+    "Girar 180°": (2, False),
+    "Girar 270° (anti-horário)": (3, False),
+    "Espelhar horizontal": (0, True),
+    "Espelhar vertical": (2, True),
+    "Transpor": (3, True),
+    "Transpor (anti-diagonal)": (1, True),
+}
+
+
+def orient_view(array, orientation="Original"):
+    """
+    Aplicar rotação/espelhamento como view NumPy (sem copiar o frame).
+    Os pixels só são materializados na serialização (cópia para o bloco
+    de memória compartilhada ou tobytes do pylinac).
+    """
+    rotations, mirror = ORIENTATION_MODES[orientation]
+    view = np.rot90(array, rotations) if rotations else array
+    return view[:, ::-1] if mirror else view
+
+
+# ============================================================================
+# FUNÇÕES: Recorte (ROI) e binning antes da conversão
+# ============================================================================
+
+# Margem em torno do campo no recorte automático (mm no isocentro)
+CROP_MARGIN_MM = 20.0
+
+# Opções de recorte (rótulo na interface)
+CROP_MODES = ["Desligado", "Automático", "Tamanho fixo"]
+BATCH_CROP_MODES = ["Desligado", "Automático", "Template"]
+
+
+def field_bounds(array, max_size=PREFLIGHT_MAX_SIZE):
+    """Caixa do campo (linha0, linha1, coluna0, coluna1) em pixels da imagem original, ou None"""
+    view = np.asarray(downsample_view(array, max_size), dtype=np.float32)
+    step = max(1, -(-max(array.shape[-2:]) // max_size))
+
+    border = max(1, min(view.shape) // 20)
+    background = float(np.median(np.concatenate([view[:border].ravel(), view[-border:].ravel()])))
+    low, high = np.percentile(view, [0.01, 99.99])
+    signal = view - background if high - background >= background - low else background - view
+    field = signal > 0.5 * float(signal.max())
+    if not field.any():
+        return None
+
+    rows = np.flatnonzero(field.any(axis=1))
+    cols = np.flatnonzero(field.any(axis=0))
+    return (rows[0] * step, min((rows[-1] + 1) * step, array.shape[0]),
+            cols[0] * step, min((cols[-1] + 1) * step, array.shape[1]))
+
+
+def crop_box(shape, dpi, bounds, crop_mm=None, margin_mm=CROP_MARGIN_MM, binning=1):
+    """
+    Região de recorte em torno do campo: caixa do campo + margem, ou um
+    quadrado de crop_mm de lado centrado no campo. As dimensões são
+    múltiplas do binning.
+    """
+    pixels_per_mm = dpi / 25.4
+    if crop_mm:
+        center_r = (bounds[0] + bounds[1]) / 2
+        center_c = (bounds[2] + bounds[3]) / 2
+        half = crop_mm * pixels_per_mm / 2
+        r0, r1, c0, c1 = center_r - half, center_r + half, center_c - half, center_c + half
+    else:
+        margin = margin_mm * pixels_per_mm
+        r0, r1, c0, c1 = bounds[0] - margin, bounds[1] + margin, bounds[2] - margin, bounds[3] + margin
+
+    r0 = max(0, int(round(r0)))
+    c0 = max(0, int(round(c0)))
+    r1 = min(shape[0], int(round(r1)))
+    c1 = min(shape[1], int(round(c1)))
+    r1 -= (r1 - r0) % binning
+    c1 -= (c1 - c0) % binning
+    return r0, r1, c0, c1
+
+
+def bin_pixels(array, factor):
+    """
+    Binning factor×factor (média), preservando o tipo de pixel (sem float64).
+    Soma fatias com passo direto no acumulador, então funciona sobre views
+    (recorte, rotação) sem materializar o frame.
+    """
+    rows = array.shape[0] // factor * factor
+    cols = array.shape[1] // factor * factor
+    if not np.issubdtype(array.dtype, np.integer):
+        acc_dtype = np.float32
+    elif array.itemsize <= 2:
+        acc_dtype = np.uint32 if np.issubdtype(array.dtype, np.unsignedinteger) else np.int32
+    else:
+        acc_dtype = np.uint64 if np.issubdtype(array.dtype, np.unsignedinteger) else np.int64
+
+    binned = np.zeros((rows // factor, cols // factor), dtype=acc_dtype)
+    for row in range(factor):
+        for col in range(factor):
+            np.add(binned, array[row:rows:factor, col:cols:factor], out=binned, casting='unsafe')
+
+    count = factor * factor
+    if acc_dtype == np.float32:
+        binned /= count
+    else:
+        # Divisão inteira arredondada in-place
+        np.add(binned, count // 2, out=binned, casting='unsafe')
+        np.floor_divide(binned, count, out=binned)
+    return binned.astype(array.dtype, copy=False)
+
+
+def rt_image_position(shape, dpi, row=0, column=0, binning=1):
+    """
+    RTImagePosition (mm, pixel de 25.4/dpi como ImagePlanePixelSpacing): centro
+    do primeiro pixel (após binning) em relação ao centro da imagem de formato
+    shape, com a mesma orientação de eixos do pylinac (array_to_dicom).
+    O array_to_dicom do pylinac usa o dpi como pixels por mm nesta tag.
+    """
+    pixel_mm = 25.4 / dpi
+    return [
+        (column + binning / 2 - shape[1] / 2) * pixel_mm,
+        (row + binning / 2 - shape[0] / 2) * pixel_mm,
+    ]
+
+
+def reduce_frame(array, dpi, crop=None, binning=1):
+    """
+    Recortar em torno do campo e/ou aplicar binning antes da conversão.
+
+    crop: None (sem recorte), 'auto' (campo + margem) ou lado do quadrado
+    em mm. dpi é a resolução no isocentro. Retorna (pixels, dpi, position):
+    o dpi é dividido pelo binning (ImagePlanePixelSpacing multiplicado) e
+    position é o RTImagePosition (mm) do primeiro pixel em relação ao
+    centro da imagem original, ou None se nada foi alterado.
+    """
+    if crop is None and binning == 1:
+        return array, dpi, None
+
+    r0, r1, c0, c1 = 0, array.shape[0], 0, array.shape[1]
+    if crop is not None:
+        bounds = field_bounds(array)
+        if bounds is None:
+            raise ValueError("Campo não encontrado para o recorte (ROI)")
+        r0, r1, c0, c1 = crop_box(array.shape, dpi, bounds, None if crop == 'auto' else crop, binning=binning)
+
+    reduced = array[r0:r1, c0:c1]
+    if binning > 1:
+        reduced = bin_pixels(reduced, binning)
+
+    position = rt_image_position(array.shape, dpi, r0, c0, binning)
+    return reduced, dpi / binning, position
+
+
+# ============================================================================
+# FUNÇÕES: Correção de header de .img e conversão em lote
+# ============================================================================
+
+def sanitize_filename(text):
+    """Remover caracteres inválidos em nomes de arquivo"""
+    filename = text.replace(':', '').replace('/', '_').replace('\\', '_')
+    filename = filename.replace('*', '').replace('?', '').replace('"', '')
+    filename = filename.replace('<', '').replace('>', '').replace('|', '')
+    return filename.strip()
+
+
+def generate_output_filename(ds, input_path, output_dir=None, reserve=False):
+    """
+    Gerar nome de arquivo baseado nos campos DICOM.
+
+    Com reserve=True o arquivo é criado vazio de forma atômica (O_EXCL),
+    para que processos paralelos gravando na mesma pasta nunca escolham
+    o mesmo nome.
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(input_path)
+    series_desc = str(getattr(ds, 'SeriesDescription', '')).strip()
+    rt_label = str(getattr(ds, 'RTImageLabel', '')).strip()
+    patient_id = str(getattr(ds, 'PatientID', '')).strip()
+    study_date = str(getattr(ds, 'StudyDate', '')).strip()
+
+    filename = None
+
+    if series_desc and series_desc != 'N/A':
+        filename = sanitize_filename(series_desc)
+
+    if not filename and rt_label and rt_label != 'N/A':
+        filename = sanitize_filename(rt_label)
+
+    if not filename and patient_id and patient_id != 'N/A':
+        filename = f"{patient_id}"
+        if study_date and study_date != 'N/A':
+            filename += f"_{study_date}"
+
+    if not filename:
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        filename = f"{base_name}_converted"
+
+    filename = filename.strip()
+    if not filename:
+        filename = "converted"
+
+    output_path = os.path.join(output_dir, f"{filename}.dcm")
+
+    counter = 1
+    while True:
+        if not reserve:
+            if not os.path.exists(output_path):
+                return output_path
+        else:
+            try:
+                os.close(os.open(output_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return output_path
+            except FileExistsError:
+                pass
+        output_path = os.path.join(output_dir, f"{filename}_{counter}.dcm")
+        counter += 1
+
+
+def fix_img_header(ds):
+    """Criar ou corrigir o File Meta Information Header de um dataset .img"""
+    if not hasattr(ds, 'file_meta') or not ds.file_meta:
+        ds.file_meta = FileMetaDataset()
+
+    if not hasattr(ds.file_meta, 'TransferSyntaxUID') or not ds.file_meta.TransferSyntaxUID:
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    if not hasattr(ds.file_meta, 'MediaStorageSOPClassUID'):
+        if hasattr(ds, 'SOPClassUID'):
+            ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+
+    if not hasattr(ds.file_meta, 'MediaStorageSOPInstanceUID'):
+        if hasattr(ds, 'SOPInstanceUID'):
+            ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+
+    if not hasattr(ds.file_meta, 'ImplementationClassUID'):
+        ds.file_meta.ImplementationClassUID = generate_uid()
+
+    if not hasattr(ds.file_meta, 'ImplementationVersionName'):
+        ds.file_meta.ImplementationVersionName = "PYDICOM_" + pydicom.__version__
+
+    return ds
+
+
+# Cache de headers analisados: (caminho, tamanho, mtime) -> (header, force)
+HEADER_CACHE_SIZE = 64
+_header_cache = OrderedDict()
+
+
+def has_dicm_preamble(path):
+    """Verificar se o arquivo tem preâmbulo DICOM Part 10 ('DICM' no byte 128)"""
+    with open(path, 'rb') as f:
+        return f.read(132)[128:132] == b'DICM'
+
+
+def read_img_header(path):
+    """
+    Ler apenas o header de um .img (sem pixels), com cache por
+    caminho, tamanho e mtime.
+
+    Retorna (header, force), onde force indica se o arquivo precisa de
+    force=True (sem preâmbulo) para a leitura completa na conversão.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key in _header_cache:
+        _header_cache.move_to_end(key)
+        return _header_cache[key]
+
+    force = not has_dicm_preamble(path)
+    header = pydicom.dcmread(path, stop_before_pixels=True, force=force)
+
+    _header_cache[key] = (header, force)
+    if len(_header_cache) > HEADER_CACHE_SIZE:
+        _header_cache.popitem(last=False)
+    return header, force
+
+
+def read_img_dataset(path, force=None):
+    """Leitura completa (com pixels) de um .img, em uma única passada"""
+    if force is None:
+        force = not has_dicm_preamble(path)
+    return pydicom.dcmread(path, force=force)
+
+
+def find_img_files(folder, recursive=True):
+    """Listar arquivos .img da pasta (e subpastas, se recursive)"""
+    found = []
+    if recursive:
+        for root, _, names in os.walk(folder):
+            found.extend(os.path.join(root, name) for name in names if name.lower().endswith('.img'))
+    else:
+        found = [os.path.join(folder, name) for name in os.listdir(folder)
+                 if name.lower().endswith('.img') and os.path.isfile(os.path.join(folder, name))]
+    return sorted(found)
+
+
+def convert_img_job(job):
+    """
+    Worker do modo em lote: corrigir header de um .img e salvar com o nome
+    gerado por generate_output_filename na subpasta espelhada de saída.
+    """
+    input_path, output_dir, transcode = job
+    start_time = datetime.now()
+    output_path = None
+    try:
+        ds = read_img_dataset(input_path)
+
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = generate_output_filename(ds, input_path, output_dir, reserve=True)
+        fix_img_header(ds)
+        if transcode:
+            transcode_to_explicit_le(ds)
+        save_dataset(ds, output_path)
+        pydicom.dcmread(output_path, stop_before_pixels=True)
+        error = None
+    except Exception as e:
+        error = str(e)
+        if output_path and os.path.exists(output_path) and os.path.getsize(output_path) == 0:
+            os.remove(output_path)
+        output_path = None
+
+    return {
+        'input': input_path,
+        'output': output_path,
+        'bytes': os.path.getsize(input_path) if os.path.exists(input_path) else 0,
+        'seconds': (datetime.now() - start_time).total_seconds(),
+        'error': error,
+    }
+
+
+# ============================================================================
+# FUNÇÕES: Pipeline da conversão em lote TIFF (estágios + memória compartilhada)
+# ============================================================================
+
+def frame_buffer_size(path):
+    """
+    Tamanho (bytes) do maior frame que um item de conversão grava no bloco:
+    os pixels já passaram por stored_pixels (no máximo uint16) e recorte/
+    binning só reduzem o frame.
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+    return width * height * 2
+
+
+class SharedFramePool:
+    """
+    Blocos de memória compartilhada reutilizáveis para os pixels dos frames.
+
+    Criados e liberados (unlink) apenas pelo processo principal; os workers
+    só anexam o bloco pelo nome (attach), leem/escrevem e fecham. Entre
+    processos trafegam apenas descritores pequenos (nome, forma, dtype).
+    acquire aguarda um bloco livre, então o número de blocos limita a
+    memória do pipeline (backpressure entre estágios).
+    """
+    def __init__(self, block_size, count):
+        self.blocks = [
+            shared_memory.SharedMemory(create=True, size=max(block_size, 1))
+            for _ in range(count)
+        ]
+        self.free = asyncio.Queue()
+        for block in self.blocks:
+            self.free.put_nowait(block)
+
+    async def acquire(self):
+        """Reservar um bloco livre (aguarda a devolução de um bloco em uso)"""
+        return await self.free.get()
+
+    def release(self, block):
+        """Devolver bloco ao pool"""
+        self.free.put_nowait(block)
+
+    @staticmethod
+    def attach(name):
+        """Anexar (no worker) um bloco criado pelo processo principal"""
+        return shared_memory.SharedMemory(name=name)
+
+    @staticmethod
+    def view(block, shape, dtype):
+        """Array NumPy (sem cópia) sobre o bloco"""
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Fechar e remover todos os blocos"""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# Folga no bloco de saída para o header DICOM serializado
+HEADER_MARGIN = 256 * 1024
+
+# Leitor mantido aberto entre páginas do mesmo TIFF dentro de cada worker
+_worker_reader = None
+
+
+def _cached_reader(path):
+    """TiffFrameReader do worker, reaberto apenas quando o arquivo muda"""
+    global _worker_reader
+    if _worker_reader is None or _worker_reader.path != path:
+        if _worker_reader is not None:
+            _worker_reader.close()
+        _worker_reader = TiffFrameReader(path)
+    return _worker_reader
+
+
+def read_frame_job(task):
+    """
+    Estágio de leitura (processo do pool): decodifica o TIFF (ou integra o
+    cine), aplica flat-field, orientação, verificação prévia, recorte/binning
+    e reescala, e grava o frame final no bloco de entrada. Recebe o item e
+    as configurações; retorna o descritor do frame.
+    """
+    job, settings, input_name = task
+    sid = settings['sid']
+    dpi = settings['dpi']
+
+    frames = 1
+    if job['integrate']:
+        source_paths = [os.path.join(settings['input_folder'], f) for f in job['sources']]
+        pixels, count = integrate_frames(iter_tiff_sequence(source_paths), job['integrate'])
+        info = read_tiff_info(source_paths[0])
+        if job['integrate'] == "sum":
+            frames = count
+    else:
+        reader = _cached_reader(os.path.join(settings['input_folder'], job['tiff_file']))
+        pixels = reader.frame(job['page'] or 0)
+        info = reader.frame_info()
+
+    # Correção flat-field (orientação do painel), orientação como view,
+    # verificação prévia na imagem completa e recorte/binning antes de
+    # copiar para o bloco (única materialização do frame orientado)
+    if settings.get('calibration'):
+        load_calibration(*settings['calibration']).apply(pixels, frames)
+    pixels = orient_view(pixels, settings.get('orientation', "Original"))
+    preflight = None
+    if settings.get('preflight'):
+        preflight = preflight_check(pixels, bits_stored=settings.get('bits_stored', 16))
+    if preflight is not None and not preflight['ok']:
+        return {'preflight': preflight}
+
+    frame_dpi = resolve_tiff_dpi(info, dpi, sid)
+    pixels, frame_dpi, position = reduce_frame(
+        pixels, frame_dpi, settings.get('crop'), settings.get('binning', 1)
+    )
+
+    # Estimativa BB → campo só quando a verificação prévia encontrou a BB
+    # (flood e imagens sem BB ficam de fora) e em frames não integrados
+    stats = roi_statistics(pixels)
+    stats['bb_offset'] = None
+    if preflight is not None and preflight['bb'] and not job['integrate']:
+        try:
+            stats['bb_offset'] = estimate_bb_offset(pixels, frame_dpi)
+        except Exception:
+            pass   # estimativa é só indicativa; não impede a conversão
+
+    # Pixels já em uint16 no bloco (soma/float reescalados por stored_pixels)
+    pixels, slope, intercept = stored_pixels(pixels, settings.get('bits_stored', 16))
+    block = SharedFramePool.attach(input_name)
+    try:
+        if pixels.nbytes > block.size:
+            raise ValueError(f"Frame ({pixels.nbytes} bytes) maior que o bloco de memória compartilhada")
+        target = SharedFramePool.view(block, pixels.shape, pixels.dtype)
+        np.copyto(target, pixels)
+        del target
+    finally:
+        block.close()
+
+    return {
+        'shape': pixels.shape,
+        'dtype': pixels.dtype.str,
+        'dpi': frame_dpi,
+        'position': position,
+        'rescale': (slope, intercept),
+        'gantry': job['gantry'],
+        'coll': job['coll'],
+        'couch': job['couch'],
+        'stats': stats,
+        'preflight': preflight,
+    }
+
+
+def build_and_serialize_job(task):
+    """
+    Estágio de CPU (processo do pool): monta o RT Image a partir do frame no
+    bloco de entrada e serializa o arquivo DICOM completo no bloco de saída.
+    Recebe e retorna apenas descritores; retorna o tamanho serializado.
+    """
+    frame, settings, input_name, output_name = task
+    input_block = SharedFramePool.attach(input_name)
+    output_block = SharedFramePool.attach(output_name)
+    try:
+        pixels = SharedFramePool.view(input_block, frame['shape'], frame['dtype'])
+        new_dicom = frame_to_rt_image(
+            pixels,
+            sid=settings['sid'],
+            gantry=frame['gantry'],
+            coll=frame['coll'],
+            couch=frame['couch'],
+            dpi=frame['dpi'],
+            position=frame['position'],
+            rescale=frame['rescale'],
+            bits_stored=settings.get('bits_stored', 16)
+        )
+        del pixels
+
+        buffer = io.BytesIO()
+        save_dataset(new_dicom, buffer)
+        data = buffer.getbuffer()
+        size = data.nbytes
+        if size > output_block.size:
+            raise ValueError(f"DICOM serializado ({size} bytes) maior que o bloco de saída")
+        output_block.buf[:size] = data
+        del data
+        return size
+    finally:
+        input_block.close()
+        output_block.close()
+
+
+class BatchPipeline:
+    """
+    Conversão em lote organizada em estágios ligados por filas limitadas:
+
+        descoberta → leitura TIFF → montagem + serialização → gravação → verificação
+
+    Leitura (decodificação, correções, verificação prévia, recorte e
+    reescala) e montagem + serialização rodam no pool de processos, com
+    uma tarefa de leitura e uma de montagem por processo; gravação e
+    verificação são E/S e rodam em threads (asyncio). Os workers recebem
+    só o item e as configurações e escrevem os pixels em blocos de memória
+    compartilhada do processo principal, então vários arquivos são
+    decodificados em paralelo enquanto outros são serializados e gravados.
+    A memória fica limitada a (processos + profundidade) blocos de entrada
+    e outros tantos de saída.
+
+    Um item pode trazer suas próprias configurações (job['settings'], ex.:
+    sessões diferentes de um manifesto no mesmo pool); senão vale settings.
+    """
+    def __init__(self, jobs, settings, workers, depth=2, progress=None):
+        self.jobs = jobs
+        self.settings = settings
+        self.workers = workers
+        self.depth = depth
+        self.progress = progress
+        self.results = [None] * len(jobs)
+        self.done = 0
+
+    def settings_for(self, index):
+        """Configurações de um item (as do item ou as do lote)"""
+        return self.jobs[index].get('settings') or self.settings
+
+    async def run(self):
+        """Executar todos os estágios até o fim do lote. Retorna a lista de resultados"""
+        if not self.jobs:
+            return []
+
+        frame_size = self.largest_frame_size()
+        n_blocks = min(self.workers + self.depth, len(self.jobs))
+
+        read_queue = asyncio.Queue(maxsize=self.depth)
+        build_queue = asyncio.Queue(maxsize=self.depth)
+        write_queue = asyncio.Queue(maxsize=self.depth)
+        verify_queue = asyncio.Queue(maxsize=self.depth)
+
+        with SharedFramePool(frame_size, n_blocks) as self.input_pool, \
+                SharedFramePool(frame_size + HEADER_MARGIN, n_blocks) as self.output_pool, \
+                ProcessPoolExecutor(max_workers=self.workers) as executor:
+            await asyncio.gather(
+                self.discover(read_queue),
+                *[self.read_stage(read_queue, build_queue, executor) for _ in range(self.workers)],
+                *[self.build_stage(build_queue, write_queue, executor) for _ in range(self.workers)],
+                self.write_stage(write_queue, verify_queue),
+                self.verify_stage(verify_queue),
+            )
+
+        return self.results
+
+    def largest_frame_size(self):
+        """Maior frame do lote (dimensiona os blocos de memória compartilhada)"""
+        sizes = {}
+        for index, job in enumerate(self.jobs):
+            input_folder = self.settings_for(index)['input_folder']
+            key = (input_folder, job['sources'][0])
+            if key not in sizes:
+                try:
+                    sizes[key] = frame_buffer_size(os.path.join(input_folder, job['sources'][0]))
+                except Exception:
+                    sizes[key] = 0
+        return max(sizes.values(), default=0)
+
+    def finish(self, index, error=None, stats=None):
+        """Registrar resultado final de um item e notificar o progresso"""
+        job = self.jobs[index]
+        self.results[index] = {
+            'index': index,
+            'output': os.path.join(self.settings_for(index)['output_folder'], f"{job['name']}.dcm"),
+            'error': error,
+            'stats': stats,
+            'time': time.perf_counter(),
+        }
+        self.done += 1
+        if self.progress:
+            self.progress(self.done, len(self.jobs), job.get('label', job['name']))
+
+    # ----- Estágios -----
+
+    async def discover(self, read_queue):
+        """Descoberta: enfileirar os itens do lote (com backpressure da fila)"""
+        for index in range(len(self.jobs)):
+            await read_queue.put(index)
+        for _ in range(self.workers):
+            await read_queue.put(None)
+
+    async def read_stage(self, read_queue, build_queue, executor):
+        """Leitura do TIFF (processo do pool): frame ou imagem integrada → bloco de entrada"""
+        loop = asyncio.get_running_loop()
+        while True:
+            index = await read_queue.get()
+            if index is None:
+                break
+            block = await self.input_pool.acquire()
+            task = (self.jobs[index], self.settings_for(index), block.name)
+            try:
+                frame = await loop.run_in_executor(executor, read_frame_job, task)
+            except Exception as e:
+                self.input_pool.release(block)
+                self.finish(index, error=str(e))
+                continue
+
+            # Imagens reprovadas na verificação prévia não são convertidas
+            preflight = frame['preflight']
+            if preflight is not None and not preflight['ok']:
+                self.input_pool.release(block)
+                self.finish(index, error="reprovada na verificação prévia: " + "; ".join(preflight['issues']))
+                continue
+            await build_queue.put((index, frame, block))
+
+        # Um marcador de fim por tarefa de leitura: há uma de montagem para cada
+        await build_queue.put(None)
+
+    async def build_stage(self, build_queue, write_queue, executor):
+        """Montagem do dataset + serialização (processo do pool)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await build_queue.get()
+            if item is None:
+                break
+            index, frame, input_block = item
+            output_block = await self.output_pool.acquire()
+            task = (frame, self.settings_for(index), input_block.name, output_block.name)
+            try:
+                size = await loop.run_in_executor(executor, build_and_serialize_job, task)
+            except Exception as e:
+                self.output_pool.release(output_block)
+                self.finish(index, error=str(e))
+                continue
+            finally:
+                self.input_pool.release(input_block)
+            await write_queue.put((index, frame['stats'], output_block, size))
+
+        await write_queue.put(None)
+
+    async def write_stage(self, write_queue, verify_queue):
+        """Gravação do arquivo serializado (thread), direto do bloco de saída"""
+        finished_builders = 0
+        while finished_builders < self.workers:
+            item = await write_queue.get()
+            if item is None:
+                finished_builders += 1
+                continue
+            index, stats, block, size = item
+            output_path = os.path.join(self.settings_for(index)['output_folder'], f"{self.jobs[index]['name']}.dcm")
+            try:
+                await asyncio.to_thread(self.write_file, output_path, block, size)
+            except Exception as e:
+                self.finish(index, error=str(e))
+                continue
+            finally:
+                self.output_pool.release(block)
+            await verify_queue.put((index, stats, output_path, size))
+
+        await verify_queue.put(None)
+
+    async def verify_stage(self, verify_queue):
+        """Verificação (thread): header legível e tamanho gravado conferem"""
+        while True:
+            item = await verify_queue.get()
+            if item is None:
+                break
+            index, stats, output_path, size = item
+            try:
+                await asyncio.to_thread(self.verify_file, output_path, size)
+            except Exception as e:
+                self.finish(index, error=f"verificação falhou: {e}")
+                continue
+            self.finish(index, stats=stats)
+
+    # ----- Operações de E/S (executadas em threads) -----
+
+    @staticmethod
+    def write_file(output_path, block, size):
+        """Gravar os bytes serializados (sem cópia intermediária)"""
+        with open(output_path, 'wb') as f:
+            f.write(block.buf[:size])
+
+    @staticmethod
+    def verify_file(output_path, size):
+        """Conferir tamanho gravado e leitura do header sem force"""
+        if os.path.getsize(output_path) != size:
+            raise ValueError("tamanho gravado difere do serializado")
+        pydicom.dcmread(output_path, stop_before_pixels=True)
+
+
+# ============================================================================
+# FUNÇÕES: Cache local (staging) para pastas de rede
+# ============================================================================
+
+STAGING_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".conversor_dicom", "cache")
+STAGING_CACHE_MAX_BYTES = 10 * 1024 ** 3
+STAGING_COPY_THREADS = 4
+STAGING_CHUNK_SIZE = 1024 * 1024
+
+
+def copy_with_hash(source, destination):
+    """Copiar arquivo calculando o SHA-256 durante a cópia. Retorna (bytes, hash)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while True:
+            chunk = src.read(STAGING_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            dst.write(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def file_hash(path):
+    """SHA-256 de um arquivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STAGING_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalStagingCache:
+    """
+    Cache local de arquivos lidos de pastas de rede (SMB).
+
+    Os arquivos são copiados em paralelo para o disco local, verificados por
+    tamanho e SHA-256, e reutilizados enquanto tamanho e mtime da origem não
+    mudarem. Arquivos já verificados na sessão não consultam a rede de novo.
+    O espaço ocupado é limitado por max_bytes, removendo os menos usados (LRU).
+    """
+    def __init__(self, root=STAGING_CACHE_DIR, max_bytes=STAGING_CACHE_MAX_BYTES, threads=STAGING_COPY_THREADS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.threads = threads
+        self.index_path = os.path.join(root, "index.json")
+        self.session_validated = set()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, "arquivos"), exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        """Carregar índice do cache (origem → cópia local)"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_index(self):
+        """Gravar índice de forma atômica"""
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(temp_path, self.index_path)
+
+    def local_folder(self, source_folder):
+        """Pasta local que espelha uma pasta de origem (mesmos nomes de arquivo)"""
+        key = hashlib.sha1(os.path.abspath(source_folder).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.root, "arquivos", key)
+
+    def is_valid(self, key, entry):
+        """Cópia local existe e a origem não mudou (tamanho e mtime)"""
+        if not entry or not os.path.exists(entry['local']):
+            return False
+        if os.path.getsize(entry['local']) != entry['size']:
+            return False
+        if key in self.session_validated:
+            return True
+        stat = os.stat(key)
+        return stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']
+
+    def fetch(self, source, local_path):
+        """Copiar um arquivo para o cache e verificar tamanho e hash"""
+        stat = os.stat(source)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        temp_path = local_path + ".parcial"
+        size, digest = copy_with_hash(source, temp_path)
+        if size != stat.st_size or os.path.getsize(temp_path) != size:
+            os.remove(temp_path)
+            raise IOError(f"{source}: tamanho copiado difere da origem")
+        if file_hash(temp_path) != digest:
+            os.remove(temp_path)
+            raise IOError(f"{source}: hash da cópia local não confere")
+        os.replace(temp_path, local_path)
+        return {
+            'local': local_path,
+            'size': size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+        }
+
+    def stage(self, source_folder, filenames, progress=None):
+        """
+        Garantir cópia local verificada dos arquivos indicados (caminhos
+        relativos à pasta de origem, inclusive em subpastas).
+        Retorna a pasta local com os mesmos caminhos relativos.
+        """
+        local_folder = self.local_folder(source_folder)
+        sources = [os.path.join(source_folder, name) for name in filenames]
+        missing = []
+        for source in sources:
+            key = os.path.abspath(source)
+            if self.is_valid(key, self.index.get(key)):
+                self.index[key]['last_used'] = time.time()
+                self.session_validated.add(key)
+            else:
+                missing.append(source)
+
+        done = len(sources) - len(missing)
+        if progress:
+            progress(done, len(sources))
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = {
+                executor.submit(self.fetch, source, os.path.join(local_folder, os.path.relpath(source, source_folder))): source
+                for source in missing
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                entry = future.result()
+                entry['last_used'] = time.time()
+                key = os.path.abspath(source)
+                with self.lock:
+                    self.index[key] = entry
+                self.session_validated.add(key)
+                done += 1
+                if progress:
+                    progress(done, len(sources))
+
+        self.evict(keep={os.path.abspath(source) for source in sources})
+        self.save_index()
+        return local_folder
+
+    def evict(self, keep=()):
+        """Remover cópias menos usadas até respeitar o limite de espaço"""
+        total = sum(entry['size'] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            try:
+                os.remove(entry['local'])
+            except OSError:
+                pass
+            total -= entry['size']
+            del self.index[key]
+            self.session_validated.discard(key)
+
+    def output_folder(self):
+        """Pasta local temporária para as saídas do lote"""
+        return tempfile.mkdtemp(prefix="saida_", dir=self.root)
+
+    def upload(self, local_folder, destination_folder, progress=None):
+        """Enviar em bloco (threads paralelas) as saídas locais para o destino e remover a pasta local"""
+        os.makedirs(destination_folder, exist_ok=True)
+        names = sorted(os.listdir(local_folder))
+        errors = []
+
+        def send(name):
+            source = os.path.join(local_folder, name)
+            destination = os.path.join(destination_folder, name)
+            shutil.copyfile(source, destination)
+            if os.path.getsize(destination) != os.path.getsize(source):
+                raise IOError(f"{name}: tamanho enviado difere do local")
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = {executor.submit(send, name): name for name in names}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(f"{futures[future]}: {e}")
+                if progress:
+                    progress(done, len(names))
+
+        if not errors:
+            shutil.rmtree(local_folder, ignore_errors=True)
+        return errors
+
+
+# ============================================================================
+# FUNÇÕES: Busca de arquivos TIFF (subpastas, filtros, cache de listagens)
+# ============================================================================
+
+LISTING_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".conversor_dicom", "listagens.json")
+TIFF_INCLUDE_DEFAULT = "*.tif;*.tiff"
+SCAN_POLL_MS = 100
+SCAN_PREVIEW_INTERVAL = 0.5
+
+
+def parse_patterns(text):
+    """Padrões glob separados por ';' ou ',' (ex.: "*.tif;*_MV_*")"""
+    return [p.strip() for p in text.replace(',', ';').split(';') if p.strip()]
+
+
+def match_patterns(relative_path, patterns):
+    """
+    Caminho relativo (separador '/') casa com algum padrão, sem diferenciar
+    maiúsculas. Padrões sem '/' comparam só o nome; com '/' o caminho todo.
+    """
+    relative_path = relative_path.lower()
+    name = relative_path.rsplit('/', 1)[-1]
+    return any(
+        fnmatch.fnmatchcase(relative_path if '/' in p else name, p.lower())
+        for p in patterns
+    )
+
+
+def list_directory(directory):
+    """(arquivos, subpastas) de uma pasta (os.scandir, sem stat extra)"""
+    files, dirs = [], []
+    with os.scandir(directory) as scan:
+        for item in scan:
+            try:
+                (dirs if item.is_dir(follow_symlinks=False) else files).append(item.name)
+            except OSError:
+                continue
+    return files, dirs
+
+
+class DirectoryListingCache:
+    """
+    Listagens de pastas (arquivos e subpastas) válidas enquanto o mtime da
+    pasta não mudar. Uma nova busca em uma árvore grande (rede) faz só um
+    stat por pasta inalterada, sem listar seu conteúdo. Gravado em JSON.
+    """
+    def __init__(self, path=LISTING_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.changed = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def listing(self, directory):
+        """(arquivos, subpastas) de uma pasta, do cache ou de os.scandir"""
+        key = os.path.abspath(directory)
+        mtime_ns = os.stat(directory).st_mtime_ns
+        entry = self.entries.get(key)
+        if entry and entry['mtime_ns'] == mtime_ns:
+            return entry['files'], entry['dirs']
+
+        files, dirs = list_directory(directory)
+        with self.lock:
+            self.entries[key] = {'mtime_ns': mtime_ns, 'files': files, 'dirs': dirs}
+            self.changed = True
+        return files, dirs
+
+    def save(self):
+        """Gravar de forma atômica (apenas se houve listagens novas)"""
+        with self.lock:
+            if not self.changed:
+                return
+            data = json.dumps(self.entries)
+            self.changed = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+
+
+def iter_tiff_files(folder, recursive=False, include=TIFF_INCLUDE_DEFAULT, exclude="", cache=None):
+    """
+    Buscar arquivos (caminhos relativos com '/') em ordem alfabética de caminho,
+    entregando listas de arquivos à medida que cada pasta é lida.
+
+    include/exclude: padrões glob (ver match_patterns); exclude também
+    descarta subpastas inteiras. cache: DirectoryListingCache opcional.
+    """
+    include = parse_patterns(include) or parse_patterns(TIFF_INCLUDE_DEFAULT)
+    exclude = parse_patterns(exclude)
+
+    def walk(directory, prefix):
+        files, dirs = cache.listing(directory) if cache else list_directory(directory)
+        # Subpasta "b" ordenada como "b/": mesma ordem de sorted() nos caminhos completos
+        entries = [(name, False) for name in files]
+        if recursive:
+            entries += [(name + '/', True) for name in dirs]
+        batch = []
+        for name, is_dir in sorted(entries):
+            relative = prefix + name
+            if is_dir:
+                if exclude and match_patterns(relative.rstrip('/'), exclude):
+                    continue
+                if batch:
+                    yield batch
+                    batch = []
+                try:
+                    yield from walk(os.path.join(directory, name.rstrip('/')), relative)
+                except OSError:
+                    continue
+            elif match_patterns(relative, include) and not (exclude and match_patterns(relative, exclude)):
+                batch.append(relative)
+        if batch:
+            yield batch
+
+    yield from walk(folder, "")
+
+
+# ============================================================================
+# FUNÇÕES: Miniaturas (cache em disco)
+# ============================================================================
+
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".conversor_dicom", "miniaturas")
+THUMBNAIL_SIZE = 96
+THUMBNAIL_POLL_MS = 50
+
+# Preview do lote: linhas por conversão e limite de blocos atualizados individualmente
+PREVIEW_BLOCK_LINES = 4
+PREVIEW_MAX_BLOCK_UPDATES = 50
+
+
+def make_thumbnail(array, size=THUMBNAIL_SIZE):
+    """Miniatura 8 bits: vista reduzida por passo, janela entre os percentis 1 e 99"""
+    view = np.asarray(downsample_view(array, size), dtype=np.float32)
+    low, high = np.percentile(view, [1, 99])
+    view -= low
+    view *= 255.0 / max(float(high - low), 1e-6)
+    np.clip(view, 0, 255, out=view)
+    return Image.fromarray(view.astype(np.uint8))
+
+
+class ThumbnailCache:
+    """
+    Miniaturas PNG em disco, com chave pelo SHA-256 do TIFF (e página).
+
+    Um índice caminho → hash (válido enquanto tamanho e mtime não mudarem)
+    evita reler os arquivos ao reabrir a pasta: miniaturas já geradas são
+    carregadas sem decodificar o TIFF. Temporários têm nome por processo e
+    thread (a pasta é compartilhada entre janelas e instâncias).
+    """
+    def __init__(self, root=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE):
+        self.root = root
+        self.size = size
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        """Carregar índice do cache (caminho → hash do conteúdo)"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def temp_suffix():
+        """Sufixo de arquivo temporário exclusivo deste processo e thread"""
+        return f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def save_index(self):
+        """Gravar índice de forma atômica"""
+        with self.lock:
+            data = json.dumps(self.index, indent=1)
+        temp_path = self.index_path + self.temp_suffix()
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.index_path)
+
+    def content_hash(self, path):
+        """Hash do arquivo (recalculado só se tamanho ou mtime mudaram)"""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.index.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['hash']
+
+        digest = file_hash(path)
+        with self.lock:
+            self.index[key] = {'hash': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        return digest
+
+    def thumbnail_path(self, digest, page):
+        """Arquivo PNG da miniatura de uma página"""
+        return os.path.join(self.root, f"{digest[:32]}_p{page}_{self.size}.png")
+
+    def thumbnail(self, path, page=0):
+        """Miniatura (PIL) de uma página do TIFF: do cache ou gerada e gravada"""
+        cached = self.thumbnail_path(self.content_hash(path), page)
+        if os.path.exists(cached):
+            with Image.open(cached) as img:
+                img.load()
+                return img.copy()
+
+        with TiffFrameReader(path) as reader:
+            frame = reader.frame(min(page, reader.n_frames - 1))
+        thumb = make_thumbnail(frame, self.size)
+        del frame
+
+        temp_path = cached + self.temp_suffix()
+        thumb.save(temp_path, format="PNG")
+        os.replace(temp_path, cached)
+        return thumb
+
+
+# ============================================================================
+# CLASSE: Repositório de templates (cache, escrita atômica, lock, merge)
+# ============================================================================
+
+TEMPLATE_LOCK_TIMEOUT = 10.0
+TEMPLATE_LOCK_STALE = 60.0
+
+DEFAULT_TEMPLATES = {
+    "WL Standard 4": {
+        "description": "Winston-Lutz padrão: 4 ângulos de gantry",
+        "items": [
+            {"name": "gantry_0", "gantry": "0", "coll": "0", "couch": "0"},
+            {"name": "gantry_90", "gantry": "90", "coll": "0", "couch": "0"},
+            {"name": "gantry_180", "gantry": "180", "coll": "0", "couch": "0"},
+            {"name": "gantry_270", "gantry": "270", "coll": "0", "couch": "0"}
+        ]
+    }
+}
+
+
+class FileLock:
+    """
+    Lock entre estações por arquivo (criação exclusiva de path + ".lock", com
+    o dono gravado no arquivo). Um lock mais antigo que TEMPLATE_LOCK_STALE
+    (estação travada) é renomeado para um nome único e só é descartado se
+    ainda for o mesmo lock visto como abandonado; senão é devolvido.
+    """
+    def __init__(self, path, timeout=TEMPLATE_LOCK_TIMEOUT, stale=TEMPLATE_LOCK_STALE):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self.stale = stale
+        self.owner = None
+
+    @staticmethod
+    def read_owner(path):
+        """Dono gravado em um arquivo de lock, ou None se não existe"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def held(self):
+        """O lock ainda é desta instância (não foi descartado como abandonado)"""
+        return self.owner is not None and self.read_owner(self.lock_path) == self.owner
+
+    def break_stale(self, owner):
+        """Descartar o lock abandonado de 'owner' sem apagar um lock novo de outra estação"""
+        aside = f"{self.lock_path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.abandonado"
+        try:
+            os.rename(self.lock_path, aside)
+        except OSError:
+            return   # outra estação já removeu (ou renomeou) o lock
+        try:
+            if self.read_owner(aside) != owner:
+                # Outra estação já tinha trocado o lock abandonado por um novo: devolver
+                try:
+                    os.link(aside, self.lock_path)
+                except OSError:
+                    pass   # o dono do lock novo percebe a perda em held()
+        finally:
+            os.remove(aside)
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                owner = self.read_owner(self.lock_path)
+                try:
+                    age = time.time() - os.path.getmtime(self.lock_path)
+                except OSError:
+                    continue
+                if owner is not None and age > self.stale:
+                    self.break_stale(owner)
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Arquivo em uso por outra estação ({self.lock_path})")
+                time.sleep(0.1)
+                continue
+            self.owner = f"{socket.gethostname()} {os.getpid()} {threading.get_ident()} {datetime.now().isoformat()}"
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.owner)
+            return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Só remove o próprio lock (se foi descartado, o arquivo é de outra estação)
+        if self.held():
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+        self.owner = None
+
+
+class TemplateRepository:
+    """
+    Templates WL (templates_wl.json) com cache em memória.
+
+    O arquivo só é relido quando mtime/tamanho mudam. Gravações alteram
+    apenas os templates indicados sobre a versão atual do disco (edições de
+    outras estações em outros templates são preservadas), sob FileLock e com
+    escrita atômica (arquivo temporário + os.replace). Enquanto o arquivo
+    não existe vale o template padrão; leituras nunca criam o arquivo (só
+    a primeira gravação, que já inclui o padrão).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.signature = None
+        self.loaded = False
+        self.templates = {}
+        self.base = {}
+        self.lock = threading.Lock()
+
+    def file_signature(self):
+        """(mtime_ns, tamanho) do arquivo, ou None se não existe"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read_disk(self):
+        """Templates atuais do disco (o padrão, em memória, se o arquivo não existe)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('templates', {})
+        except FileNotFoundError:
+            return copy.deepcopy(DEFAULT_TEMPLATES)
+
+    def set_cache(self, templates):
+        self.templates = templates
+        self.base = copy.deepcopy(templates)
+        self.signature = self.file_signature()
+        self.loaded = True
+
+    def all(self):
+        """Templates (dicionário nome → template), relendo só se o arquivo mudou"""
+        with self.lock:
+            if not self.loaded or self.file_signature() != self.signature:
+                self.set_cache(self.read_disk())
+            return self.templates
+
+    def save(self, changes, overwrite=False):
+        """
+        Gravar alterações {nome: template, ou None para remover}.
+
+        Retorna a lista de templates alterados por outra estação desde a última
+        leitura (conflito); nesse caso nada é gravado, o cache passa a refletir
+        o disco e a gravação pode ser repetida com overwrite=True.
+        """
+        with self.lock:
+            return self.save_locked(changes, overwrite)
+
+    def save_locked(self, changes, overwrite):
+        with FileLock(self.path) as lock:
+            disk = self.read_disk()
+            conflicts = [
+                name for name, template in changes.items()
+                if disk.get(name) != self.base.get(name) and disk.get(name) != template
+            ]
+            if conflicts and not overwrite:
+                self.set_cache(disk)
+                return conflicts
+
+            for name, template in changes.items():
+                if template is None:
+                    disk.pop(name, None)
+                else:
+                    disk[name] = copy.deepcopy(template)
+
+            temp_path = f"{self.path}.{socket.gethostname()}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"templates": disk}, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            if not lock.held():
+                os.remove(temp_path)
+                raise TimeoutError(f"Lock perdido durante a gravação ({lock.lock_path}); tente novamente")
+            os.replace(temp_path, self.path)
+            self.set_cache(disk)
+        return []
+
+
+_template_repositories = {}
+
+
+def get_template_repository(path):
+    """Repositório compartilhado por caminho (o cache sobrevive entre janelas)"""
+    key = os.path.abspath(path)
+    if key not in _template_repositories:
+        _template_repositories[key] = TemplateRepository(key)
+    return _template_repositories[key]
+
+
+# ============================================================================
+# FUNÇÕES: Agendador de várias sessões (manifesto JSON)
+# ============================================================================
+
+# Chaves opcionais de cada sessão do manifesto (valores padrão)
+MANIFEST_SESSION_DEFAULTS = {
+    "sid": 1600.0,
+    "dpi": 400.0,
+    "recursive": False,
+    "include": TIFF_INCLUDE_DEFAULT,
+    "exclude": "",
+    "preflight": True,
+    "crop": None,
+    "binning": 1,
+    "bits_stored": 16,
+    "orientation": "Template",
+    "split_pages": False,
+    "page_angles": "Template",
+    "page_step": 0,
+    "integrate": None,
+    "flatfield": None,
+}
+
+
+def load_manifest(path):
+    """
+    Ler um manifesto de sessões (JSON). Caminhos relativos são resolvidos
+    a partir da pasta do manifesto. Formato:
+
+      {"templates": "templates_wl.json", "workers": 8,
+       "sessions": [{"name": ..., "folder": ..., "template": ..., "sid": 1600,
+                     "dpi": 400, "output": ...}, ...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(path))
+    sessions = manifest.get('sessions')
+    if not sessions:
+        raise ValueError("Manifesto sem sessões (chave 'sessions')")
+
+    resolved = []
+    for number, session in enumerate(sessions, 1):
+        missing = [key for key in ("folder", "template", "output") if not session.get(key)]
+        if missing:
+            raise ValueError(f"Sessão {number}: faltam as chaves {', '.join(missing)}")
+        unknown = set(session) - set(MANIFEST_SESSION_DEFAULTS) - {"name", "folder", "template", "output"}
+        if unknown:
+            raise ValueError(f"Sessão {number}: chaves desconhecidas {', '.join(sorted(unknown))}")
+
+        session = dict(MANIFEST_SESSION_DEFAULTS, **session)
+        session['folder'] = os.path.join(base, session['folder'])
+        session['output'] = os.path.join(base, session['output'])
+        session.setdefault('name', f"{number:02d} {os.path.basename(os.path.normpath(session['folder']))}")
+        if session['flatfield']:
+            flatfield = session['flatfield']
+            if not isinstance(flatfield, dict) or not all(flatfield.get(key) for key in ("dark", "flood")):
+                raise ValueError(f"Sessão {session['name']}: 'flatfield' precisa das chaves dark e flood")
+            session['flatfield'] = {key: os.path.join(base, flatfield[key]) for key in ("dark", "flood")}
+        resolved.append(session)
+
+    manifest['sessions'] = resolved
+    templates = manifest.get('templates') or os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates_wl.json")
+    manifest['templates'] = os.path.join(base, templates)
+    return manifest
+
+
+def plan_session(index, session, templates, listing_cache=None):
+    """Arquivos, itens e configurações de uma sessão. Retorna (jobs, settings)"""
+    template = templates.get(session['template'])
+    if template is None:
+        raise ValueError(f"template '{session['template']}' não encontrado")
+    if not os.path.isdir(session['folder']):
+        raise ValueError(f"pasta não encontrada: {session['folder']}")
+
+    tiff_files = [
+        name
+        for batch in iter_tiff_files(session['folder'], session['recursive'], session['include'],
+                                     session['exclude'], listing_cache)
+        for name in batch
+    ]
+    if not tiff_files:
+        raise ValueError("nenhum arquivo TIFF encontrado")
+
+    integration = None
+    if session['integrate']:
+        if session['integrate'] not in BATCH_INTEGRATION_MODES:
+            raise ValueError(f"integração desconhecida: {session['integrate']}")
+        integration = BATCH_INTEGRATION_MODES[session['integrate']]
+
+    page_counts = {}
+
+    def page_count(tiff_file):
+        if tiff_file not in page_counts:
+            try:
+                page_counts[tiff_file] = count_tiff_frames(os.path.join(session['folder'], tiff_file))
+            except Exception:
+                page_counts[tiff_file] = 1
+        return page_counts[tiff_file]
+
+    jobs = plan_conversion_jobs(
+        tiff_files, template.get('items', []), page_count, integration,
+        session['split_pages'], session['page_angles'], session['page_step']
+    )
+
+    # Mesmas regras da janela de lote: "Template" usa as chaves do template
+    orientation = session['orientation']
+    if orientation == "Template":
+        orientation = template.get('orientation', "Original")
+    if orientation not in ORIENTATION_MODES:
+        raise ValueError(f"Orientação desconhecida: {orientation}")
+
+    crop = session['crop']
+    if crop == "template":
+        crop = float(template['crop_mm']) if template.get('crop_mm') else 'auto'
+    elif crop not in (None, 'auto'):
+        crop = float(crop)
+
+    calibration = None
+    if session['flatfield']:
+        calibration = (session['flatfield']['dark'], session['flatfield']['flood'])
+        load_calibration(*calibration)
+
+    settings = {
+        'sid': float(session['sid']),
+        'dpi': float(session['dpi']),
+        'input_folder': session['folder'],
+        'output_folder': session['output'],
+        'preflight': bool(session['preflight']),
+        'crop': crop,
+        'binning': int(session['binning']),
+        'calibration': calibration,
+        'bits_stored': int(session['bits_stored']),
+        'orientation': orientation,
+    }
+    if settings['sid'] <= 0 or settings['dpi'] <= 0:
+        raise ValueError("SID e DPI devem ser maiores que 0")
+
+    for job in jobs:
+        job['session'] = index
+        job['settings'] = settings
+        job['label'] = f"{session['name']}: {job['name']}"
+    return jobs, settings
+
+
+def interleave_jobs(job_lists):
+    """Intercalar (round-robin) os itens das sessões: todas avançam juntas no pool"""
+    longest = max((len(jobs) for jobs in job_lists), default=0)
+    return [jobs[i] for i in range(longest) for jobs in job_lists if i < len(jobs)]
+
+
+def run_manifest(path, workers=None, progress=None):
+    """
+    Converter todas as sessões de um manifesto em um único pipeline (um pool
+    de processos compartilhado, itens intercalados entre sessões).
+
+    Retorna (resumos por sessão, segundos). Sessões com erro de configuração
+    não são iniciadas e aparecem no resumo com o erro.
+    """
+    manifest = load_manifest(path)
+    templates = get_template_repository(manifest['templates']).all()
+    listing_cache = DirectoryListingCache()
+
+    summaries = []
+    job_lists = []
+    for index, session in enumerate(manifest['sessions']):
+        summary = {
+            'name': session['name'],
+            'output': session['output'],
+            'jobs': 0,
+            'converted': 0,
+            'errors': [],
+            'seconds': 0.0,
+        }
+        try:
+            jobs, settings = plan_session(index, session, templates, listing_cache)
+            os.makedirs(settings['output_folder'], exist_ok=True)
+        except Exception as e:
+            summary['errors'].append(f"sessão não iniciada: {e}")
+            jobs = []
+        summary['jobs'] = len(jobs)
+        summaries.append(summary)
+        job_lists.append(jobs)
+
+    try:
+        listing_cache.save()
+    except OSError:
+        pass
+
+    jobs = interleave_jobs(job_lists)
+    workers = max(1, int(workers or manifest.get('workers') or os.cpu_count() or 1))
+
+    start_time = time.perf_counter()
+    pipeline = BatchPipeline(jobs, None, workers, progress=progress)
+    results = asyncio.run(pipeline.run())
+    elapsed = time.perf_counter() - start_time
+
+    for result in results:
+        job = jobs[result['index']]
+        summary = summaries[job['session']]
+        summary['seconds'] = max(summary['seconds'], result['time'] - start_time)
+        if result['error']:
+            source = job['tiff_file'] if job['page'] is None else f"{job['tiff_file']} [página {job['page'] + 1}]"
+            summary['errors'].append(f"{source}: {result['error']}")
+        else:
+            summary['converted'] += 1
+
+    return summaries, elapsed
+
+
+def run_manifest_cli(path, workers=None):
+    """Executar um manifesto no terminal, com progresso e resumo por sessão. Retorna o código de saída"""
+    print("="*80)
+    print("CONVERSÃO EM LOTE - MANIFESTO DE SESSÕES")
+    print("="*80)
+    print(f"Manifesto: {path}")
+
+    def on_progress(done, total, name):
+        print(f"  [{done}/{total}] {name}")
+
+    try:
+        summaries, elapsed = run_manifest(path, workers, on_progress)
+    except Exception as e:
+        print(f"✗ Erro no manifesto: {e}")
+        return 2
+
+    print("\n" + "="*80)
+    print(f"{'Sessão':<32} {'Itens':>6} {'OK':>6} {'Erros':>6} {'Concluída (s)':>14}")
+    for summary in summaries:
+        print(f"{summary['name'][:32]:<32} {summary['jobs']:>6} {summary['converted']:>6} "
+              f"{len(summary['errors']):>6} {summary['seconds']:>14.1f}")
+    total = sum(s['converted'] for s in summaries)
+    print(f"\nTotal: {total} arquivos em {elapsed:.1f} s"
+          + (f" ({total / elapsed:.1f} arquivos/s)" if elapsed > 0 else ""))
+
+    failed = [s for s in summaries if s['errors']]
+    for summary in failed:
+        print(f"\n✗ {summary['name']} ({summary['output']}):")
+        for error in summary['errors'][:10]:
+            print(f"    {error}")
+        if len(summary['errors']) > 10:
+            print(f"    ... e mais {len(summary['errors']) - 10} erros")
+    print("="*80)
+    return 1 if failed else 0
+
+
+# ============================================================================
+# CLASSE: Visualizador de imagem (pirâmide multi-resolução)
+# ============================================================================
+
+PYRAMID_MIN_SIZE = 256
+VIEWER_SIZE = 640
+VIEWER_ZOOM_STEP = 1.25
+
+
+def window_lut(low, high, bits=16):
+    """Tabela (LUT) janela/nível → 8 bits para pixels inteiros sem sinal"""
+    lut = np.arange(2 ** bits, dtype=np.float32)
+    lut -= low
+    lut *= 255.0 / max(float(high - low), 1e-6)
+    np.clip(lut, 0, 255, out=lut)
+    return lut.astype(np.uint8)
+
+
+class ImagePyramid:
+    """
+    Pirâmide de resoluções de um frame (nível k = binning 2^k × 2^k).
+
+    Os níveis reduzidos são gerados sob demanda e mantidos em memória; a
+    renderização lê apenas a região visível do nível adequado ao zoom e
+    aplica janela/nível por LUT (uint8/uint16) sobre esse recorte.
+    """
+    def __init__(self, array, min_size=PYRAMID_MIN_SIZE):
+        if array.ndim != 2:
+            raise ValueError(f"Imagem com formato {array.shape} não suportada (esperado 2D)")
+        self.levels = [array]
+        self.max_level = 0
+        size = max(array.shape)
+        while size > min_size:
+            size //= 2
+            self.max_level += 1
+        self._lut = None
+        self._lut_window = None
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    def level(self, k):
+        """Nível k da pirâmide (gerado a partir do anterior na primeira vez)"""
+        while len(self.levels) <= k:
+            self.levels.append(bin_pixels(self.levels[-1], 2))
+        return self.levels[k]
+
+    def level_for_zoom(self, zoom):
+        """Nível mais reduzido que ainda tem pelo menos 1 pixel por pixel de tela"""
+        k = int(np.floor(np.log2(1.0 / zoom))) if zoom < 1 else 0
+        return min(max(k, 0), self.max_level)
+
+    def auto_window(self):
+        """Janela entre os percentis 1 e 99 (calculada no nível mais reduzido)"""
+        low, high = np.percentile(self.level(self.max_level), [1, 99])
+        return float(low), float(high)
+
+    def value_range(self):
+        """Mínimo e máximo (nível mais reduzido)"""
+        top = self.level(self.max_level)
+        return float(top.min()), float(top.max())
+
+    def apply_window(self, tile, low, high):
+        """Janela/nível → uint8: LUT para inteiros até 16 bits, aritmética nos demais"""
+        if tile.dtype.kind == 'u' and tile.dtype.itemsize <= 2:
+            if self._lut_window != (low, high, tile.dtype.itemsize):
+                self._lut = window_lut(low, high, 8 * tile.dtype.itemsize)
+                self._lut_window = (low, high, tile.dtype.itemsize)
+            return self._lut[tile]
+
+        scaled = tile.astype(np.float32)
+        scaled -= low
+        scaled *= 255.0 / max(float(high - low), 1e-6)
+        np.clip(scaled, 0, 255, out=scaled)
+        return scaled.astype(np.uint8)
+
+    def render(self, center_x, center_y, zoom, width, height, low, high):
+        """
+        Imagem 8 bits (height × width) da janela de visualização.
+
+        center_x, center_y: pixel da imagem original no centro da tela;
+        zoom: pixels de tela por pixel da imagem original. Amostragem por
+        vizinho mais próximo no nível escolhido, só na região visível.
+        """
+        k = self.level_for_zoom(zoom)
+        level = self.level(k)
+        scale = 2 ** k
+
+        cols = np.floor((center_x + (np.arange(width) + 0.5 - width / 2) / zoom) / scale).astype(np.intp)
+        rows = np.floor((center_y + (np.arange(height) + 0.5 - height / 2) / zoom) / scale).astype(np.intp)
+        col_mask = (cols >= 0) & (cols < level.shape[1])
+        row_mask = (rows >= 0) & (rows < level.shape[0])
+
+        output = np.zeros((height, width), dtype=np.uint8)
+        if not col_mask.any() or not row_mask.any():
+            return output
+
+        cols = cols[col_mask]
+        rows = rows[row_mask]
+        tile = level[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        tile = tile[np.ix_(rows - rows[0], cols - cols[0])]
+        output[np.ix_(row_mask, col_mask)] = self.apply_window(tile, low, high)
+        return output
+
+
+class ImageViewer:
+    """Janela de visualização com zoom (roda do mouse), pan (arrastar) e janela/nível"""
+    def __init__(self, parent_window, array, title="Visualizar Imagem", dpi=None):
+        self.pyramid = ImagePyramid(array)
+        self.dpi = dpi
+
+        self.root = tk.Toplevel(parent_window)
+        self.root.title(title)
+        self.root.geometry(f"{VIEWER_SIZE}x{VIEWER_SIZE + 110}")
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+
+        rows, cols = self.pyramid.shape
+        self.center = [cols / 2, rows / 2]
+        self.zoom = min(VIEWER_SIZE / cols, VIEWER_SIZE / rows)
+        self.drag_origin = None
+        self.render_pending = False
+        self.photo = None
+
+        minimum, maximum = self.pyramid.value_range()
+        low, high = self.pyramid.auto_window()
+        self.window_var = tk.DoubleVar(value=high - low)
+        self.level_var = tk.DoubleVar(value=(high + low) / 2)
+
+        self.create_widgets(minimum, maximum)
+
+    def create_widgets(self, minimum, maximum):
+        """Canvas da imagem e controles de janela/nível"""
+        self.canvas = tk.Canvas(self.root, background="black", highlightthickness=0)
+        self.canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.image_item = self.canvas.create_image(0, 0, anchor=tk.NW)
+
+        self.canvas.bind('<Configure>', lambda e: self.schedule_render())
+        self.canvas.bind('<ButtonPress-1>', self.on_press)
+        self.canvas.bind('<B1-Motion>', self.on_drag)
+        self.canvas.bind('<MouseWheel>', lambda e: self.zoom_at(e, VIEWER_ZOOM_STEP if e.delta > 0 else 1 / VIEWER_ZOOM_STEP))
+        self.canvas.bind('<Button-4>', lambda e: self.zoom_at(e, VIEWER_ZOOM_STEP))
+        self.canvas.bind('<Button-5>', lambda e: self.zoom_at(e, 1 / VIEWER_ZOOM_STEP))
+        self.canvas.bind('<Motion>', self.on_motion)
+
+        controls = ttk.Frame(self.root, padding="5")
+        controls.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        controls.columnconfigure(1, weight=1)
+
+        span = max(maximum - minimum, 1.0)
+        ttk.Label(controls, text="Janela (W):").grid(row=0, column=0, sticky=tk.W)
+        ttk.Scale(controls, from_=1.0, to=span, variable=self.window_var,
+                  command=lambda v: self.schedule_render()).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Label(controls, text="Nível (L):").grid(row=1, column=0, sticky=tk.W)
+        ttk.Scale(controls, from_=minimum, to=maximum, variable=self.level_var,
+                  command=lambda v: self.schedule_render()).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5)
+
+        buttons = ttk.Frame(controls)
+        buttons.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        ttk.Button(buttons, text="Ajustar", command=self.fit).pack(side=tk.LEFT, padx=2)
+        ttk.Button(buttons, text="1:1", command=lambda: self.set_zoom(1.0)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(buttons, text="Auto W/L", command=self.auto_window).pack(side=tk.LEFT, padx=2)
+
+        self.info_label = ttk.Label(controls, text="", anchor=tk.W)
+        self.info_label.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+
+    def schedule_render(self):
+        """Agrupar eventos (arrasto, escala) em uma renderização por ciclo da interface"""
+        if not self.render_pending:
+            self.render_pending = True
+            self.root.after_idle(self.render)
+
+    def window(self):
+        """(mínimo, máximo) da janela atual"""
+        width = max(self.window_var.get(), 1e-6)
+        level = self.level_var.get()
+        return level - width / 2, level + width / 2
+
+    def render(self):
+        """Renderizar apenas a área visível no nível de pirâmide do zoom atual"""
+        self.render_pending = False
+        width = max(self.canvas.winfo_width(), 1)
+        height = max(self.canvas.winfo_height(), 1)
+        low, high = self.window()
+        pixels = self.pyramid.render(self.center[0], self.center[1], self.zoom, width, height, low, high)
+        self.photo = ImageTk.PhotoImage(Image.fromarray(pixels))
+        self.canvas.itemconfigure(self.image_item, image=self.photo)
+
+        k = self.pyramid.level_for_zoom(self.zoom)
+        self.info_label.config(text=f"Zoom {self.zoom * 100:.0f}% | nível {k} | "
+                                    f"W={high - low:.0f} L={(high + low) / 2:.0f}")
+
+    def screen_to_image(self, x, y):
+        """Coordenadas da tela → pixel da imagem original"""
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        return (self.center[0] + (x - width / 2) / self.zoom,
+                self.center[1] + (y - height / 2) / self.zoom)
+
+    def on_press(self, event):
+        self.drag_origin = (event.x, event.y)
+
+    def on_drag(self, event):
+        """Pan: deslocar o centro pelo arrasto"""
+        if self.drag_origin is None:
+            return
+        dx = event.x - self.drag_origin[0]
+        dy = event.y - self.drag_origin[1]
+        self.drag_origin = (event.x, event.y)
+        self.center[0] -= dx / self.zoom
+        self.center[1] -= dy / self.zoom
+        self.schedule_render()
+
+    def zoom_at(self, event, factor):
+        """Zoom mantendo fixo o pixel sob o cursor"""
+        x, y = self.screen_to_image(event.x, event.y)
+        self.zoom = min(max(self.zoom * factor, 1 / 2 ** (self.pyramid.max_level + 2)), 16.0)
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        self.center = [x - (event.x - width / 2) / self.zoom, y - (event.y - height / 2) / self.zoom]
+        self.schedule_render()
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+        self.schedule_render()
+
+    def fit(self):
+        """Imagem inteira na janela"""
+        rows, cols = self.pyramid.shape
+        self.center = [cols / 2, rows / 2]
+        self.set_zoom(min(max(self.canvas.winfo_width(), 1) / cols, max(self.canvas.winfo_height(), 1) / rows))
+
+    def auto_window(self):
+        low, high = self.pyramid.auto_window()
+        self.window_var.set(high - low)
+        self.level_var.set((high + low) / 2)
+        self.schedule_render()
+
+    def on_motion(self, event):
+        """Mostrar coordenada e valor do pixel sob o cursor"""
+        x, y = self.screen_to_image(event.x, event.y)
+        rows, cols = self.pyramid.shape
+        if not (0 <= x < cols and 0 <= y < rows):
+            return
+        value = self.pyramid.levels[0][int(y), int(x)]
+        text = f"x={int(x)} y={int(y)} valor={value:g}"
+        if self.dpi:
+            pixel_mm = 25.4 / self.dpi
+            text += f" ({(x - cols / 2) * pixel_mm:+.1f}, {(y - rows / 2) * pixel_mm:+.1f} mm)"
+        low, high = self.window()
+        self.info_label.config(text=f"Zoom {self.zoom * 100:.0f}% | W={high - low:.0f} "
+                                    f"L={(high + low) / 2:.0f} | {text}")
+
+
 # ============================================================================
 # CLASSE: Conversor IMG para DICOM
 # ============================================================================
@@ -81,7 +2751,7 @@ class ImgToDicomConverter:
         self.root = tk.Toplevel(parent_window) if parent_window else tk.Tk()
         self.on_close_callback = on_close_callback
         self.root.title("Conversor .IMG para DICOM")
-        self.root.geometry("900x700")
+        self.root.geometry("900x820")
         self.root.resizable(True, True)
 
         # Configurar comportamento ao fechar
@@ -91,6 +2761,13 @@ class ImgToDicomConverter:
         self.input_file = tk.StringVar()
         self.output_file = tk.StringVar()
         self.current_dataset = None
+        self.current_input = None
+        self.current_force = False
+        self.transcode_var = tk.BooleanVar(value=False)
+        self.batch_input_folder = tk.StringVar()
+        self.batch_output_folder = tk.StringVar()
+        self.batch_recursive_var = tk.BooleanVar(value=True)
+        self.batch_workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
 
         # Criar interface
         self.create_widgets()
@@ -128,12 +2805,15 @@ class ImgToDicomConverter:
         ttk.Entry(input_frame, textvariable=self.input_file, width=50).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
         ttk.Button(input_frame, text="Procurar...", command=self.browse_input).grid(row=0, column=2, padx=(5, 0))
 
-        # Botão de análise
+        # Botões de análise e visualização
+        actions_frame = ttk.Frame(input_frame)
+        actions_frame.grid(row=1, column=0, columnspan=3, pady=(10, 0))
         ttk.Button(
-            input_frame,
+            actions_frame,
             text="Analisar Arquivo",
             command=self.analyze_file
-        ).grid(row=1, column=0, columnspan=3, pady=(10, 0))
+        ).pack(side=tk.LEFT, padx=2)
+        ttk.Button(actions_frame, text="Visualizar", command=self.show_image).pack(side=tk.LEFT, padx=2)
 
         # Seção de informações
         info_frame = ttk.LabelFrame(main_frame, text="Informações do Arquivo", padding="10")
@@ -160,6 +2840,16 @@ class ImgToDicomConverter:
         ttk.Entry(output_frame, textvariable=self.output_file, width=50).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
         ttk.Button(output_frame, text="Procurar...", command=self.browse_output).grid(row=0, column=2, padx=(5, 0))
 
+        transcode_check = ttk.Checkbutton(
+            output_frame,
+            text="Transcodificar para Explicit VR Little Endian",
+            variable=self.transcode_var
+        )
+        transcode_check.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        ToolTip(transcode_check, "Converte arquivos Implicit VR ou Big Endian (com troca de bytes dos pixels)\n"
+                                 "para a codificação padrão lida sem conversão pelo pylinac e visualizadores.\n"
+                                 "Desligado: a Transfer Syntax de origem é mantida")
+
         # Botão de conversão
         convert_btn = ttk.Button(
             main_frame,
@@ -168,6 +2858,28 @@ class ImgToDicomConverter:
         )
         convert_btn.grid(row=4, column=0, columnspan=3, pady=(0, 10))
 
+        # Seção de conversão em lote
+        batch_frame = ttk.LabelFrame(main_frame, text="Conversão em Lote (pasta de .img)", padding="10")
+        batch_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
+        batch_frame.columnconfigure(1, weight=1)
+
+        ttk.Label(batch_frame, text="Pasta de entrada:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Entry(batch_frame, textvariable=self.batch_input_folder, width=50).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Button(batch_frame, text="Procurar...", command=self.browse_batch_input).grid(row=0, column=2, padx=(5, 0))
+
+        ttk.Label(batch_frame, text="Pasta de saída:").grid(row=1, column=0, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        ttk.Entry(batch_frame, textvariable=self.batch_output_folder, width=50).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5, pady=(5, 0))
+        ttk.Button(batch_frame, text="Procurar...", command=self.browse_batch_output).grid(row=1, column=2, padx=(5, 0), pady=(5, 0))
+
+        options_frame = ttk.Frame(batch_frame)
+        options_frame.grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        recursive_check = ttk.Checkbutton(options_frame, text="Incluir subpastas", variable=self.batch_recursive_var)
+        recursive_check.pack(side=tk.LEFT)
+        ToolTip(recursive_check, "Procura .img em todas as subpastas e espelha a estrutura na saída")
+        ttk.Label(options_frame, text="Processos:").pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Spinbox(options_frame, from_=1, to=64, textvariable=self.batch_workers_var, width=5).pack(side=tk.LEFT)
+        ttk.Button(options_frame, text="Converter Pasta", command=self.convert_folder).pack(side=tk.LEFT, padx=(20, 0))
+
         # Barra de status
         self.status_label = ttk.Label(
             main_frame,
@@ -175,7 +2887,7 @@ class ImgToDicomConverter:
             relief=tk.SUNKEN,
             anchor=tk.W
         )
-        self.status_label.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        self.status_label.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E))
 
         # Configurar peso das linhas para expansão
         main_frame.rowconfigure(2, weight=1)
@@ -206,6 +2918,20 @@ class ImgToDicomConverter:
         if filename:
             self.output_file.set(filename)
 
+    def browse_batch_input(self):
+        """Procurar pasta de entrada do lote"""
+        folder = filedialog.askdirectory(title="Selecione a pasta com arquivos .img")
+        if folder:
+            self.batch_input_folder.set(folder)
+            if not self.batch_output_folder.get():
+                self.batch_output_folder.set(os.path.join(folder, "DICOM_convertidos"))
+
+    def browse_batch_output(self):
+        """Procurar pasta de saída do lote"""
+        folder = filedialog.askdirectory(title="Selecione a pasta de saída")
+        if folder:
+            self.batch_output_folder.set(folder)
+
     def update_status(self, message):
         """Atualizar barra de status"""
         self.status_label.config(text=message)
@@ -213,47 +2939,26 @@ class ImgToDicomConverter:
 
     def generate_output_filename(self, ds, input_path):
         """Gerar nome de arquivo baseado nos campos DICOM"""
-        output_dir = os.path.dirname(input_path)
-        series_desc = str(getattr(ds, 'SeriesDescription', '')).strip()
-        rt_label = str(getattr(ds, 'RTImageLabel', '')).strip()
-        patient_id = str(getattr(ds, 'PatientID', '')).strip()
-        study_date = str(getattr(ds, 'StudyDate', '')).strip()
+        return generate_output_filename(ds, input_path)
 
-        filename = None
-
-        if series_desc and series_desc != 'N/A':
-            filename = series_desc.replace(':', '').replace('/', '_').replace('\\', '_')
-            filename = filename.replace('*', '').replace('?', '').replace('"', '')
-            filename = filename.replace('<', '').replace('>', '').replace('|', '')
-            filename = filename.strip()
-
-        if not filename and rt_label and rt_label != 'N/A':
-            filename = rt_label.replace(':', '').replace('/', '_').replace('\\', '_')
-            filename = filename.replace('*', '').replace('?', '').replace('"', '')
-            filename = filename.replace('<', '').replace('>', '').replace('|', '')
-            filename = filename.strip()
-
-        if not filename and patient_id and patient_id != 'N/A':
-            filename = f"{patient_id}"
-            if study_date and study_date != 'N/A':
-                filename += f"_{study_date}"
-
-        if not filename:
-            base_name = os.path.splitext(os.path.basename(input_path))[0]
-            filename = f"{base_name}_converted"
-
-        filename = filename.strip()
-        if not filename:
-            filename = "converted"
-
-        output_path = os.path.join(output_dir, f"{filename}.dcm")
-
-        counter = 1
-        while os.path.exists(output_path):
-            output_path = os.path.join(output_dir, f"{filename}_{counter}.dcm")
-            counter += 1
+    def show_image(self):
+        """Abrir o visualizador com os pixels do .img (memmap quando não comprimido)"""
+        input_path = self.input_file.get()
+        if not input_path or not os.path.exists(input_path):
+            messagebox.showwarning("Atenção", "Selecione um arquivo de entrada primeiro!")
+            return
 
-        return output_path
+        try:
+            try:
+                pixels, _ = open_dicom_memmap(input_path)
+            except ValueError:
+                ds = fix_img_header(read_img_dataset(input_path))
+                pixels = ds.pixel_array
+            if pixels.ndim > 2:
+                pixels = pixels[0]
+            ImageViewer(self.root, pixels, title=f"Visualizar - {os.path.basename(input_path)}")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível abrir a imagem:\n{str(e)}")
 
     def analyze_file(self):
         """Analisar arquivo .img"""
@@ -271,12 +2976,12 @@ class ImgToDicomConverter:
         self.info_text.delete(1.0, tk.END)
 
         try:
-            try:
-                ds = pydicom.dcmread(input_path)
-            except:
-                ds = pydicom.dcmread(input_path, force=True)
+            # Apenas o header: os pixels são lidos somente na conversão
+            ds, force = read_img_header(input_path)
 
             self.current_dataset = ds
+            self.current_input = input_path
+            self.current_force = force
 
             suggested_output = self.generate_output_filename(ds, input_path)
             self.output_file.set(suggested_output)
@@ -331,6 +3036,7 @@ class ImgToDicomConverter:
             info.append(f"Dimensões: {getattr(ds, 'Rows', 'N/A')} x {getattr(ds, 'Columns', 'N/A')} pixels")
             info.append(f"Bits Alocados: {getattr(ds, 'BitsAllocated', 'N/A')}")
             info.append(f"Interpretação Fotométrica: {getattr(ds, 'PhotometricInterpretation', 'N/A')}")
+            info.append(f"Codificação: {source_transfer_syntax(ds).name}")
 
             info.append("\n" + "="*80)
 
@@ -356,31 +3062,16 @@ class ImgToDicomConverter:
         self.update_status("Convertendo arquivo...")
 
         try:
-            ds = self.current_dataset
+            ds = read_img_dataset(self.current_input, self.current_force)
 
             # Criar ou corrigir File Meta Information Header
-            if not hasattr(ds, 'file_meta') or not ds.file_meta:
-                ds.file_meta = FileMetaDataset()
-
-            if not hasattr(ds.file_meta, 'TransferSyntaxUID') or not ds.file_meta.TransferSyntaxUID:
-                ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
-
-            if not hasattr(ds.file_meta, 'MediaStorageSOPClassUID'):
-                if hasattr(ds, 'SOPClassUID'):
-                    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
-
-            if not hasattr(ds.file_meta, 'MediaStorageSOPInstanceUID'):
-                if hasattr(ds, 'SOPInstanceUID'):
-                    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+            fix_img_header(ds)
 
-            if not hasattr(ds.file_meta, 'ImplementationClassUID'):
-                ds.file_meta.ImplementationClassUID = generate_uid()
-
-            if not hasattr(ds.file_meta, 'ImplementationVersionName'):
-                ds.file_meta.ImplementationVersionName = "PYDICOM_" + pydicom.__version__
+            if self.transcode_var.get():
+                transcode_to_explicit_le(ds)
 
             # Salvar arquivo DICOM com header completo
-            ds.save_as(output_path, write_like_original=False)
+            save_dataset(ds, output_path)
 
             try:
                 test_ds = pydicom.dcmread(output_path)
@@ -412,6 +3103,84 @@ class ImgToDicomConverter:
             messagebox.showerror("Erro", f"Erro ao converter arquivo:\n{str(e)}")
             self.update_status("Erro na conversão.")
 
+    def convert_folder(self):
+        """Converter todos os .img de uma pasta (e subpastas) em paralelo"""
+        input_folder = self.batch_input_folder.get()
+        output_folder = self.batch_output_folder.get()
+
+        if not input_folder or not os.path.isdir(input_folder):
+            messagebox.showwarning("Atenção", "Selecione uma pasta de entrada válida!")
+            return
+
+        if not output_folder:
+            messagebox.showwarning("Atenção", "Selecione uma pasta de saída!")
+            return
+
+        try:
+            workers = max(1, int(self.batch_workers_var.get()))
+        except ValueError:
+            messagebox.showerror("Erro", "Número de processos inválido!")
+            return
+
+        self.update_status("Procurando arquivos .img...")
+        img_files = find_img_files(input_folder, self.batch_recursive_var.get())
+        if not img_files:
+            messagebox.showwarning("Atenção", "Nenhum arquivo .img encontrado na pasta!")
+            self.update_status("Nenhum arquivo .img encontrado.")
+            return
+
+        # Estrutura de subpastas espelhada na saída
+        jobs = []
+        for input_path in img_files:
+            relative_dir = os.path.relpath(os.path.dirname(input_path), input_folder)
+            output_dir = os.path.normpath(os.path.join(output_folder, relative_dir))
+            jobs.append((input_path, output_dir, self.transcode_var.get()))
+
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, "="*80 + "\n")
+        self.info_text.insert(tk.END, f"CONVERSÃO EM LOTE: {len(jobs)} arquivos .img ({workers} processos)\n")
+        self.info_text.insert(tk.END, "="*80 + "\n\n")
+
+        start_time = datetime.now()
+        converted = 0
+        total_bytes = 0
+        errors = []
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(convert_img_job, job) for job in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                relative = os.path.relpath(result['input'], input_folder)
+                if result['error']:
+                    errors.append(f"{relative}: {result['error']}")
+                    line = f"✗ {relative}: {result['error']}"
+                else:
+                    converted += 1
+                    total_bytes += result['bytes']
+                    line = f"✓ {relative} → {os.path.relpath(result['output'], output_folder)} ({result['seconds']:.2f} s)"
+
+                self.info_text.insert(tk.END, line + "\n")
+                self.info_text.see(tk.END)
+                self.update_status(f"Convertendo... {done}/{len(jobs)}")
+
+        elapsed = max((datetime.now() - start_time).total_seconds(), 1e-6)
+        summary = (
+            f"Convertidos: {converted}/{len(jobs)} | Erros: {len(errors)} | "
+            f"Tempo: {elapsed:.1f} s | {converted / elapsed:.1f} arquivos/s | "
+            f"{total_bytes / (1024 * 1024) / elapsed:.1f} MB/s"
+        )
+        self.info_text.insert(tk.END, "\n" + "="*80 + "\n" + summary + "\n")
+        self.info_text.see(tk.END)
+        self.update_status(summary)
+
+        if errors:
+            error_msg = "\n".join(errors[:10])
+            if len(errors) > 10:
+                error_msg += f"\n... e mais {len(errors) - 10} erros"
+            messagebox.showwarning("Conversão Concluída com Erros", f"{summary}\n\nPrimeiros erros:\n{error_msg}")
+        else:
+            messagebox.showinfo("Sucesso", f"Conversão em lote concluída!\n\n{summary}\n\nPasta de saída: {output_folder}")
+
 
 # ============================================================================
 # CLASSE: Conversor TIFF para DICOM
@@ -422,7 +3191,7 @@ class TiffToDicomConverter:
         self.root = tk.Toplevel(parent_window) if parent_window else tk.Tk()
         self.on_close_callback = on_close_callback
         self.root.title("Conversor TIFF para DICOM (pylinac)")
-        self.root.geometry("800x700")
+        self.root.geometry("800x840")
         self.root.resizable(True, True)
 
         # Configurar comportamento ao fechar
@@ -436,6 +3205,17 @@ class TiffToDicomConverter:
         self.coll_var = tk.StringVar(value="0")
         self.couch_var = tk.StringVar(value="0")
         self.dpi_var = tk.StringVar(value="400")
+        self.angle_step_var = tk.StringVar(value="0")
+        self.integrate_var = tk.StringVar(value="Desligado")
+        self.preflight_var = tk.BooleanVar(value=True)
+        self.crop_var = tk.StringVar(value="Desligado")
+        self.crop_mm_var = tk.StringVar(value="100")
+        self.binning_var = tk.BooleanVar(value=False)
+        self.flatfield_var = tk.BooleanVar(value=False)
+        self.dark_var = tk.StringVar()
+        self.flood_var = tk.StringVar()
+        self.bits_stored_var = tk.StringVar(value="16")
+        self.orientation_var = tk.StringVar(value="Original")
 
         # Criar interface
         self.create_widgets()
@@ -470,6 +3250,7 @@ class TiffToDicomConverter:
         ttk.Label(input_frame, text="Arquivo TIFF:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
         ttk.Entry(input_frame, textvariable=self.input_file, width=50).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
         ttk.Button(input_frame, text="Procurar...", command=self.browse_input).grid(row=0, column=2, padx=(5, 0))
+        ttk.Button(input_frame, text="Visualizar", command=self.show_image).grid(row=0, column=3, padx=(5, 0))
 
         # Parâmetros DICOM
         params_frame = ttk.LabelFrame(main_frame, text="Parâmetros DICOM (Obrigatórios)", padding="10")
@@ -501,6 +3282,80 @@ class TiffToDicomConverter:
         dpi_entry.grid(row=4, column=1, sticky=tk.W, padx=5, pady=5)
         ttk.Label(params_frame, text="Dots Per Inch (resolução da imagem)").grid(row=4, column=2, sticky=tk.W, padx=(10, 0))
 
+        ttk.Label(params_frame, text="Passo Gantry (°/frame):").grid(row=5, column=0, sticky=tk.W, padx=(0, 5), pady=5)
+        step_entry = ttk.Entry(params_frame, textvariable=self.angle_step_var, width=15)
+        step_entry.grid(row=5, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(params_frame, text="TIFF multi-página: gantry do frame i = Gantry + i × passo").grid(row=5, column=2, sticky=tk.W, padx=(10, 0))
+
+        ttk.Label(params_frame, text="Integração de frames:").grid(row=6, column=0, sticky=tk.W, padx=(0, 5), pady=5)
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.integrate_var,
+            values=["Desligado"] + list(INTEGRATION_MODES.keys()),
+            state="readonly",
+            width=12
+        ).grid(row=6, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(params_frame, text="TIFF multi-página: um único RT Image com a soma/média dos frames").grid(row=6, column=2, sticky=tk.W, padx=(10, 0))
+
+        ttk.Checkbutton(
+            params_frame,
+            text="Verificação prévia",
+            variable=self.preflight_var
+        ).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=5)
+        ttk.Label(params_frame, text="Saturação, campo, SNR e BB conferidos antes de converter").grid(row=7, column=2, sticky=tk.W, padx=(10, 0))
+
+        ttk.Label(params_frame, text="Recorte (ROI):").grid(row=8, column=0, sticky=tk.W, padx=(0, 5), pady=5)
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.crop_var,
+            values=CROP_MODES,
+            state="readonly",
+            width=12
+        ).grid(row=8, column=1, sticky=tk.W, padx=5, pady=5)
+
+        crop_frame = ttk.Frame(params_frame)
+        crop_frame.grid(row=8, column=2, sticky=tk.W, padx=(10, 0))
+        ttk.Label(crop_frame, text="Lado (mm):").pack(side=tk.LEFT)
+        ttk.Entry(crop_frame, textvariable=self.crop_mm_var, width=8).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(crop_frame, text="Binning 2×2", variable=self.binning_var).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Label(crop_frame, text=f"(automático: campo + {CROP_MARGIN_MM:.0f} mm)").pack(side=tk.LEFT, padx=(10, 0))
+
+        ttk.Checkbutton(
+            params_frame,
+            text="Correção flat-field",
+            variable=self.flatfield_var
+        ).grid(row=9, column=0, columnspan=2, sticky=tk.W, pady=5)
+
+        calibration_frame = ttk.Frame(params_frame)
+        calibration_frame.grid(row=9, column=2, sticky=tk.W, padx=(10, 0))
+        ttk.Label(calibration_frame, text="Dark:").pack(side=tk.LEFT)
+        ttk.Entry(calibration_frame, textvariable=self.dark_var, width=18).pack(side=tk.LEFT, padx=2)
+        ttk.Button(calibration_frame, text="...", width=3,
+                   command=lambda: self.browse_calibration(self.dark_var)).pack(side=tk.LEFT)
+        ttk.Label(calibration_frame, text="Flood:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Entry(calibration_frame, textvariable=self.flood_var, width=18).pack(side=tk.LEFT, padx=2)
+        ttk.Button(calibration_frame, text="...", width=3,
+                   command=lambda: self.browse_calibration(self.flood_var)).pack(side=tk.LEFT)
+
+        ttk.Label(params_frame, text="BitsStored:").grid(row=10, column=0, sticky=tk.W, padx=(0, 5), pady=5)
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.bits_stored_var,
+            values=BITS_STORED_OPTIONS,
+            state="readonly",
+            width=12
+        ).grid(row=10, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(params_frame, text="Pixels em uint16; soma/float gravados com RescaleSlope/Intercept").grid(row=10, column=2, sticky=tk.W, padx=(10, 0))
+
+        ttk.Label(params_frame, text="Orientação:").grid(row=11, column=0, sticky=tk.W, padx=(0, 5), pady=5)
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.orientation_var,
+            values=list(ORIENTATION_MODES.keys()),
+            state="readonly",
+            width=24
+        ).grid(row=11, column=1, columnspan=2, sticky=tk.W, padx=5, pady=5)
+
         # Arquivo de saída
         output_frame = ttk.LabelFrame(main_frame, text="Arquivo de Saída (DICOM)", padding="10")
         output_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -527,7 +3382,9 @@ class TiffToDicomConverter:
 
         info_msg = """CONVERSOR TIFF PARA DICOM usando pylinac
 
-Este conversor utiliza a função image.tiff_to_dicom() do pylinac para criar
+Este conversor lê o TIFF página a página, aplica correção flat-field,
+orientação e recorte, e monta o RT Image com image.array_to_dicom() do
+pylinac, gravando ImagePlanePixelSpacing e RTImagePosition em mm, para
 arquivos DICOM compatíveis com análise de Winston-Lutz.
 
 IMPORTANTE: Os parâmetros são detectados automaticamente do nome do arquivo
@@ -656,6 +3513,20 @@ quando seguem padrões como: gantry_0.tiff, g90.tiff, coll_45.tiff, etc.
             self.output_file.set(f"{base_name}.dcm")
             self.update_status("Arquivo TIFF selecionado. Verifique os parâmetros e clique em Converter.")
 
+            try:
+                n_frames = count_tiff_frames(filename)
+            except Exception:
+                n_frames = 1
+            if n_frames > 1:
+                self.info_text.delete(1.0, tk.END)
+                self.info_text.insert(1.0,
+                    f"TIFF MULTI-PÁGINA DETECTADO: {n_frames} frames\n\n"
+                    f"Será gerado um RT Image por frame:\n"
+                    f"  {os.path.basename(base_name)}_f000.dcm ... "
+                    f"{os.path.basename(frame_output_name(base_name, n_frames - 1))}.dcm\n\n"
+                    f"Gantry do frame i = Gantry + i × Passo Gantry (°/frame)")
+                self.update_status(f"TIFF com {n_frames} frames. Configure o passo de gantry e clique em Converter.")
+
     def show_rename_dialog(self, current_path, suggestion):
         """Mostra diálogo para renomear arquivo"""
         dialog = tk.Toplevel(self.root)
@@ -758,6 +3629,23 @@ quando seguem padrões como: gantry_0.tiff, g90.tiff, coll_45.tiff, etc.
         except ValueError:
             errors.append("DPI deve ser um número válido")
 
+        try:
+            float(self.angle_step_var.get())
+        except ValueError:
+            errors.append("Passo do Gantry deve ser um número válido")
+
+        if self.crop_var.get() == "Tamanho fixo":
+            try:
+                if float(self.crop_mm_var.get()) <= 0:
+                    errors.append("Lado do recorte deve ser maior que 0")
+            except ValueError:
+                errors.append("Lado do recorte deve ser um número válido")
+
+        if self.flatfield_var.get():
+            for label, path in (("dark", self.dark_var.get()), ("flood", self.flood_var.get())):
+                if not path or not os.path.exists(path):
+                    errors.append(f"Mapa de calibração {label} não encontrado")
+
         return errors
 
     def convert_file(self):
@@ -805,16 +3693,37 @@ quando seguem padrões como: gantry_0.tiff, g90.tiff, coll_45.tiff, etc.
             couch = float(self.couch_var.get())
             dpi = float(self.dpi_var.get())
 
-            new_dicom = image.tiff_to_dicom(
-                input_path,
+            if count_tiff_frames(input_path) > 1:
+                integration = INTEGRATION_MODES.get(self.integrate_var.get())
+                if integration:
+                    self.convert_integrated(input_path, output_path, integration, sid, gantry, coll, couch, dpi)
+                else:
+                    self.convert_multipage(input_path, output_path, sid, gantry, coll, couch, dpi)
+                return
+
+            with TiffFrameReader(input_path) as reader:
+                frame = reader.frame(0)
+                frame_dpi = resolve_tiff_dpi(reader.frame_info(), dpi, sid)
+
+            frame = self.correct(frame)
+            if not self.confirm_preflight(frame):
+                self.update_status("Conversão cancelada (verificação prévia).")
+                return
+
+            frame, frame_dpi, position = self.reduce(frame, frame_dpi)
+            new_dicom = frame_to_rt_image(
+                frame,
                 sid=sid,
                 gantry=gantry,
                 coll=coll,
                 couch=couch,
-                dpi=dpi
+                dpi=frame_dpi,
+                position=position,
+                bits_stored=int(self.bits_stored_var.get())
             )
+            del frame
 
-            new_dicom.save_as(output_path, write_like_original=False)
+            save_dataset(new_dicom, output_path)
 
             self.info_text.delete(1.0, tk.END)
             info_msg = f"""CONVERSÃO CONCLUÍDA COM SUCESSO!
@@ -828,8 +3737,10 @@ PARÂMETROS UTILIZADOS:
 - Collimator Angle: {coll}°
 - Couch Angle: {couch}°
 - DPI: {dpi}
+- Imagem: {new_dicom.Rows}×{new_dicom.Columns} pixels, {float(new_dicom.ImagePlanePixelSpacing[0]):.4f} mm/pixel
 
-O arquivo DICOM foi criado usando a função nativa do pylinac
+O RT Image foi montado a partir dos pixels lidos do TIFF
+(image.array_to_dicom() do pylinac), com RTImagePosition em mm,
 e está compatível com análise de Winston-Lutz.
             """
             self.info_text.insert(1.0, info_msg.strip())
@@ -860,6 +3771,166 @@ e está compatível com análise de Winston-Lutz.
             self.info_text.delete(1.0, tk.END)
             self.info_text.insert(1.0, f"ERRO:\n{str(e)}")
 
+    def browse_calibration(self, variable):
+        """Selecionar mapa de calibração (dark ou flood)"""
+        filename = filedialog.askopenfilename(
+            title="Selecionar mapa de calibração",
+            filetypes=[("TIFF / NumPy", "*.tif *.tiff *.npy"), ("Todos os arquivos", "*.*")]
+        )
+        if filename:
+            variable.set(filename)
+
+    def correct(self, frame, frames=1):
+        """Aplicar a correção flat-field (in-place), se ativada, e a orientação (view)"""
+        if self.flatfield_var.get():
+            load_calibration(self.dark_var.get(), self.flood_var.get()).apply(frame, frames)
+        return orient_view(frame, self.orientation_var.get())
+
+    def reduce(self, frame, dpi):
+        """Aplicar recorte/binning escolhidos. Retorna (pixels, dpi, position)"""
+        crop = {"Automático": 'auto', "Tamanho fixo": float(self.crop_mm_var.get() or 0)}.get(self.crop_var.get())
+        return reduce_frame(frame, dpi, crop, 2 if self.binning_var.get() else 1)
+
+    def show_image(self):
+        """Visualizar a primeira página como será convertida (correção, orientação, recorte)"""
+        input_path = self.input_file.get()
+        if not input_path or not os.path.exists(input_path):
+            messagebox.showwarning("Atenção", "Selecione um arquivo TIFF primeiro!")
+            return
+
+        try:
+            dpi = float(self.dpi_var.get())
+            with TiffFrameReader(input_path) as reader:
+                frame = reader.frame(0)
+                n_frames = reader.n_frames
+            pixels, dpi, _ = self.reduce(self.correct(frame), dpi)
+            title = f"Visualizar - {os.path.basename(input_path)}"
+            if n_frames > 1:
+                title += f" (página 1/{n_frames})"
+            ImageViewer(self.root, pixels, title=title, dpi=dpi)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível abrir a imagem:\n{str(e)}")
+
+    def confirm_preflight(self, frame):
+        """Verificação prévia de uma imagem; pergunta se converte mesmo reprovada"""
+        if not self.preflight_var.get():
+            return True
+        result = preflight_check(frame, bits_stored=int(self.bits_stored_var.get()))
+        if result['ok']:
+            return True
+        return messagebox.askyesno(
+            "Verificação Prévia",
+            "A imagem foi reprovada na verificação prévia:\n\n"
+            + "\n".join(f"• {issue}" for issue in result['issues'])
+            + "\n\nConverter mesmo assim?"
+        )
+
+    def convert_multipage(self, input_path, output_path, sid, gantry, coll, couch, dpi):
+        """Converter TIFF multi-página em um RT Image por frame"""
+        step = float(self.angle_step_var.get())
+        output_dir = os.path.dirname(output_path)
+        base_name = os.path.splitext(os.path.basename(output_path))[0]
+        created = []
+        flagged = []
+
+        with TiffFrameReader(input_path) as reader:
+            for index, frame in reader:
+                self.update_status(f"Convertendo frame {index + 1}/{reader.n_frames}...")
+                frame = self.correct(frame)
+                if self.preflight_var.get():
+                    result = preflight_check(frame, bits_stored=int(self.bits_stored_var.get()))
+                    if not result['ok']:
+                        flagged.append(f"Frame {index + 1}: {'; '.join(result['issues'])}")
+                frame_gantry = (gantry + index * step) % 360
+                frame, frame_dpi, position = self.reduce(frame, resolve_tiff_dpi(reader.frame_info(), dpi, sid))
+                new_dicom = frame_to_rt_image(
+                    frame,
+                    sid=sid,
+                    gantry=frame_gantry,
+                    coll=coll,
+                    couch=couch,
+                    dpi=frame_dpi,
+                    position=position,
+                    bits_stored=int(self.bits_stored_var.get())
+                )
+                frame_path = os.path.join(output_dir, f"{frame_output_name(base_name, index)}.dcm")
+                save_dataset(new_dicom, frame_path)
+                created.append(frame_path)
+                # Liberar frame antes de ler o próximo
+                del frame, new_dicom
+
+        self.info_text.delete(1.0, tk.END)
+        info_msg = f"""CONVERSÃO MULTI-PÁGINA CONCLUÍDA!
+
+Arquivo de entrada: {os.path.basename(input_path)}
+Frames convertidos: {len(created)}
+Primeiro: {os.path.basename(created[0])}
+Último: {os.path.basename(created[-1])}
+
+PARÂMETROS UTILIZADOS:
+- SID: {sid} mm
+- Gantry inicial: {gantry}° (passo {step}°/frame)
+- Collimator Angle: {coll}°
+- Couch Angle: {couch}°
+- DPI: {dpi}
+        """
+        if flagged:
+            info_msg = info_msg.strip() + "\n\nFRAMES REPROVADOS NA VERIFICAÇÃO PRÉVIA:\n" + "\n".join(flagged)
+        self.info_text.insert(1.0, info_msg.strip())
+
+        messagebox.showinfo(
+            "Sucesso",
+            f"{len(created)} frames convertidos com sucesso!\n\n"
+            f"Salvos em:\n{output_dir}"
+        )
+        self.update_status(f"Conversão concluída! {len(created)} arquivos DICOM gerados.")
+
+    def convert_integrated(self, input_path, output_path, integration, sid, gantry, coll, couch, dpi):
+        """Converter cine multi-página em um único RT Image integrado"""
+        self.update_status("Integrando frames do cine...")
+
+        integrated, n_frames = integrate_frames(iter_tiff_sequence([input_path]), integration)
+        integrated = self.correct(integrated, n_frames if integration == "sum" else 1)
+        if not self.confirm_preflight(integrated):
+            self.update_status("Conversão cancelada (verificação prévia).")
+            return
+        integrated, frame_dpi, position = self.reduce(integrated, resolve_tiff_dpi(read_tiff_info(input_path), dpi, sid))
+        new_dicom = frame_to_rt_image(
+            integrated,
+            sid=sid,
+            gantry=gantry,
+            coll=coll,
+            couch=couch,
+            dpi=frame_dpi,
+            position=position,
+            bits_stored=int(self.bits_stored_var.get())
+        )
+        save_dataset(new_dicom, output_path)
+
+        self.info_text.delete(1.0, tk.END)
+        info_msg = f"""IMAGEM INTEGRADA CRIADA COM SUCESSO!
+
+Arquivo de entrada: {os.path.basename(input_path)}
+Arquivo de saída: {os.path.basename(output_path)}
+Frames integrados: {n_frames} ({self.integrate_var.get().lower()})
+Tipo de pixel: {integrated.dtype}
+
+PARÂMETROS UTILIZADOS:
+- SID: {sid} mm
+- Gantry Angle: {gantry}°
+- Collimator Angle: {coll}°
+- Couch Angle: {couch}°
+- DPI: {dpi}
+        """
+        self.info_text.insert(1.0, info_msg.strip())
+
+        messagebox.showinfo(
+            "Sucesso",
+            f"{n_frames} frames integrados em um único RT Image!\n\n"
+            f"Salvo em:\n{output_path}"
+        )
+        self.update_status(f"Conversão concluída! Arquivo: {os.path.basename(output_path)}")
+
 
 # ============================================================================
 # CLASSE: Conversor em Lote TIFF para DICOM
@@ -870,7 +3941,7 @@ class BatchTiffToDicomConverter:
         self.root = tk.Toplevel(parent_window) if parent_window else tk.Tk()
         self.on_close_callback = on_close_callback
         self.root.title("Conversor em Lote TIFF para DICOM")
-        self.root.geometry("1000x700")
+        self.root.geometry("1000x840")
         self.root.resizable(True, True)
 
         # Configurar comportamento ao fechar
@@ -878,6 +3949,7 @@ class BatchTiffToDicomConverter:
 
         # Arquivo de templates
         self.templates_file = os.path.join(os.path.dirname(__file__), "templates_wl.json")
+        self.template_repository = get_template_repository(self.templates_file)
 
         # Variáveis
         self.input_folder = tk.StringVar()
@@ -885,12 +3957,78 @@ class BatchTiffToDicomConverter:
         self.sid_var = tk.StringVar(value="1600")
         self.dpi_var = tk.StringVar(value="400")
 
+        # TIFF multi-página (cine/arco): um DICOM por página
+        self.split_pages_var = tk.BooleanVar(value=False)
+        self.page_angles_var = tk.StringVar(value="Template")
+        self.page_step_var = tk.StringVar(value="1")
+
+        # Integração de cine (um RT Image somado/médio por feixe)
+        self.integrate_var = tk.StringVar(value="Desligado")
+
+        # Processos usados na conversão em lote
+        self.workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+
+        # Verificação prévia de qualidade (imagens reprovadas não são convertidas)
+        self.preflight_var = tk.BooleanVar(value=True)
+
+        # Recorte em torno do campo e binning (lado do recorte "Template": chave crop_mm)
+        self.crop_var = tk.StringVar(value="Desligado")
+        self.binning_var = tk.BooleanVar(value=False)
+        self.template_crop_mm = None
+
+        # BitsStored dos pixels gravados (uint16)
+        self.bits_stored_var = tk.StringVar(value="16")
+
+        # Orientação do painel ("Template": chave orientation do template)
+        self.orientation_var = tk.StringVar(value="Template")
+        self.template_orientation = "Original"
+
+        # Correção flat-field (mapas dark/flood do painel)
+        self.flatfield_var = tk.BooleanVar(value=False)
+        self.dark_var = tk.StringVar()
+        self.flood_var = tk.StringVar()
+
+        # Cache local para pastas de rede
+        self.staging_var = tk.BooleanVar(value=False)
+        self.staging_cache = None
+
+        # Busca de TIFFs (subpastas e filtros) em thread, com cache de listagens
+        self.recursive_var = tk.BooleanVar(value=False)
+        self.include_var = tk.StringVar(value=TIFF_INCLUDE_DEFAULT)
+        self.exclude_var = tk.StringVar(value="")
+        self.listing_cache = None
+        self.scan_queue = queue.Queue()
+        self.scan_generation = 0
+        self.scan_running = False
+        self.scan_preview_time = 0.0
+
         # Lista de conversões (nome_arquivo, gantry, coll, couch, nome_saida)
         self.conversion_list = []
 
         # Arquivos encontrados na pasta
         self.tiff_files = []
 
+        # Número de páginas por arquivo TIFF (cache)
+        self.page_counts = {}
+
+        # Miniaturas do preview: uma thread consome os pedidos (lotes de
+        # células) e entrega as imagens pela fila
+        self.thumbnail_cache = None
+        self.thumbnail_requests = queue.Queue()
+        self.thumbnail_thread = None
+        self.thumbnail_lock = threading.Lock()
+        self.thumbnail_queue = queue.Queue()
+        self.thumbnail_generation = 0
+        self.thumbnail_remaining = 0
+        self.thumbnail_images = []
+        self.thumbnail_columns = 4
+        self.thumbnail_jobs = []
+        self.thumbnail_tasks = []
+        self.thumbnail_labels = []
+
+        # Texto exibido no preview (cabeçalho, blocos por conversão, rodapé)
+        self.preview_state = None
+
         # Variável para drag-and-drop
         self.drag_start_index = None
 
@@ -910,39 +4048,29 @@ class BatchTiffToDicomConverter:
             self.on_close_callback()
 
     def load_templates_from_json(self):
-        """Carregar templates do arquivo JSON"""
+        """Carregar templates do JSON (cache do repositório; relido só se o arquivo mudou)"""
         try:
-            if os.path.exists(self.templates_file):
-                with open(self.templates_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('templates', {})
-            else:
-                # Criar arquivo padrão se não existir
-                default_data = {
-                    "templates": {
-                        "WL Standard 4": {
-                            "description": "Winston-Lutz padrão: 4 ângulos de gantry",
-                            "items": [
-                                {"name": "gantry_0", "gantry": "0", "coll": "0", "couch": "0"},
-                                {"name": "gantry_90", "gantry": "90", "coll": "0", "couch": "0"},
-                                {"name": "gantry_180", "gantry": "180", "coll": "0", "couch": "0"},
-                                {"name": "gantry_270", "gantry": "270", "coll": "0", "couch": "0"}
-                            ]
-                        }
-                    }
-                }
-                self.save_templates_to_json(default_data['templates'])
-                return default_data['templates']
+            return self.template_repository.all()
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar templates:\n{str(e)}")
             return {}
 
-    def save_templates_to_json(self, templates_dict):
-        """Salvar templates no arquivo JSON"""
+    def save_templates_to_json(self, changes):
+        """Gravar alterações {nome: template ou None} no JSON, confirmando conflitos"""
         try:
-            data = {"templates": templates_dict}
-            with open(self.templates_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            conflicts = self.template_repository.save(changes)
+            if conflicts:
+                names = ", ".join(f"'{name}'" for name in conflicts)
+                if not messagebox.askyesno(
+                    "Conflito",
+                    f"O(s) template(s) {names} foram alterados em outra estação desde que foram carregados.\n\n"
+                    "Sobrescrever com a versão desta estação?"
+                ):
+                    self.templates_data = self.template_repository.templates
+                    self.update_template_combo()
+                    return False
+                self.template_repository.save(changes, overwrite=True)
+            self.templates_data = self.template_repository.templates
             return True
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar templates:\n{str(e)}")
@@ -992,14 +4120,18 @@ class BatchTiffToDicomConverter:
             if not desc:
                 desc = f"Template customizado com {len(self.conversion_list)} itens"
 
-            # Adicionar ao dicionário de templates
-            self.templates_data[name] = {
+            template = {
                 "description": desc,
                 "items": [item.copy() for item in self.conversion_list]
             }
-
-            # Salvar no JSON
-            if self.save_templates_to_json(self.templates_data):
+            if self.template_crop_mm:
+                template["crop_mm"] = self.template_crop_mm
+            orientation = self.orientation_setting()
+            if orientation != "Original":
+                template["orientation"] = orientation
+
+            # Salvar no JSON (apenas este template)
+            if self.save_templates_to_json({name: template}):
                 messagebox.showinfo("Sucesso", f"Template '{name}' salvo com sucesso!")
                 # Atualizar combo box
                 self.update_template_combo()
@@ -1033,15 +4165,15 @@ class BatchTiffToDicomConverter:
             return
 
         if messagebox.askyesno("Confirmar", f"Deseja realmente deletar o template '{current}'?"):
-            del self.templates_data[current]
-            if self.save_templates_to_json(self.templates_data):
+            if self.save_templates_to_json({current: None}):
                 messagebox.showinfo("Sucesso", f"Template '{current}' deletado!")
                 self.update_template_combo()
                 self.template_combo.set("WL Standard 4")
                 self.load_template("WL Standard 4")
 
     def update_template_combo(self):
-        """Atualizar lista de templates no combo box"""
+        """Atualizar lista de templates no combo box (inclui alterações de outras estações)"""
+        self.templates_data = self.load_templates_from_json()
         template_names = list(self.templates_data.keys()) + ["Custom"]
         self.template_combo['values'] = template_names
 
@@ -1078,6 +4210,35 @@ class BatchTiffToDicomConverter:
         ttk.Entry(folders_frame, textvariable=self.output_folder, width=50).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5, pady=(5, 0))
         ttk.Button(folders_frame, text="Procurar...", command=self.browse_output_folder).grid(row=1, column=2, padx=(5, 0), pady=(5, 0))
 
+        # Busca: subpastas e filtros
+        filters_frame = ttk.Frame(folders_frame)
+        filters_frame.grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        ttk.Checkbutton(
+            filters_frame, text="Incluir subpastas", variable=self.recursive_var, command=self.rescan_tiff_files
+        ).pack(side=tk.LEFT)
+        ttk.Label(filters_frame, text="Incluir:").pack(side=tk.LEFT, padx=(15, 5))
+        include_entry = ttk.Entry(filters_frame, textvariable=self.include_var, width=18)
+        include_entry.pack(side=tk.LEFT)
+        ttk.Label(filters_frame, text="Excluir:").pack(side=tk.LEFT, padx=(15, 5))
+        exclude_entry = ttk.Entry(filters_frame, textvariable=self.exclude_var, width=18)
+        exclude_entry.pack(side=tk.LEFT)
+        ttk.Button(filters_frame, text="Buscar", command=self.rescan_tiff_files).pack(side=tk.LEFT, padx=(10, 0))
+        include_entry.bind('<Return>', lambda e: self.rescan_tiff_files())
+        exclude_entry.bind('<Return>', lambda e: self.rescan_tiff_files())
+
+        filters_help = ttk.Label(filters_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        filters_help.pack(side=tk.LEFT, padx=(5, 0))
+        ToolTip(filters_help,
+            "Busca de arquivos TIFF\n\n"
+            "Padrões glob separados por ';' (sem diferenciar maiúsculas).\n"
+            "Sem '/' comparam o nome; com '/' o caminho relativo.\n\n"
+            "• Incluir: *.tif;*.tiff (padrão), *_WL_*.tif\n"
+            "• Excluir: arquivos ou subpastas, ex.: antigo;*/teste/*\n\n"
+            "Subpastas em ordem alfabética do caminho (ex.: data/máquina).\n"
+            "Listagens ficam em cache: pastas sem alteração (mtime)\n"
+            "não são listadas de novo."
+        )
+
         # ===== SEÇÃO: Parâmetros Globais =====
         params_frame = ttk.LabelFrame(main_frame, text="Parâmetros Globais DICOM", padding="10")
         params_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -1112,6 +4273,198 @@ class BatchTiffToDicomConverter:
             "• Essencial para medidas precisas"
         )
 
+        # TIFF multi-página
+        ttk.Checkbutton(
+            params_frame,
+            text="Separar TIFF multi-página",
+            variable=self.split_pages_var,
+            command=self.update_preview
+        ).grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(8, 0))
+
+        ttk.Label(params_frame, text="Ângulos por página:").grid(row=1, column=3, sticky=tk.W, padx=(20, 5), pady=(8, 0))
+        page_angles_combo = ttk.Combobox(
+            params_frame,
+            textvariable=self.page_angles_var,
+            values=["Template", "Passo angular"],
+            state="readonly",
+            width=13
+        )
+        page_angles_combo.grid(row=1, column=4, sticky=tk.W, padx=5, pady=(8, 0))
+        page_angles_combo.bind('<<ComboboxSelected>>', lambda e: self.update_preview())
+
+        ttk.Label(params_frame, text="Passo (°/página):").grid(row=1, column=6, sticky=tk.W, padx=(20, 5), pady=(8, 0))
+        ttk.Entry(params_frame, textvariable=self.page_step_var, width=8).grid(row=1, column=7, sticky=tk.W, padx=5, pady=(8, 0))
+
+        pages_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        pages_help.grid(row=1, column=8, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(pages_help,
+            "TIFF multi-página (cine / arco)\n\n"
+            "Cada página do TIFF vira um RT Image separado.\n"
+            "As páginas são lidas uma a uma (memória constante).\n\n"
+            "• Template: cada página usa o próximo item do template\n"
+            "• Passo angular: cada arquivo usa um item do template;\n"
+            "  gantry da página i = gantry do item + i × passo\n"
+            "  (saída: nome_f000.dcm, nome_f001.dcm, ...)"
+        )
+
+        # Integração de cine
+        ttk.Label(params_frame, text="Integração (cine):").grid(row=2, column=0, sticky=tk.W, padx=(0, 5), pady=(8, 0))
+        integrate_combo = ttk.Combobox(
+            params_frame,
+            textvariable=self.integrate_var,
+            values=["Desligado"] + list(BATCH_INTEGRATION_MODES.keys()),
+            state="readonly",
+            width=18
+        )
+        integrate_combo.grid(row=2, column=1, columnspan=3, sticky=tk.W, padx=5, pady=(8, 0))
+        integrate_combo.bind('<<ComboboxSelected>>', lambda e: self.update_preview())
+
+        integrate_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        integrate_help.grid(row=2, column=4, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(integrate_help,
+            "Imagem integrada de cine EPID\n\n"
+            "Soma (ou média) os frames em um único RT Image por feixe,\n"
+            "acumulando um frame por vez (pico de ~2 frames em memória).\n\n"
+            "• Por arquivo: cada TIFF multi-página → um item do template\n"
+            "• Da pasta: todos os TIFFs sequenciais → primeiro item do template\n\n"
+            "Quando ativa, substitui a separação de páginas."
+        )
+
+        # Processos
+        ttk.Label(params_frame, text="Processos:").grid(row=2, column=6, sticky=tk.W, padx=(20, 5), pady=(8, 0))
+        ttk.Spinbox(params_frame, from_=1, to=64, textvariable=self.workers_var, width=6).grid(row=2, column=7, sticky=tk.W, padx=5, pady=(8, 0))
+
+        workers_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        workers_help.grid(row=2, column=8, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(workers_help,
+            "Número de processos da conversão em lote\n\n"
+            "O processo principal envia a cada processo só o caminho e as\n"
+            "configurações do item. Os processos decodificam, corrigem e\n"
+            "serializam o DICOM em blocos de memória compartilhada (sem cópia\n"
+            "via pickle), e o processo principal só grava os blocos no disco."
+        )
+
+        # Cache local (staging)
+        ttk.Checkbutton(
+            params_frame,
+            text="Cache local (pasta de rede)",
+            variable=self.staging_var
+        ).grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=(8, 0))
+
+        staging_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        staging_help.grid(row=3, column=3, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(staging_help,
+            "Copiar os TIFFs para um cache local antes de converter\n\n"
+            "Cópia em paralelo verificada por tamanho e SHA-256. As saídas são\n"
+            "gravadas em pasta local temporária e enviadas em bloco ao final.\n"
+            "Repetir o lote na mesma sessão não acessa a rede novamente.\n\n"
+            f"Cache: {STAGING_CACHE_DIR} (limite {STAGING_CACHE_MAX_BYTES // 1024 ** 3} GB, LRU)"
+        )
+
+        # Verificação prévia
+        ttk.Checkbutton(
+            params_frame,
+            text="Verificação prévia",
+            variable=self.preflight_var
+        ).grid(row=3, column=6, columnspan=2, sticky=tk.W, padx=(20, 0), pady=(8, 0))
+
+        preflight_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        preflight_help.grid(row=3, column=8, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(preflight_help,
+            "Verificação rápida de qualidade antes de converter\n\n"
+            "Em uma vista reduzida de cada imagem: saturação, imagem em branco,\n"
+            "campo ausente/grande/fora do centro, SNR e presença da BB.\n"
+            "Imagens reprovadas não são convertidas e aparecem como erro."
+        )
+
+        # Recorte (ROI) e binning
+        ttk.Label(params_frame, text="Recorte (ROI):").grid(row=4, column=0, sticky=tk.W, padx=(0, 5), pady=(8, 0))
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.crop_var,
+            values=BATCH_CROP_MODES,
+            state="readonly",
+            width=13
+        ).grid(row=4, column=1, columnspan=2, sticky=tk.W, padx=5, pady=(8, 0))
+
+        ttk.Label(params_frame, text="BitsStored:").grid(row=4, column=3, sticky=tk.W, padx=(20, 5), pady=(8, 0))
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.bits_stored_var,
+            values=BITS_STORED_OPTIONS,
+            state="readonly",
+            width=6
+        ).grid(row=4, column=4, sticky=tk.W, padx=5, pady=(8, 0))
+
+        # Orientação
+        ttk.Label(params_frame, text="Orientação:").grid(row=6, column=0, sticky=tk.W, padx=(0, 5), pady=(8, 0))
+        ttk.Combobox(
+            params_frame,
+            textvariable=self.orientation_var,
+            values=["Template"] + list(ORIENTATION_MODES.keys()),
+            state="readonly",
+            width=24
+        ).grid(row=6, column=1, columnspan=4, sticky=tk.W, padx=5, pady=(8, 0))
+
+        orientation_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        orientation_help.grid(row=6, column=5, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(orientation_help,
+            "Corrigir imagens espelhadas/giradas em relação à orientação IEC\n\n"
+            "• Template: usa a chave 'orientation' do template\n"
+            "  (por máquina/painel; sem ela, Original)\n"
+            "• Demais opções: forçam a orientação para este lote\n\n"
+            "Aplicada como view NumPy, sem cópias extras do frame.\n"
+            "A correção flat-field é feita antes (orientação do painel)."
+        )
+
+        ttk.Checkbutton(
+            params_frame,
+            text="Binning 2×2",
+            variable=self.binning_var
+        ).grid(row=4, column=6, columnspan=2, sticky=tk.W, padx=(20, 0), pady=(8, 0))
+
+        crop_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        crop_help.grid(row=4, column=8, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(crop_help,
+            "Reduzir as imagens antes da conversão\n\n"
+            f"• Automático: caixa do campo + {CROP_MARGIN_MM:.0f} mm de margem\n"
+            "• Template: quadrado de 'crop_mm' mm centrado no campo\n"
+            "  (chave do template; sem ela, usa o automático)\n"
+            "• Binning 2×2: média de 2×2 pixels (4× menos pixels)\n\n"
+            "ImagePlanePixelSpacing e RTImagePosition são ajustados,\n"
+            "mantendo a geometria correta.\n\n"
+            "BitsStored: pixels sempre gravados em uint16; imagens somadas\n"
+            "ou float são reescaladas com RescaleSlope/RescaleIntercept."
+        )
+
+        # Correção flat-field
+        ttk.Checkbutton(
+            params_frame,
+            text="Correção flat-field",
+            variable=self.flatfield_var
+        ).grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=(8, 0))
+
+        calibration_frame = ttk.Frame(params_frame)
+        calibration_frame.grid(row=5, column=2, columnspan=6, sticky=tk.W, padx=5, pady=(8, 0))
+        ttk.Label(calibration_frame, text="Dark:").pack(side=tk.LEFT)
+        ttk.Entry(calibration_frame, textvariable=self.dark_var, width=22).pack(side=tk.LEFT, padx=2)
+        ttk.Button(calibration_frame, text="...", width=3,
+                   command=lambda: self.browse_calibration(self.dark_var)).pack(side=tk.LEFT)
+        ttk.Label(calibration_frame, text="Flood:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Entry(calibration_frame, textvariable=self.flood_var, width=22).pack(side=tk.LEFT, padx=2)
+        ttk.Button(calibration_frame, text="...", width=3,
+                   command=lambda: self.browse_calibration(self.flood_var)).pack(side=tk.LEFT)
+
+        flatfield_help = ttk.Label(params_frame, text="?", foreground="blue", cursor="hand2", font=('Arial', 9, 'bold'))
+        flatfield_help.grid(row=5, column=8, sticky=tk.W, padx=(2, 0), pady=(8, 0))
+        ToolTip(flatfield_help,
+            "Correção de ganho do painel: (raw - dark) / (flood - dark)\n\n"
+            "Dark: imagem sem feixe; Flood: campo aberto uniforme\n"
+            "(TIFF, média das páginas, ou .npy).\n\n"
+            "Os mapas são convertidos uma vez para float32 e reutilizados\n"
+            f"em memmap por todo o lote (cache: {CALIBRATION_CACHE_DIR})."
+        )
+
         # ===== LAYOUT PRINCIPAL: 2 colunas =====
         content_frame = ttk.Frame(main_frame)
         content_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -1131,7 +4484,9 @@ class BatchTiffToDicomConverter:
 
         ttk.Label(template_frame, text="Template:").pack(side=tk.LEFT, padx=(0, 5))
 
-        self.template_combo = ttk.Combobox(template_frame, state="readonly", width=18)
+        self.template_combo = ttk.Combobox(
+            template_frame, state="readonly", width=18, postcommand=self.update_template_combo
+        )
         # Carregar templates do JSON
         template_names = list(self.templates_data.keys()) + ["Custom"]
         self.template_combo['values'] = template_names
@@ -1143,23 +4498,20 @@ class BatchTiffToDicomConverter:
         ttk.Button(template_frame, text="💾", command=self.save_current_template, width=3).pack(side=tk.LEFT, padx=2)
         ttk.Button(template_frame, text="🗑", command=self.delete_template, width=3).pack(side=tk.LEFT, padx=2)
 
-        # Listbox com scrollbar para itens
-        list_container = ttk.Frame(left_frame)
-        list_container.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        list_container.columnconfigure(0, weight=1)
-        list_container.rowconfigure(0, weight=1)
-
-        scrollbar = ttk.Scrollbar(list_container)
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-
-        self.items_listbox = tk.Listbox(
-            list_container,
-            font=('Courier', 9),
-            yscrollcommand=scrollbar.set,
-            selectmode=tk.SINGLE
+        # Lista virtualizada de itens (apenas as linhas visíveis são desenhadas)
+        self.items_listbox = VirtualList(
+            left_frame,
+            columns=[
+                ("index", "#", 40, tk.E),
+                ("name", "Nome", 160, tk.W),
+                ("gantry", "G", 55, tk.E),
+                ("coll", "C", 55, tk.E),
+                ("couch", "T", 55, tk.E),
+            ],
+            row_count=lambda: len(self.conversion_list),
+            row_values=self.item_row_values
         )
-        self.items_listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.config(command=self.items_listbox.yview)
+        self.items_listbox.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
         # Bind para drag-and-drop
         self.items_listbox.bind('<Button-1>', self.on_listbox_click)
@@ -1183,8 +4535,16 @@ class BatchTiffToDicomConverter:
         right_frame.columnconfigure(0, weight=1)
         right_frame.rowconfigure(0, weight=1)
 
+        preview_notebook = ttk.Notebook(right_frame)
+        preview_notebook.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        text_tab = ttk.Frame(preview_notebook)
+        text_tab.columnconfigure(0, weight=1)
+        text_tab.rowconfigure(0, weight=1)
+        preview_notebook.add(text_tab, text="Texto")
+
         self.preview_text = scrolledtext.ScrolledText(
-            right_frame,
+            text_tab,
             width=50,
             height=20,
             wrap=tk.WORD,
@@ -1192,6 +4552,22 @@ class BatchTiffToDicomConverter:
         )
         self.preview_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
+        # Grade de miniaturas (ordem de conversão)
+        thumbnails_tab = ttk.Frame(preview_notebook)
+        thumbnails_tab.columnconfigure(0, weight=1)
+        thumbnails_tab.rowconfigure(0, weight=1)
+        preview_notebook.add(thumbnails_tab, text="Miniaturas")
+
+        self.thumbnail_canvas = tk.Canvas(thumbnails_tab, background="white", highlightthickness=0)
+        thumbnail_scrollbar = ttk.Scrollbar(thumbnails_tab, orient=tk.VERTICAL, command=self.thumbnail_canvas.yview)
+        self.thumbnail_canvas.configure(yscrollcommand=thumbnail_scrollbar.set)
+        self.thumbnail_canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        thumbnail_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.thumbnail_canvas.bind(
+            '<MouseWheel>', lambda e: self.thumbnail_canvas.yview_scroll(int(-e.delta / 120), "units")
+        )
+        self.thumbnail_canvas.bind('<Double-Button-1>', self.show_job_image)
+
         ttk.Button(right_frame, text="Atualizar Preview", command=self.update_preview).grid(row=1, column=0, pady=(10, 0))
 
         # ===== SEÇÃO: Botão de Conversão e Status =====
@@ -1236,34 +4612,117 @@ class BatchTiffToDicomConverter:
             if not self.output_folder.get():
                 self.output_folder.set(folder)
 
+    def browse_calibration(self, variable):
+        """Selecionar mapa de calibração (dark ou flood)"""
+        filename = filedialog.askopenfilename(
+            title="Selecionar mapa de calibração",
+            filetypes=[("TIFF / NumPy", "*.tif *.tiff *.npy"), ("Todos os arquivos", "*.*")]
+        )
+        if filename:
+            variable.set(filename)
+
     def browse_output_folder(self):
         """Procurar pasta de saída"""
         folder = filedialog.askdirectory(title="Selecione a pasta para salvar arquivos DICOM")
         if folder:
             self.output_folder.set(folder)
 
+    def rescan_tiff_files(self):
+        """Refazer a busca com as opções atuais"""
+        self.scan_tiff_files()
+        self.update_preview()
+
     def scan_tiff_files(self):
-        """Escanear arquivos TIFF na pasta"""
+        """Buscar arquivos TIFF na pasta (e subpastas) em segundo plano; a lista cresce aos poucos"""
+        self.scan_generation += 1
+        self.tiff_files = []
+        self.page_counts = {}
+        self.thumbnail_tasks = []
+
         folder = self.input_folder.get()
         if not folder or not os.path.exists(folder):
-            self.tiff_files = []
+            self.scan_running = False
             return
 
-        self.tiff_files = []
-        for file in sorted(os.listdir(folder)):
-            if file.lower().endswith(('.tif', '.tiff')):
-                self.tiff_files.append(file)
+        if self.listing_cache is None:
+            self.listing_cache = DirectoryListingCache()
 
-        self.update_status(f"Encontrados {len(self.tiff_files)} arquivos TIFF na pasta")
+        self.scan_running = True
+        self.scan_preview_time = time.perf_counter()
+        generation = self.scan_generation
+        options = (self.recursive_var.get(), self.include_var.get(), self.exclude_var.get())
+        threading.Thread(target=self.scan_worker, args=(generation, folder) + options, daemon=True).start()
+        self.update_status("Procurando arquivos TIFF...")
+        self.root.after(SCAN_POLL_MS, self.poll_scan, generation)
+
+    def scan_worker(self, generation, folder, recursive, include, exclude):
+        """Thread: percorrer as pastas e entregar os arquivos pela fila (sem acessar o Tk)"""
+        error = None
+        try:
+            for batch in iter_tiff_files(folder, recursive, include, exclude, self.listing_cache):
+                if generation != self.scan_generation:
+                    return
+                self.scan_queue.put((generation, batch, None))
+        except OSError as e:
+            error = str(e)
+
+        try:
+            self.listing_cache.save()
+        except OSError:
+            pass
+        self.scan_queue.put((generation, None, error))
+
+    def poll_scan(self, generation):
+        """Acrescentar à lista os arquivos encontrados (thread da interface)"""
+        if generation != self.scan_generation:
+            return
+
+        finished = False
+        error = None
+        found = len(self.tiff_files)
+        while True:
+            try:
+                item_generation, batch, error = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item_generation != generation:
+                continue
+            if batch is None:
+                finished = True
+                break
+            self.tiff_files.extend(batch)
+
+        if finished:
+            self.scan_running = False
+            status = f"Encontrados {len(self.tiff_files)} arquivos TIFF na pasta"
+            if self.recursive_var.get():
+                status += " e subpastas"
+            if error:
+                status += f" (erro na busca: {error})"
+            self.update_status(status)
+            self.update_preview()
+            return
+
+        if len(self.tiff_files) != found:
+            self.update_status(f"Procurando arquivos TIFF... {len(self.tiff_files)} encontrados")
+            if time.perf_counter() - self.scan_preview_time >= SCAN_PREVIEW_INTERVAL:
+                self.scan_preview_time = time.perf_counter()
+                self.update_preview()
+        self.root.after(SCAN_POLL_MS, self.poll_scan, generation)
 
     def load_template(self, template_name):
         """Carregar template do JSON"""
         self.conversion_list = []
 
+        self.template_crop_mm = None
+        self.template_orientation = "Original"
+
         if template_name != "Custom" and template_name in self.templates_data:
             template = self.templates_data[template_name]
             # Fazer cópia dos items para evitar modificação do original
             self.conversion_list = [item.copy() for item in template.get('items', [])]
+            self.template_crop_mm = template.get('crop_mm')
+            self.template_orientation = template.get('orientation', "Original")
 
         self.refresh_listbox()
 
@@ -1274,19 +4733,21 @@ class BatchTiffToDicomConverter:
             self.load_template(template)
             self.update_preview()
 
-    def refresh_listbox(self):
-        """Atualizar listbox com itens da lista"""
-        self.items_listbox.delete(0, tk.END)
-        for i, item in enumerate(self.conversion_list):
-            display = f"{i+1:2d}. {item['name']:<20} G:{item['gantry']:>3}° C:{item['coll']:>3}° T:{item['couch']:>3}°"
-            self.items_listbox.insert(tk.END, display)
+    def item_row_values(self, index):
+        """Colunas de uma linha da lista de itens"""
+        item = self.conversion_list[index]
+        return (index + 1, item['name'], f"{item['gantry']}°", f"{item['coll']}°", f"{item['couch']}°")
+
+    def refresh_listbox(self, first=None, last=None):
+        """Atualizar as linhas visíveis da lista (todas ou só first..last)"""
+        self.items_listbox.refresh(first, last)
 
     def add_item(self):
         """Adicionar novo item à lista"""
         item = self.show_item_dialog()
         if item:
             self.conversion_list.append(item)
-            self.refresh_listbox()
+            self.items_listbox.selection_set(len(self.conversion_list) - 1)
             self.template_combo.set("Custom")
             self.update_preview()
 
@@ -1303,7 +4764,7 @@ class BatchTiffToDicomConverter:
         item = self.show_item_dialog(current_item)
         if item:
             self.conversion_list[index] = item
-            self.refresh_listbox()
+            self.refresh_listbox(index, index)
             self.template_combo.set("Custom")
             self.update_preview()
 
@@ -1330,7 +4791,7 @@ class BatchTiffToDicomConverter:
         self.conversion_list[index], self.conversion_list[index-1] = \
             self.conversion_list[index-1], self.conversion_list[index]
 
-        self.refresh_listbox()
+        self.refresh_listbox(index-1, index)
         self.items_listbox.selection_set(index-1)
         self.template_combo.set("Custom")
         self.update_preview()
@@ -1345,7 +4806,7 @@ class BatchTiffToDicomConverter:
         self.conversion_list[index], self.conversion_list[index+1] = \
             self.conversion_list[index+1], self.conversion_list[index]
 
-        self.refresh_listbox()
+        self.refresh_listbox(index, index+1)
         self.items_listbox.selection_set(index+1)
         self.template_combo.set("Custom")
         self.update_preview()
@@ -1356,6 +4817,12 @@ class BatchTiffToDicomConverter:
 
     def on_listbox_drag(self, event):
         """Durante drag-and-drop"""
+        # Rolar a lista ao arrastar além das bordas
+        if event.y < VIRTUAL_LIST_HEADER_HEIGHT:
+            self.items_listbox.yview('scroll', -1, 'units')
+        elif event.y > self.items_listbox.winfo_height():
+            self.items_listbox.yview('scroll', 1, 'units')
+
         current_index = self.items_listbox.nearest(event.y)
         if current_index != self.drag_start_index and self.drag_start_index is not None:
             # Reordenar visualmente
@@ -1374,7 +4841,7 @@ class BatchTiffToDicomConverter:
             item = self.conversion_list.pop(self.drag_start_index)
             self.conversion_list.insert(end_index, item)
 
-            self.refresh_listbox()
+            self.refresh_listbox(min(self.drag_start_index, end_index), max(self.drag_start_index, end_index))
             self.items_listbox.selection_set(end_index)
             self.template_combo.set("Custom")
             self.update_preview()
@@ -1478,15 +4945,52 @@ class BatchTiffToDicomConverter:
         dialog.wait_window()
         return result[0]
 
+    def get_page_count(self, tiff_file):
+        """Número de páginas de um TIFF da pasta (com cache)"""
+        if tiff_file not in self.page_counts:
+            try:
+                self.page_counts[tiff_file] = count_tiff_frames(os.path.join(self.input_folder.get(), tiff_file))
+            except Exception:
+                self.page_counts[tiff_file] = 1
+        return self.page_counts[tiff_file]
+
+    def count_sources(self):
+        """Número de imagens de entrada que consomem itens do template"""
+        integration = BATCH_INTEGRATION_MODES.get(self.integrate_var.get())
+        if integration:
+            return 1 if integration[1] == "folder" else len(self.tiff_files)
+        if self.split_pages_var.get() and self.page_angles_var.get() == "Template":
+            return sum(self.get_page_count(f) for f in self.tiff_files)
+        return len(self.tiff_files)
+
+    def build_conversion_jobs(self):
+        """Montar lista de conversões (arquivo, página, nome e ângulos)"""
+        return plan_conversion_jobs(
+            self.tiff_files,
+            self.conversion_list,
+            self.get_page_count,
+            integration=BATCH_INTEGRATION_MODES.get(self.integrate_var.get()),
+            split_pages=self.split_pages_var.get(),
+            page_angles=self.page_angles_var.get(),
+            page_step=self.page_step_var.get()
+        )
+
     def update_preview(self):
         """Atualizar preview da conversão"""
-        self.preview_text.delete(1.0, tk.END)
-
         if not self.tiff_files:
-            self.preview_text.insert(1.0, "Nenhum arquivo TIFF encontrado.\n\nSelecione uma pasta com arquivos TIFF.")
+            self.show_preview_message("Nenhum arquivo TIFF encontrado.\n\nSelecione uma pasta com arquivos TIFF.")
+            self.refresh_thumbnails([])
+            return
+
+        try:
+            jobs = self.build_conversion_jobs()
+        except ValueError:
+            self.show_preview_message("Passo angular inválido. Informe um número em graus.")
+            self.refresh_thumbnails([])
             return
 
         num_files = len(self.tiff_files)
+        num_sources = self.count_sources()
         num_items = len(self.conversion_list)
 
         preview = []
@@ -1494,42 +4998,305 @@ class BatchTiffToDicomConverter:
         preview.append("PREVIEW DA CONVERSÃO EM LOTE")
         preview.append("="*60)
         preview.append(f"\nArquivos TIFF encontrados: {num_files}")
+        if num_sources != num_files:
+            preview.append(f"Páginas (frames) encontradas: {num_sources}")
         preview.append(f"Itens no template: {num_items}")
         preview.append("")
 
-        if num_items > num_files:
-            preview.append(f"AVISO: Template tem mais itens ({num_items}) que arquivos ({num_files})")
-            preview.append(f"Apenas os primeiros {num_files} itens serão processados.")
+        if num_items > num_sources:
+            preview.append(f"AVISO: Template tem mais itens ({num_items}) que imagens ({num_sources})")
+            preview.append(f"Apenas os primeiros {num_sources} itens serão processados.")
             preview.append("")
 
         preview.append("-"*60)
         preview.append("CONVERSÕES QUE SERÃO REALIZADAS:")
         preview.append("-"*60)
-        preview.append("")
 
-        for i in range(min(num_files, num_items)):
-            tiff_file = self.tiff_files[i]
-            item = self.conversion_list[i]
+        blocks = [self.preview_block(i, job) for i, job in enumerate(jobs)]
+
+        footer = []
+        used_files = {f for job in jobs for f in job['sources']}
+        unused_files = [f for f in self.tiff_files if f not in used_files]
+        if unused_files:
+            footer.append("-"*60)
+            footer.append(f"ARQUIVOS NÃO PROCESSADOS ({len(unused_files)}):")
+            footer.append("-"*60)
+            for tiff_file in unused_files:
+                footer.append(f"  - {tiff_file}")
+
+        self.render_preview("\n".join(preview) + "\n\n", blocks, "\n".join(footer))
+        self.refresh_thumbnails(jobs)
+
+    def preview_block(self, i, job):
+        """Texto de uma conversão no preview (sempre PREVIEW_BLOCK_LINES linhas)"""
+        source = job['tiff_file']
+        if job['page'] is not None:
+            source += f" [página {job['page'] + 1}/{self.get_page_count(job['tiff_file'])}]"
+        if job['integrate']:
+            n_frames = sum(self.get_page_count(f) for f in job['sources'])
+            if len(job['sources']) > 1:
+                source = f"{len(job['sources'])} arquivos ({job['sources'][0]} ... {job['sources'][-1]})"
+            source += f" [{n_frames} frames integrados: {self.integrate_var.get().lower()}]"
+
+        return (f"{i+1}. {source}\n"
+                f"   → {job['name']}.dcm\n"
+                f"   Parâmetros: Gantry={job['gantry']:g}° Coll={job['coll']:g}° Couch={job['couch']:g}°\n"
+                f"\n")
+
+    def show_preview_message(self, text):
+        """Substituir todo o preview por uma mensagem"""
+        self.preview_state = None
+        self.preview_text.delete(1.0, tk.END)
+        self.preview_text.insert(1.0, text)
 
-            preview.append(f"{i+1}. {tiff_file}")
-            preview.append(f"   → {item['name']}.dcm")
-            preview.append(f"   Parâmetros: Gantry={item['gantry']}° Coll={item['coll']}° Couch={item['couch']}°")
-            preview.append("")
+    def render_preview(self, header, blocks, footer):
+        """
+        Atualizar o preview reescrevendo no widget apenas o que mudou:
+        cabeçalho, blocos de conversão alterados e o trecho final.
+        """
+        text = self.preview_text
+        state = self.preview_state
+        self.preview_state = (header, blocks, footer)
 
-        if num_files > num_items:
-            preview.append("-"*60)
-            preview.append(f"ARQUIVOS NÃO PROCESSADOS ({num_files - num_items}):")
-            preview.append("-"*60)
-            for i in range(num_items, num_files):
-                preview.append(f"  - {self.tiff_files[i]}")
+        if state is None:
+            text.delete(1.0, tk.END)
+            text.insert(1.0, header + "".join(blocks) + footer)
+            return
+
+        old_header, old_blocks, old_footer = state
+        if header != old_header:
+            text.delete("1.0", f"{old_header.count(chr(10)) + 1}.0")
+            text.insert("1.0", header)
+
+        first_line = header.count("\n") + 1
+        common = min(len(old_blocks), len(blocks))
+        changed = [i for i in range(common) if blocks[i] != old_blocks[i]]
+
+        # Muitas linhas alteradas (ex.: item removido no início): reescrever o trecho inteiro
+        if len(changed) > PREVIEW_MAX_BLOCK_UPDATES:
+            common = changed[0]
+            changed = []
+
+        for i in changed:
+            start = first_line + i * PREVIEW_BLOCK_LINES
+            text.delete(f"{start}.0", f"{start + PREVIEW_BLOCK_LINES}.0")
+            text.insert(f"{start}.0", blocks[i])
+
+        if len(blocks) != common or len(old_blocks) != common or footer != old_footer:
+            start = first_line + common * PREVIEW_BLOCK_LINES
+            text.delete(f"{start}.0", tk.END)
+            text.insert(f"{start}.0", "".join(blocks[common:]) + footer)
+
+    def thumbnail_cell(self, index, columns):
+        """Canto superior esquerdo da célula de uma miniatura na grade"""
+        width, height = THUMBNAIL_SIZE + 24, THUMBNAIL_SIZE + 44
+        return (index % columns) * width + 4, (index // columns) * height + 4
+
+    def thumbnail_label(self, index, job):
+        """Legenda de uma miniatura (item e ângulos)"""
+        label = f"{index + 1}. {job['name']}"
+        if job['integrate']:
+            label += " (Σ)"
+        return f"{label}\nG{job['gantry']:g} C{job['coll']:g} M{job['couch']:g}"
+
+    def refresh_thumbnails(self, jobs):
+        """Redesenhar a grade de miniaturas; imagens carregadas em segundo plano"""
+        folder = self.input_folder.get()
+        tasks = [(index, os.path.join(folder, job['tiff_file']), job['page'] or 0) for index, job in enumerate(jobs)]
+
+        # Mesmas imagens no início (só nomes/ângulos mudaram, ou a busca acrescentou
+        # arquivos): atualizar as legendas alteradas e desenhar apenas as células novas
+        known = len(self.thumbnail_tasks)
+        if known and tasks[:known] == self.thumbnail_tasks:
+            self.thumbnail_jobs = jobs
+            for index, job in enumerate(jobs[:known]):
+                label = self.thumbnail_label(index, job)
+                item, current = self.thumbnail_labels[index]
+                if label != current:
+                    self.thumbnail_canvas.itemconfigure(item, text=label)
+                    self.thumbnail_labels[index] = (item, label)
+            if len(tasks) > known:
+                self.add_thumbnail_cells(jobs, tasks, known)
+            return
+
+        self.thumbnail_tasks = []
+        self.thumbnail_labels = []
+        self.thumbnail_generation += 1
+        self.thumbnail_canvas.delete("all")
+        self.thumbnail_images = []
+        self.thumbnail_remaining = 0
+        self.thumbnail_jobs = jobs
+        if not jobs:
+            return
+
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache()
+
+        # Colunas conforme a largura visível (antes do primeiro desenho: 4)
+        width = self.thumbnail_canvas.winfo_width()
+        self.thumbnail_columns = max(1, width // (THUMBNAIL_SIZE + 24)) if width > 1 else 4
+        self.add_thumbnail_cells(jobs, tasks, 0)
+
+    def add_thumbnail_cells(self, jobs, tasks, start):
+        """Desenhar as células a partir de start e gerar suas miniaturas em segundo plano"""
+        columns = self.thumbnail_columns
+        for index in range(start, len(jobs)):
+            job = jobs[index]
+            x, y = self.thumbnail_cell(index, columns)
+            self.thumbnail_canvas.create_rectangle(
+                x, y, x + THUMBNAIL_SIZE + 20, y + THUMBNAIL_SIZE + 4, outline="#cccccc"
+            )
+            label = self.thumbnail_label(index, job)
+            item = self.thumbnail_canvas.create_text(
+                x + THUMBNAIL_SIZE // 2 + 10, y + THUMBNAIL_SIZE + 6, anchor=tk.N,
+                width=THUMBNAIL_SIZE + 20, font=('Arial', 8), text=label
+            )
+            self.thumbnail_labels.append((item, label))
+
+        rows = -(-len(jobs) // columns)
+        self.thumbnail_canvas.configure(
+            scrollregion=(0, 0, columns * (THUMBNAIL_SIZE + 24) + 4, rows * (THUMBNAIL_SIZE + 44) + 4)
+        )
+
+        self.thumbnail_tasks = tasks
+        polling = self.thumbnail_remaining > 0
+        self.thumbnail_remaining += len(tasks) - start
+        generation = self.thumbnail_generation
+        with self.thumbnail_lock:
+            self.thumbnail_requests.put((generation, tasks[start:]))
+            if self.thumbnail_thread is None:
+                self.thumbnail_thread = threading.Thread(target=self.thumbnail_worker, daemon=True)
+                self.thumbnail_thread.start()
+        if not polling:
+            self.root.after(THUMBNAIL_POLL_MS, self.poll_thumbnails, generation)
+
+    def thumbnail_worker(self):
+        """
+        Thread única: atender os pedidos de miniaturas em ordem e entregar pela
+        fila (sem acessar o Tk). Termina quando não há mais pedidos.
+        """
+        while True:
+            with self.thumbnail_lock:
+                try:
+                    generation, tasks = self.thumbnail_requests.get_nowait()
+                except queue.Empty:
+                    self.thumbnail_thread = None
+                    return
+
+            for index, path, page in tasks:
+                if generation != self.thumbnail_generation:
+                    break
+                try:
+                    image = self.thumbnail_cache.thumbnail(path, page)
+                except Exception:
+                    image = None
+                self.thumbnail_queue.put((generation, index, image))
+
+            if self.thumbnail_requests.empty():
+                try:
+                    self.thumbnail_cache.save_index()
+                except OSError:
+                    pass
+
+    def poll_thumbnails(self, generation):
+        """Desenhar as miniaturas prontas (thread da interface)"""
+        if generation != self.thumbnail_generation:
+            return
 
-        self.preview_text.insert(1.0, "\n".join(preview))
+        while True:
+            try:
+                item_generation, index, image = self.thumbnail_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item_generation != generation:
+                continue
+
+            self.thumbnail_remaining -= 1
+            x, y = self.thumbnail_cell(index, self.thumbnail_columns)
+            center = (x + THUMBNAIL_SIZE // 2 + 10, y + THUMBNAIL_SIZE // 2 + 2)
+            if image is None:
+                self.thumbnail_canvas.create_text(*center, text="✗", fill="red", font=('Arial', 16))
+                continue
+            photo = ImageTk.PhotoImage(image)
+            self.thumbnail_images.append(photo)
+            self.thumbnail_canvas.create_image(*center, image=photo)
+
+        if self.thumbnail_remaining > 0:
+            self.root.after(THUMBNAIL_POLL_MS, self.poll_thumbnails, generation)
+
+    def show_job_image(self, event):
+        """Duplo clique numa miniatura: abrir a página no visualizador (com a orientação)"""
+        x = self.thumbnail_canvas.canvasx(event.x)
+        y = self.thumbnail_canvas.canvasy(event.y)
+        column = int(x // (THUMBNAIL_SIZE + 24))
+        index = int(y // (THUMBNAIL_SIZE + 44)) * self.thumbnail_columns + column
+        if column >= self.thumbnail_columns or not 0 <= index < len(self.thumbnail_jobs):
+            return
+
+        job = self.thumbnail_jobs[index]
+        try:
+            with TiffFrameReader(os.path.join(self.input_folder.get(), job['tiff_file'])) as reader:
+                frame = reader.frame(job['page'] or 0)
+            ImageViewer(
+                self.root, orient_view(frame, self.orientation_setting()),
+                title=f"Visualizar - {index + 1}. {job['name']} ({job['tiff_file']})",
+                dpi=float(self.dpi_var.get())
+            )
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível abrir a imagem:\n{str(e)}")
 
     def update_status(self, message):
         """Atualizar barra de status"""
         self.status_label.config(text=message)
         self.root.update_idletasks()
 
+    def crop_setting(self):
+        """Recorte escolhido: None, 'auto' ou lado em mm (chave crop_mm do template)"""
+        mode = self.crop_var.get()
+        if mode == "Template" and self.template_crop_mm:
+            return float(self.template_crop_mm)
+        if mode in ("Automático", "Template"):
+            return 'auto'
+        return None
+
+    def orientation_setting(self):
+        """Orientação escolhida (a do template quando "Template")"""
+        orientation = self.orientation_var.get()
+        if orientation == "Template":
+            orientation = self.template_orientation
+        if orientation not in ORIENTATION_MODES:
+            raise ValueError(f"Orientação desconhecida: {orientation}")
+        return orientation
+
+    def show_batch_statistics(self, jobs, statistics, elapsed, failures=None):
+        """Mostrar estatísticas dos pixels convertidos no painel de preview"""
+        lines = []
+        lines.append("="*60)
+        lines.append("RESULTADO DA CONVERSÃO EM LOTE")
+        lines.append("="*60)
+        lines.append(f"\nConvertidos: {len(statistics)}/{len(jobs)} em {elapsed:.1f} s "
+                     f"({len(statistics) / elapsed:.1f} imagens/s)")
+        lines.append("")
+
+        for index, job in enumerate(jobs):
+            stats = statistics.get(index)
+            if stats is None:
+                reason = (failures or {}).get(index, "erro")
+                lines.append(f"{index + 1}. {job['name']}.dcm  ✗ {reason}")
+                continue
+            lines.append(f"{index + 1}. {job['name']}.dcm")
+            lines.append(f"   min={stats['min']:.0f} max={stats['max']:.0f} "
+                         f"média={stats['mean']:.1f} dp={stats['std']:.1f}")
+            offset = stats.get('bb_offset')
+            if offset is None:
+                lines.append("   BB→campo: não estimado")
+            else:
+                unit = offset['unit']
+                lines.append(f"   BB→campo: dx={offset['dx']:+.2f} {unit} dy={offset['dy']:+.2f} {unit} "
+                             f"|r|={offset['r']:.2f} {unit} ({offset['ms']:.0f} ms)")
+
+        self.show_preview_message("\n".join(lines))
+
     def convert_batch(self):
         """Converter lote de arquivos"""
         input_folder = self.input_folder.get()
@@ -1550,6 +5317,10 @@ class BatchTiffToDicomConverter:
                 messagebox.showerror("Erro", "Não foi possível criar a pasta de saída!")
                 return
 
+        if self.scan_running:
+            messagebox.showwarning("Atenção", "Aguarde o fim da busca de arquivos TIFF!")
+            return
+
         if not self.tiff_files:
             messagebox.showwarning("Atenção", "Nenhum arquivo TIFF encontrado na pasta!")
             return
@@ -1568,14 +5339,36 @@ class BatchTiffToDicomConverter:
             messagebox.showerror("Erro", "SID e DPI devem ser números válidos maiores que 0!")
             return
 
-        num_files = len(self.tiff_files)
+        try:
+            jobs = self.build_conversion_jobs()
+        except ValueError:
+            messagebox.showerror("Erro", "Passo angular deve ser um número válido!")
+            return
+
+        try:
+            orientation = self.orientation_setting()
+        except ValueError as e:
+            messagebox.showerror("Erro", f"{str(e)}\n\nVerifique a chave 'orientation' do template.")
+            return
+
+        # Calibração flat-field: carregada uma vez e reutilizada em todo o lote
+        calibration = None
+        if self.flatfield_var.get():
+            calibration = (self.dark_var.get(), self.flood_var.get())
+            try:
+                load_calibration(*calibration)
+            except Exception as e:
+                messagebox.showerror("Erro", f"Erro ao carregar a calibração flat-field:\n{str(e)}")
+                return
+
+        num_files = self.count_sources()
         num_items = len(self.conversion_list)
 
         # Avisar se há incompatibilidade
         if num_items > num_files:
             if not messagebox.askyesno(
                 "Confirmação",
-                f"O template tem {num_items} itens mas há apenas {num_files} arquivos.\n\n"
+                f"O template tem {num_items} itens mas há apenas {num_files} imagens.\n\n"
                 f"Apenas os primeiros {num_files} itens serão processados.\n\n"
                 f"Deseja continuar?"
             ):
@@ -1584,8 +5377,8 @@ class BatchTiffToDicomConverter:
         if num_files > num_items:
             if not messagebox.askyesno(
                 "Confirmação",
-                f"Há {num_files} arquivos mas o template tem apenas {num_items} itens.\n\n"
-                f"{num_files - num_items} arquivos não serão processados.\n\n"
+                f"Há {num_files} imagens mas o template tem apenas {num_items} itens.\n\n"
+                f"{num_files - num_items} imagens não serão processadas.\n\n"
                 f"Deseja continuar?"
             ):
                 return
@@ -1601,42 +5394,81 @@ class BatchTiffToDicomConverter:
             )
             return
 
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except ValueError:
+            messagebox.showerror("Erro", "Número de processos inválido!")
+            return
+
         # Iniciar conversão
-        num_to_convert = min(num_files, num_items)
+        num_to_convert = len(jobs)
         self.progress_var.set(0)
         self.progress_bar['maximum'] = num_to_convert
 
         converted = 0
         errors = []
+        statistics = {}
+        start_time = datetime.now()
+
+        settings = {
+            'sid': sid,
+            'dpi': dpi,
+            'input_folder': input_folder,
+            'output_folder': output_folder,
+            'preflight': self.preflight_var.get(),
+            'crop': self.crop_setting(),
+            'binning': 2 if self.binning_var.get() else 1,
+            'calibration': calibration,
+            'bits_stored': int(self.bits_stored_var.get()),
+            'orientation': orientation,
+        }
+
+        # Staging: entradas copiadas para o cache local, saídas em pasta local temporária
+        local_output = None
+        if self.staging_var.get():
+            try:
+                if self.staging_cache is None:
+                    self.staging_cache = LocalStagingCache()
+                sources = sorted({f for job in jobs for f in job['sources']})
 
-        for i in range(num_to_convert):
-            tiff_file = self.tiff_files[i]
-            item = self.conversion_list[i]
+                def on_stage(done, total):
+                    self.update_status(f"Copiando para cache local {done}/{total}...")
 
-            self.update_status(f"Convertendo {i+1}/{num_to_convert}: {tiff_file}...")
+                settings['input_folder'] = self.staging_cache.stage(input_folder, sources, on_stage)
+                local_output = self.staging_cache.output_folder()
+                settings['output_folder'] = local_output
+            except Exception as e:
+                messagebox.showerror("Erro", f"Erro ao preparar cache local:\n{str(e)}")
+                self.update_status("Erro no cache local.")
+                return
 
-            try:
-                input_path = os.path.join(input_folder, tiff_file)
-                output_path = os.path.join(output_folder, f"{item['name']}.dcm")
+        def on_progress(done, total, name):
+            self.progress_var.set(done)
+            self.update_status(f"Convertendo {done}/{total}: {name}...")
 
-                # Converter
-                new_dicom = image.tiff_to_dicom(
-                    input_path,
-                    sid=sid,
-                    gantry=float(item['gantry']),
-                    coll=float(item['coll']),
-                    couch=float(item['couch']),
-                    dpi=dpi
-                )
+        pipeline = BatchPipeline(jobs, settings, workers, progress=on_progress)
+        results = asyncio.run(pipeline.run())
 
-                new_dicom.save_as(output_path, write_like_original=False)
-                converted += 1
+        if local_output:
+            def on_upload(done, total):
+                self.update_status(f"Enviando saídas {done}/{total}...")
 
-            except Exception as e:
-                errors.append(f"{tiff_file}: {str(e)}")
+            for error in self.staging_cache.upload(local_output, output_folder, on_upload):
+                errors.append(f"Envio: {error}")
 
-            self.progress_var.set(i + 1)
-            self.root.update_idletasks()
+        failures = {}
+        for result in results:
+            job = jobs[result['index']]
+            if result['error']:
+                source = job['tiff_file'] if job['page'] is None else f"{job['tiff_file']} [página {job['page'] + 1}]"
+                errors.append(f"{source}: {result['error']}")
+                failures[result['index']] = result['error']
+            else:
+                converted += 1
+                statistics[result['index']] = result['stats']
+
+        elapsed = max((datetime.now() - start_time).total_seconds(), 1e-6)
+        self.show_batch_statistics(jobs, statistics, elapsed, failures)
 
         # Resultados
         self.progress_var.set(0)
@@ -1833,6 +5665,15 @@ class MainMenu:
 # ============================================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="Conversor DICOM Unificado")
+    parser.add_argument('--manifesto', help="Manifesto JSON de sessões: converte todas sem abrir a interface")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Processos do pool compartilhado (padrão: 'workers' do manifesto ou número de CPUs)")
+    args = parser.parse_args()
+
+    if args.manifesto:
+        sys.exit(run_manifest_cli(args.manifesto, args.processos))
+
     app = MainMenu()
     app.run()
 
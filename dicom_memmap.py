@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Acesso a pixels DICOM/raw via memory-mapping (numpy.memmap)
+
+Para arquivos não comprimidos (Implicit/Explicit VR Little Endian, e também
+Big Endian), localiza o offset do elemento Pixel Data lendo apenas o header
+e expõe o frame como numpy.memmap somente leitura. Leituras de ROI e
+estatísticas tocam apenas as páginas necessárias do arquivo, sem copiar o
+frame inteiro como faz ds.pixel_array.
+"""
+
+import pydicom
+from pydicom.uid import (
+    ImplicitVRLittleEndian,
+    ExplicitVRLittleEndian,
+    ExplicitVRBigEndian,
+)
+import numpy as np
+import struct
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+# Transfer Syntaxes sem compressão (pixels armazenados como array contíguo)
+UNCOMPRESSED_SYNTAXES = (
+    ImplicitVRLittleEndian,
+    ExplicitVRLittleEndian,
+    ExplicitVRBigEndian,
+)
+
+# Tags de dados de pixel: Pixel Data, Float Pixel Data, Double Float Pixel Data
+PIXEL_TAGS = {
+    0x7FE00010: None,
+    0x7FE00008: 'f4',
+    0x7FE00009: 'f8',
+}
+
+# VRs explícitas com header longo (2 bytes reservados + comprimento de 4 bytes)
+LONG_HEADER_VRS = {b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'UC', b'UN', b'UR', b'UT'}
+
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+
+def dataset_encoding(ds):
+    """Retorna (is_implicit_VR, is_little_endian) com que o dataset foi lido"""
+    encoding = getattr(ds, 'original_encoding', None)   # pydicom >= 3.0
+    if encoding and encoding[0] is not None:
+        return encoding
+    return ds.read_implicit_vr, ds.read_little_endian
+
+
+def locate_pixel_data(path, force=True):
+    """
+    Ler apenas o header e localizar o elemento de pixels.
+
+    Retorna dicionário com:
+      dataset      - header (sem pixels)
+      tag          - tag do elemento de pixels
+      tag_offset   - posição do início do elemento (tag) no arquivo
+      value_offset - posição do primeiro byte dos pixels
+      length       - comprimento do valor em bytes
+      implicit_vr, little_endian - codificação do dataset
+    Retorna None se o arquivo não tem dados de pixel.
+    """
+    with open(path, 'rb') as fp:
+        ds = pydicom.dcmread(fp, stop_before_pixels=True, force=force)
+        tag_offset = fp.tell()
+        header = fp.read(12)
+
+    implicit_vr, little_endian = dataset_encoding(ds)
+    if len(header) < 8:
+        return None
+
+    endian = '<' if little_endian else '>'
+    group, element = struct.unpack(f'{endian}HH', header[:4])
+    tag = (group << 16) | element
+    if tag not in PIXEL_TAGS:
+        return None
+
+    if implicit_vr:
+        length = struct.unpack(f'{endian}I', header[4:8])[0]
+        header_size = 8
+    elif header[4:6] in LONG_HEADER_VRS:
+        length = struct.unpack(f'{endian}I', header[8:12])[0]
+        header_size = 12
+    else:
+        length = struct.unpack(f'{endian}H', header[6:8])[0]
+        header_size = 8
+
+    return {
+        'dataset': ds,
+        'tag': tag,
+        'tag_offset': tag_offset,
+        'value_offset': tag_offset + header_size,
+        'length': length,
+        'implicit_vr': implicit_vr,
+        'little_endian': little_endian,
+    }
+
+
+def pixel_dtype(ds, tag=0x7FE00010, little_endian=True):
+    """Tipo NumPy (com ordem de bytes) dos pixels descritos no header"""
+    endian = '<' if little_endian else '>'
+    if PIXEL_TAGS.get(tag):
+        return np.dtype(endian + PIXEL_TAGS[tag])
+
+    bits = int(getattr(ds, 'BitsAllocated', 16))
+    if bits not in (8, 16, 32):
+        raise ValueError(f"BitsAllocated={bits} não suportado para memmap")
+    kind = 'i' if int(getattr(ds, 'PixelRepresentation', 0)) == 1 else 'u'
+    return np.dtype(f"{endian}{kind}{bits // 8}")
+
+
+def open_dicom_memmap(path, force=True):
+    """
+    Abrir os pixels de um DICOM não comprimido como numpy.memmap somente leitura.
+
+    Retorna (memmap, header). O formato é (Rows, Columns), com eixos extras
+    para NumberOfFrames > 1 e SamplesPerPixel > 1.
+    """
+    info = locate_pixel_data(path, force=force)
+    if info is None:
+        raise ValueError(f"{path}: arquivo sem dados de pixel")
+
+    ds = info['dataset']
+    file_meta = getattr(ds, 'file_meta', None)
+    syntax = getattr(file_meta, 'TransferSyntaxUID', None) if file_meta else None
+    if syntax is not None and syntax not in UNCOMPRESSED_SYNTAXES:
+        raise ValueError(f"{path}: Transfer Syntax comprimida ({syntax.name}) não suporta memmap")
+    if info['length'] == UNDEFINED_LENGTH:
+        raise ValueError(f"{path}: Pixel Data encapsulado não suporta memmap")
+
+    dtype = pixel_dtype(ds, info['tag'], info['little_endian'])
+    shape = (int(ds.Rows), int(ds.Columns))
+    samples = int(getattr(ds, 'SamplesPerPixel', 1))
+    frames = int(getattr(ds, 'NumberOfFrames', 1) or 1)
+    if samples > 1:
+        shape = shape + (samples,)
+    if frames > 1:
+        shape = (frames,) + shape
+
+    expected = int(np.prod(shape)) * dtype.itemsize
+    if info['length'] < expected:
+        raise ValueError(
+            f"{path}: Pixel Data tem {info['length']} bytes, esperado {expected}"
+        )
+
+    array = np.memmap(path, dtype=dtype, mode='r', offset=info['value_offset'], shape=shape)
+    return array, ds
+
+
+def open_raw_memmap(path, rows, columns, dtype='<u2', offset=0, frames=1):
+    """Abrir imagem raw (sem header DICOM) como numpy.memmap somente leitura"""
+    shape = (rows, columns) if frames == 1 else (frames, rows, columns)
+    return np.memmap(path, dtype=np.dtype(dtype), mode='r', offset=offset, shape=shape)
+
+
+def roi_view(array, row, column, height, width):
+    """View (sem cópia) de uma ROI retangular do frame"""
+    return array[..., row:row + height, column:column + width]
+
+
+def roi_statistics(array, roi=None, chunk_rows=256):
+    """
+    Estatísticas (min, max, média, desvio padrão) de um frame ou ROI.
+
+    Processa blocos de linhas em float64 apenas do tamanho do bloco, então
+    um memmap é lido página a página sem materializar o frame inteiro.
+    roi = (row, column, height, width) ou None para o frame todo.
+    """
+    if roi is not None:
+        array = roi_view(array, *roi)
+
+    rows = array.shape[-2] if array.ndim >= 2 else array.shape[0]
+    count = 0
+    total = 0.0
+    total_sq = 0.0
+    minimum = None
+    maximum = None
+
+    for start in range(0, rows, chunk_rows):
+        block = np.asarray(array[..., start:start + chunk_rows, :], dtype=np.float64)
+        if block.size == 0:
+            continue
+        count += block.size
+        total += float(block.sum())
+        total_sq += float(np.square(block).sum())
+        block_min = float(block.min())
+        block_max = float(block.max())
+        minimum = block_min if minimum is None else min(minimum, block_min)
+        maximum = block_max if maximum is None else max(maximum, block_max)
+
+    if count == 0:
+        return {'count': 0, 'min': None, 'max': None, 'mean': None, 'std': None}
+
+    mean = total / count
+    variance = max(total_sq / count - mean * mean, 0.0)
+    return {
+        'count': count,
+        'min': minimum,
+        'max': maximum,
+        'mean': mean,
+        'std': variance ** 0.5,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python dicom_memmap.py arquivo.dcm [arquivo2.dcm ...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        try:
+            pixels, header = open_dicom_memmap(path)
+            stats = roi_statistics(pixels)
+            print(f"{path}: {pixels.shape} {pixels.dtype} "
+                  f"min={stats['min']:.0f} max={stats['max']:.0f} "
+                  f"média={stats['mean']:.1f} dp={stats['std']:.1f}")
+        except Exception as e:
+            print(f"{path}: ✗ {e}")
@@ -6,7 +6,20 @@ Corretor de header DICOM - Adiciona File Meta Information Header correto
 
 import pydicom
 from pydicom.dataset import FileMetaDataset
-from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from pydicom.filereader import read_partial
+from pydicom.filewriter import write_file_meta_info
+from pydicom.uid import (
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    ExplicitVRBigEndian,
+    generate_uid,
+)
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dicom_memmap import dataset_encoding
+import numpy as np
+import argparse
+import shutil
+import time
 import os
 import sys
 
@@ -18,80 +31,320 @@ if sys.platform == 'win32':
     except:
         pass
 
-def fix_dicom_file(input_path, output_path):
+# Tamanho do bloco de cópia no reparo por passagem direta de bytes
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Última tag necessária do início do dataset (SOP Instance UID)
+LAST_HEAD_TAG = 0x00080018
+
+# Largura (bytes) da palavra das VRs binárias que exigem troca de ordem de bytes
+SWAP_WIDTHS = {'OW': 2, 'OF': 4, 'OL': 4, 'OD': 8, 'OV': 8}
+
+
+def source_transfer_syntax(ds):
+    """Transfer Syntax correspondente à codificação com que o dataset foi lido"""
+    implicit_vr, little_endian = dataset_encoding(ds)
+    if implicit_vr:
+        return ImplicitVRLittleEndian
+    if little_endian:
+        return ExplicitVRLittleEndian
+    return ExplicitVRBigEndian
+
+
+def _decode_elements(dataset, swap_bytes):
+    """
+    Decodificar todos os elementos com a codificação de origem (inclusive em
+    sequências) e, se swap_bytes, inverter a ordem de bytes dos valores
+    OW/OF/OL/OD/OV com uma única troca vetorizada. O valor original (bytes,
+    imutável) não pode ser trocado no lugar: a troca gera o array invertido
+    e o pydicom exige bytes, então cada valor é copiado duas vezes.
+    """
+    swapped = 0
+    for elem in dataset:
+        if elem.VR == 'SQ':
+            for item in elem.value:
+                swapped += _decode_elements(item, swap_bytes)
+            continue
+
+        width = SWAP_WIDTHS.get(elem.VR)
+        if not swap_bytes or not width or not elem.value or len(elem.value) % width:
+            continue
+
+        elem.value = np.frombuffer(elem.value, dtype=f'u{width}').byteswap().tobytes()
+        swapped += len(elem.value)
+    return swapped
+
+
+def transcode_to_explicit_le(ds):
+    """
+    Transcodificar dataset (Implicit VR LE ou Explicit VR BE) para Explicit VR Little Endian.
+
+    Os valores numéricos são reescritos pelo pydicom na gravação; os valores
+    binários (Pixel Data OW etc.) de origem Big Endian têm os bytes trocados
+    aqui. Retorna a Transfer Syntax de origem.
+    """
+    file_meta = getattr(ds, 'file_meta', None)
+    syntax = getattr(file_meta, 'TransferSyntaxUID', None) if file_meta else None
+    if syntax is not None and syntax.is_compressed:
+        raise ValueError(f"Transfer Syntax comprimida ({syntax.name}) não pode ser transcodificada")
+
+    # Elementos ainda não decodificados precisam ser lidos com a codificação de origem
+    source = source_transfer_syntax(ds)
+    _decode_elements(ds, swap_bytes=(source == ExplicitVRBigEndian))
+
+    if not file_meta:
+        ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    charset = getattr(ds, 'original_character_set', None) or getattr(ds, 'read_encoding', None)
+    ds.set_original_encoding(False, True, charset)
+    if int(pydicom.__version__.split('.')[0]) < 3:
+        ds.is_implicit_VR = False
+        ds.is_little_endian = True
+    return source
+
+
+def fix_dicom_file(input_path, output_path, verbose=True, transcode=False):
     """
     Lê arquivo DICOM (com ou sem header) e salva com header completo
     """
-    print(f"\nProcessando: {os.path.basename(input_path)}")
+    if verbose:
+        print(f"\nProcessando: {os.path.basename(input_path)}")
 
     # Ler arquivo (com force=True se necessário)
     try:
         ds = pydicom.dcmread(input_path)
-        print("  ✓ Arquivo lido normalmente")
+        if verbose:
+            print("  ✓ Arquivo lido normalmente")
     except:
         ds = pydicom.dcmread(input_path, force=True)
-        print("  ✓ Arquivo lido com force=True")
+        if verbose:
+            print("  ✓ Arquivo lido com force=True")
 
     # Criar ou corrigir File Meta Information Header
     if not hasattr(ds, 'file_meta') or not ds.file_meta:
-        print("  ⚠ Arquivo não tem file_meta, criando...")
+        if verbose:
+            print("  ⚠ Arquivo não tem file_meta, criando...")
         ds.file_meta = FileMetaDataset()
 
     # Garantir que tem Transfer Syntax UID
     if not hasattr(ds.file_meta, 'TransferSyntaxUID') or not ds.file_meta.TransferSyntaxUID:
         # Usar Explicit VR Little Endian (padrão DICOM)
         ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
-        print(f"  + Adicionado Transfer Syntax UID: {ExplicitVRLittleEndian}")
+        if verbose:
+            print(f"  + Adicionado Transfer Syntax UID: {ExplicitVRLittleEndian}")
 
     # Garantir que tem Media Storage SOP Class UID
     if not hasattr(ds.file_meta, 'MediaStorageSOPClassUID'):
         if hasattr(ds, 'SOPClassUID'):
             ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
-            print(f"  + Adicionado Media Storage SOP Class UID")
+            if verbose:
+                print(f"  + Adicionado Media Storage SOP Class UID")
 
     # Garantir que tem Media Storage SOP Instance UID
     if not hasattr(ds.file_meta, 'MediaStorageSOPInstanceUID'):
         if hasattr(ds, 'SOPInstanceUID'):
             ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
-            print(f"  + Adicionado Media Storage SOP Instance UID")
+            if verbose:
+                print(f"  + Adicionado Media Storage SOP Instance UID")
 
     # Garantir que tem Implementation Class UID
     if not hasattr(ds.file_meta, 'ImplementationClassUID'):
         ds.file_meta.ImplementationClassUID = generate_uid()
-        print(f"  + Adicionado Implementation Class UID")
+        if verbose:
+            print(f"  + Adicionado Implementation Class UID")
 
     # Garantir que tem Implementation Version Name
     if not hasattr(ds.file_meta, 'ImplementationVersionName'):
         ds.file_meta.ImplementationVersionName = "PYDICOM_" + pydicom.__version__
-        print(f"  + Adicionado Implementation Version Name")
+        if verbose:
+            print(f"  + Adicionado Implementation Version Name")
+
+    # Transcodificar para Explicit VR Little Endian
+    if transcode:
+        source = transcode_to_explicit_le(ds)
+        if verbose:
+            print(f"  + Transcodificado: {source.name} → {ExplicitVRLittleEndian.name}")
 
     # Salvar com header completo
     ds.save_as(output_path, write_like_original=False)
-    print(f"  ✓ Arquivo salvo com header completo em: {os.path.basename(output_path)}")
+    if verbose:
+        print(f"  ✓ Arquivo salvo com header completo em: {os.path.basename(output_path)}")
 
     # Verificar se o arquivo salvo pode ser lido normalmente
     try:
         test_ds = pydicom.dcmread(output_path)
-        print("  ✓ Verificação: Arquivo pode ser lido normalmente (sem force=True)!")
+        if verbose:
+            print("  ✓ Verificação: Arquivo pode ser lido normalmente (sem force=True)!")
         return True
     except Exception as e:
-        print(f"  ✗ Verificação falhou: {str(e)}")
+        if verbose:
+            print(f"  ✗ Verificação falhou: {str(e)}")
         return False
 
 
-if __name__ == "__main__":
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+def read_dataset_head(input_path):
+    """
+    Ler apenas o início do dataset (até SOPInstanceUID) de um arquivo sem preâmbulo.
+
+    Retorna (dataset, transfer_syntax) ou None se o arquivo não pode ser
+    reparado por passagem direta (já é DICOM Part 10 ou tem grupo 0002).
+    """
+    with open(input_path, 'rb') as f:
+        preamble = f.read(132)
+        if preamble[128:132] == b'DICM':
+            return None
+        f.seek(0)
+        ds = read_partial(
+            f,
+            stop_when=lambda tag, vr, length: tag > LAST_HEAD_TAG,
+            force=True,
+        )
+
+    if getattr(ds, 'file_meta', None) or len(ds) == 0:
+        return None
+    if 'SOPClassUID' not in ds or 'SOPInstanceUID' not in ds:
+        return None
+
+    return ds, source_transfer_syntax(ds)
+
+
+def repair_header_raw(input_path, output_path, verify=True, transcode=False):
+    """
+    Reparo por passagem direta: escreve preâmbulo de 128 bytes, 'DICM' e um
+    File Meta novo, e copia os bytes originais do dataset sem reserializar.
+
+    Retorna o modo usado: 'raw' (passagem direta) ou 'completo' (fallback
+    para fix_dicom_file quando o arquivo não é um dataset sem header, ou
+    quando é pedida a transcodificação, que exige reserializar o dataset).
+    """
+    head = None if transcode else read_dataset_head(input_path)
+    if head is None:
+        if not fix_dicom_file(input_path, output_path, verbose=False, transcode=transcode):
+            raise ValueError("arquivo salvo não pôde ser lido sem force=True")
+        return 'completo'
+
+    ds, transfer_syntax = head
+    file_meta = FileMetaDataset()
+    file_meta.TransferSyntaxUID = transfer_syntax
+    file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    file_meta.ImplementationClassUID = generate_uid()
+    file_meta.ImplementationVersionName = "PYDICOM_" + pydicom.__version__
+
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as out:
+        out.write(b'\x00' * 128)
+        out.write(b'DICM')
+        write_file_meta_info(out, file_meta, enforce_standard=True)
+        shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+
+    if verify:
+        pydicom.dcmread(output_path, stop_before_pixels=True)
+    return 'raw'
+
+
+def _repair_worker(job):
+    """Worker do modo em lote: reparar um arquivo e medir tempo/tamanho"""
+    input_path, output_path, transcode = job
+    start_time = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        mode = repair_header_raw(input_path, output_path, transcode=transcode)
+        return {
+            'input': input_path,
+            'output': output_path,
+            'mode': mode,
+            'bytes': os.path.getsize(input_path),
+            'elapsed': time.perf_counter() - start_time,
+            'error': None,
+        }
+    except Exception as e:
+        return {'input': input_path, 'output': output_path, 'mode': None,
+                'bytes': 0, 'elapsed': time.perf_counter() - start_time, 'error': str(e)}
+
+
+def find_files(input_dir, extension='.img'):
+    """Listar arquivos com a extensão indicada na pasta e subpastas"""
+    found = []
+    for root, _, names in os.walk(input_dir):
+        for name in sorted(names):
+            if name.lower().endswith(extension.lower()):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def repair_folder(input_dir, output_dir, extension='.img', workers=None, transcode=False):
+    """Reparar todos os arquivos de uma árvore de pastas em paralelo (estrutura espelhada)"""
+    files = find_files(input_dir, extension)
+    jobs = []
+    for input_path in files:
+        relative = os.path.relpath(input_path, input_dir)
+        output_path = os.path.join(output_dir, os.path.splitext(relative)[0] + '.dcm')
+        jobs.append((input_path, output_path, transcode))
+
+    print(f"\nArquivos encontrados: {len(jobs)}")
+    start_time = time.perf_counter()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_repair_worker, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            status = f"✓ {result['mode']}" if not result['error'] else f"✗ {result['error']}"
+            print(f"  [{done}/{len(jobs)}] {os.path.relpath(result['input'], input_dir)}: {status}")
+
+    elapsed = time.perf_counter() - start_time
+    ok = [r for r in results if not r['error']]
+    total_mb = sum(r['bytes'] for r in ok) / (1024 * 1024)
+
+    print("\n" + "="*80)
+    print(f"Reparados: {len(ok)}/{len(results)} "
+          f"(passagem direta: {sum(1 for r in ok if r['mode'] == 'raw')}, "
+          f"completo: {sum(1 for r in ok if r['mode'] == 'completo')})")
+    if elapsed > 0:
+        print(f"Tempo: {elapsed:.2f} s — {len(ok) / elapsed:.1f} arquivos/s, {total_mb / elapsed:.1f} MB/s")
+    errors = [r for r in results if r['error']]
+    if errors:
+        print(f"Erros: {len(errors)}")
+    print("="*80)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corretor de header DICOM")
+    parser.add_argument('entrada', nargs='?', help="Arquivo (ou pasta com --lote) de entrada")
+    parser.add_argument('saida', nargs='?', help="Arquivo (ou pasta com --lote) de saída")
+    parser.add_argument('--lote', action='store_true',
+                        help="Reparar todos os arquivos da pasta (e subpastas) em paralelo")
+    parser.add_argument('--extensao', default='.img', help="Extensão dos arquivos no modo em lote")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs)")
+    parser.add_argument('--transcodificar', action='store_true',
+                        help="Converter Implicit VR / Big Endian para Explicit VR Little Endian")
+    args = parser.parse_args()
 
     print("="*80)
     print("CORRETOR DE HEADER DICOM")
     print("="*80)
 
-    # Corrigir o arquivo convertido
-    input_file = os.path.join(current_dir, "DCM4_Processed.img")
-    output_file = os.path.join(current_dir, "WL_fixed.dcm")
+    if args.lote:
+        if not args.entrada or not args.saida:
+            parser.error("--lote requer pasta de entrada e pasta de saída")
+        repair_folder(args.entrada, args.saida, args.extensao, args.processos, args.transcodificar)
+        return
+
+    if args.entrada:
+        input_file = args.entrada
+        output_file = args.saida or os.path.splitext(args.entrada)[0] + "_fixed.dcm"
+    else:
+        # Corrigir o arquivo convertido
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        input_file = os.path.join(current_dir, "DCM4_Processed.img")
+        output_file = os.path.join(current_dir, "WL_fixed.dcm")
 
     if os.path.exists(input_file):
-        success = fix_dicom_file(input_file, output_file)
+        success = fix_dicom_file(input_file, output_file, transcode=args.transcodificar)
 
         if success:
             print("\n" + "="*80)
@@ -103,3 +356,7 @@ if __name__ == "__main__":
             print("="*80)
     else:
         print(f"\n✗ Arquivo não encontrado: {input_file}")
+
+
+if __name__ == "__main__":
+    main()
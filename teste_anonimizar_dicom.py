@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da anonimização em lote (anonimizar_dicom.py)
+
+Gera um pequeno estudo sintético e verifica o remapeamento consistente de
+UIDs, as regras do perfil, a cópia bruta dos pixels e a retomada da sessão.
+
+Uso:
+  python teste_anonimizar_dicom.py
+"""
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import ExplicitVRLittleEndian, RTImageStorage, generate_uid
+from contextlib import redirect_stdout
+import tempfile
+import shutil
+import io
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from anonimizar_dicom import (
+    DEFAULT_PROFILE, SESSION_FILE, PROGRESS_FILE, anonymize_file, anonymize_folder,
+    load_profile, load_session,
+)
+
+
+def write_image(path, study_uid, series_uid, referenced_uid=None, seed=0):
+    """Gravar RT Image sintética com dados do paciente e referência opcional"""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = RTImageStorage
+    ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds.SOPClassUID = RTImageStorage
+    ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = study_uid
+    ds.SeriesInstanceUID = series_uid
+    ds.PatientName = "Silva^Maria"
+    ds.PatientID = "123456"
+    ds.PatientBirthDate = "19700101"
+    ds.InstitutionName = "Hospital Teste"
+    ds.GantryAngle = 90
+    if referenced_uid:
+        item = Dataset()
+        item.ReferencedSOPClassUID = RTImageStorage
+        item.ReferencedSOPInstanceUID = referenced_uid
+        ds.ReferencedImageSequence = Sequence([item])
+
+    pixels = np.random.default_rng(seed).integers(0, 65535, size=(16, 24), dtype=np.uint16)
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = pixels.tobytes()
+    ds.is_implicit_VR = False
+    ds.is_little_endian = True
+    ds.save_as(path, write_like_original=False)
+    return ds
+
+
+def teste_remapeamento_uids(folder):
+    """Remapeamento de UIDs consistente entre arquivos e referências, classes preservadas"""
+    study, series = generate_uid(), generate_uid()
+    first = write_image(os.path.join(folder, "a.dcm"), study, series, seed=1)
+    write_image(os.path.join(folder, "b.dcm"), study, series, referenced_uid=first.SOPInstanceUID, seed=2)
+
+    salt = "sal-teste"
+    out = os.path.join(folder, "saida")
+    uids = {}
+    for name in ("a", "b"):
+        original, new = anonymize_file(os.path.join(folder, f"{name}.dcm"),
+                                       os.path.join(out, f"{name}.dcm"), DEFAULT_PROFILE, salt)
+        assert original != new
+        uids[name] = pydicom.dcmread(os.path.join(out, f"{name}.dcm"))
+
+    a, b = uids["a"], uids["b"]
+    assert a.StudyInstanceUID == b.StudyInstanceUID != study
+    assert a.SeriesInstanceUID == b.SeriesInstanceUID != series
+    # A referência em sequência aponta para o novo UID do arquivo referenciado
+    assert b.ReferencedImageSequence[0].ReferencedSOPInstanceUID == a.SOPInstanceUID
+    assert b.ReferencedImageSequence[0].ReferencedSOPClassUID == RTImageStorage
+    assert a.SOPClassUID == RTImageStorage
+    assert a.file_meta.MediaStorageSOPInstanceUID == a.SOPInstanceUID
+
+    # Mesmo sal → mesmos UIDs; outro sal → UIDs diferentes
+    again = os.path.join(out, "a_de_novo.dcm")
+    anonymize_file(os.path.join(folder, "a.dcm"), again, DEFAULT_PROFILE, salt)
+    assert pydicom.dcmread(again).SOPInstanceUID == a.SOPInstanceUID
+    anonymize_file(os.path.join(folder, "a.dcm"), again, DEFAULT_PROFILE, "outro-sal")
+    assert pydicom.dcmread(again).StudyInstanceUID != a.StudyInstanceUID
+
+
+def teste_regras_e_pixels(folder):
+    """Perfil: remove/substitui/hash das tags e pixels copiados byte a byte"""
+    source = os.path.join(folder, "a.dcm")
+    write_image(source, generate_uid(), generate_uid(), seed=3)
+    target = os.path.join(folder, "saida", "a.dcm")
+    anonymize_file(source, target, DEFAULT_PROFILE, "sal")
+
+    original = pydicom.dcmread(source)
+    ds = pydicom.dcmread(target)
+    assert str(ds.PatientName) == "ANONIMO" and ds.InstitutionName == "ANONIMO"
+    assert "PatientBirthDate" not in ds
+    assert ds.PatientID != "123456" and len(ds.PatientID) == 16
+    assert float(ds.GantryAngle) == 90.0
+    assert ds.PixelData == original.PixelData
+    assert np.array_equal(ds.pixel_array, original.pixel_array)
+
+    profile_path = os.path.join(folder, "perfil.json")
+    with open(profile_path, 'w', encoding='utf-8') as f:
+        f.write('{"remove": ["TagQueNaoExiste"]}')
+    try:
+        load_profile(profile_path)
+        raise AssertionError("ValueError esperado")
+    except ValueError as e:
+        assert "TagQueNaoExiste" in str(e)
+
+
+def output_tree(folder):
+    """Arquivos (caminhos relativos) de uma árvore de pastas"""
+    return sorted(os.path.relpath(os.path.join(root, name), folder)
+                  for root, _, names in os.walk(folder) for name in names)
+
+
+def teste_retomada_sessao(folder):
+    """anonymize_folder: retomada pula os concluídos e mantém o sal, guardado fora da saída"""
+    entrada = os.path.join(folder, "entrada")
+    saida = os.path.join(folder, "saida")
+    estado = os.path.join(folder, "estado")
+    os.makedirs(os.path.join(entrada, "sub"))
+    study = generate_uid()
+    write_image(os.path.join(entrada, "a.dcm"), study, generate_uid())
+    write_image(os.path.join(entrada, "sub", "b.dcm"), study, generate_uid())
+
+    with redirect_stdout(io.StringIO()):
+        results = anonymize_folder(entrada, saida, DEFAULT_PROFILE, workers=1, state_dir=estado)
+    assert sorted(r['arquivo'] for r in results if r['status'] == 'ok') == ["a.dcm", os.path.join("sub", "b.dcm")]
+    salt = load_session(estado)['salt']
+    study_a = pydicom.dcmread(os.path.join(saida, "a.dcm")).StudyInstanceUID
+
+    # A saída enviada ao fornecedor não contém o sal nem o log de UIDs
+    assert output_tree(saida) == ["a.dcm", os.path.join("sub", "b.dcm")]
+    assert sorted(os.listdir(estado)) == sorted([SESSION_FILE, PROGRESS_FILE])
+
+    write_image(os.path.join(entrada, "c.dcm"), study, generate_uid())
+    with redirect_stdout(io.StringIO()):
+        results = anonymize_folder(entrada, saida, DEFAULT_PROFILE, workers=1, state_dir=estado)
+    assert [r['arquivo'] for r in results] == ["c.dcm"]
+    assert pydicom.dcmread(os.path.join(saida, "c.dcm")).StudyInstanceUID == study_a
+    assert load_session(estado)['salt'] == salt
+    try:
+        load_session(estado, salt="outro")
+        raise AssertionError("ValueError esperado")
+    except ValueError:
+        pass
+
+
+def teste_estado_fora_da_saida(folder):
+    """Pasta de estado dentro da saída é recusada; estado antigo na saída é movido"""
+    entrada = os.path.join(folder, "entrada")
+    saida = os.path.join(folder, "saida")
+    estado = os.path.join(folder, "estado")
+    os.makedirs(entrada)
+    write_image(os.path.join(entrada, "a.dcm"), generate_uid(), generate_uid())
+    try:
+        anonymize_folder(entrada, saida, DEFAULT_PROFILE, state_dir=os.path.join(saida, "estado"))
+        raise AssertionError("ValueError esperado")
+    except ValueError as e:
+        assert "dentro da pasta de saída" in str(e)
+
+    # Sessão criada por versões anteriores na própria saída
+    load_session(saida, salt="sal-antigo")
+    with redirect_stdout(io.StringIO()):
+        anonymize_folder(entrada, saida, DEFAULT_PROFILE, workers=1, state_dir=estado)
+    assert output_tree(saida) == ["a.dcm"]
+    assert load_session(estado)['salt'] == "sal-antigo"
+
+
+def main():
+    print("="*80)
+    print("TESTES DA ANONIMIZAÇÃO")
+    print("="*80)
+
+    tests = [obj for name, obj in globals().items() if name.startswith('teste_') and callable(obj)]
+    failures = 0
+    for test in tests:
+        folder = tempfile.mkdtemp(prefix="teste_anonimizar_")
+        try:
+            test(folder)
+            print(f"  ✓ {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ {test.__doc__}\n      {type(e).__name__}: {e}")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print("="*80)
+    print(f"{len(tests) - failures}/{len(tests)} testes passaram")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do alinhamento por FFT e da comparação de pixels (comparar_img_vs_tiff.py)
+
+Gera imagens sintéticas (soma de gaussianas) deslocadas de um valor
+conhecido e confere o deslocamento estimado por fft_align, inclusive pelo
+caminho reduzido + refinamento, e o resultado de compare_pixels.
+
+Uso:
+  python teste_comparar_img_vs_tiff.py
+"""
+
+import numpy as np
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from comparar_img_vs_tiff import fft_align, compare_pixels
+
+
+def blobs(shape, spacing=1.0, shift=(0.0, 0.0), blob_sigma=2.0, count=60, seed=0):
+    """
+    Soma de gaussianas amostrada nos centros dos pixels (coordenadas em mm),
+    com a cena deslocada: pixel (y, x) recebe f(y_mm + shift[0], x_mm + shift[1]).
+    """
+    rng = np.random.default_rng(seed)
+    extent = (shape[0] * spacing, shape[1] * spacing)
+    centers = rng.uniform(0, 1, (count, 2)) * extent
+    amplitudes = rng.uniform(500, 2000, count)
+
+    y = (np.arange(shape[0]) + 0.5) * spacing + shift[0]
+    x = (np.arange(shape[1]) + 0.5) * spacing + shift[1]
+    image = np.full(shape, 1000.0)
+    for (cy, cx), amplitude in zip(centers, amplitudes):
+        gy = np.exp(-(y - cy) ** 2 / (2 * blob_sigma ** 2))
+        gx = np.exp(-(x - cx) ** 2 / (2 * blob_sigma ** 2))
+        image += amplitude * np.outer(gy, gx)
+    return image.astype(np.float32)
+
+
+def teste_deslocamento_inteiro():
+    """fft_align: deslocamento inteiro conhecido (correlação direta)"""
+    reference = blobs((256, 256))
+    moving = blobs((256, 256), shift=(7, -12))
+    dy, dx = fft_align(reference, moving)
+    assert abs(dy - 7) < 0.01 and abs(dx + 12) < 0.01, (dy, dx)
+
+
+def teste_deslocamento_subpixel():
+    """fft_align: deslocamento sub-pixel conhecido (refinamento parabólico)"""
+    reference = blobs((256, 256))
+    moving = blobs((256, 256), shift=(3.4, -5.7))
+    dy, dx = fft_align(reference, moving)
+    assert abs(dy - 3.4) < 0.15 and abs(dx + 5.7) < 0.15, (dy, dx)
+
+
+def teste_deslocamento_reduzido_e_refinado():
+    """fft_align: caminho reduzido + janela de refinamento em resolução total"""
+    reference = blobs((512, 640), count=150)
+    moving = blobs((512, 640), shift=(21.3, -14.6), count=150)
+    dy, dx = fft_align(reference, moving, factor=2, refine_size=128)
+    assert abs(dy - 21.3) < 0.15 and abs(dx + 14.6) < 0.15, (dy, dx)
+
+    # Sinal invertido (moving adiantada em relação à reference)
+    dy, dx = fft_align(moving, reference, factor=2, refine_size=128)
+    assert abs(dy + 21.3) < 0.15 and abs(dx - 14.6) < 0.15, (dy, dx)
+
+
+def teste_compare_pixels():
+    """compare_pixels: spacings diferentes, deslocamento em mm e ajuste ganho/offset"""
+    # Mesma cena: A a 0.2 mm/pixel, B a 0.4 mm/pixel, deslocada e com outra escala
+    pixels_a = blobs((512, 512), spacing=0.2, blob_sigma=0.8, count=80)
+    pixels_b = 2 * blobs((256, 256), spacing=0.4, shift=(1.2, -2.0), blob_sigma=0.8, count=80) + 100
+    result = compare_pixels(pixels_a, (0.2, 0.2), pixels_b.astype(np.uint16), (0.4, 0.4))
+
+    assert result['spacing'] == (0.4, 0.4) and result['shape'] == (256, 256), result
+    assert abs(result['shift_mm'][0] - 1.2) < 0.05 and abs(result['shift_mm'][1] + 2.0) < 0.05, result['shift_mm']
+    assert abs(result['shift_px'][0] - 3) < 0.1 and abs(result['shift_px'][1] + 5) < 0.1, result['shift_px']
+    assert result['correlation'] > 0.999, result['correlation']
+    # Ganho/offset levam B às unidades de A (a interpolação bilinear suaviza um pouco os picos)
+    assert abs(result['gain'] - 0.5) < 0.01 and abs(result['offset'] + 50) < 10, (result['gain'], result['offset'])
+    assert result['mean_abs'] < 2, result['mean_abs']
+    assert result['pixels'] == (256 - 3) * (256 - 5)
+
+
+def main():
+    print("="*80)
+    print("TESTES DO ALINHAMENTO POR FFT")
+    print("="*80)
+
+    tests = [obj for name, obj in globals().items() if name.startswith('teste_') and callable(obj)]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ {test.__doc__}\n      {type(e).__name__}: {e}")
+
+    print("="*80)
+    print(f"{len(tests) - failures}/{len(tests)} testes passaram")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do pareamento pasta-vs-pasta (compare_dicom.py)
+
+Gera DICOMs sintéticos em duas pastas e confere o pareamento por nome e por
+SOPInstanceUID, inclusive com UIDs repetidos, e o resumo de compare_folders.
+
+Uso:
+  python teste_compare_dicom.py
+"""
+
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import tempfile
+import shutil
+import json
+import io
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compare_dicom import pair_files, compare_folders
+
+
+def write_header(path, uid, patient="Teste^Pareamento"):
+    """Gravar DICOM mínimo (sem pixels) com o SOPInstanceUID indicado"""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = pydicom.uid.RTImageStorage
+    ds.file_meta.MediaStorageSOPInstanceUID = uid
+    ds.SOPClassUID = ds.file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = uid
+    ds.PatientName = patient
+    ds.is_implicit_VR = False
+    ds.is_little_endian = True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ds.save_as(path, write_like_original=False)
+
+
+def make_folders(folder):
+    """Pastas ref/ e new/ com os mesmos UIDs em nomes diferentes (subpastas inclusas)"""
+    ref = os.path.join(folder, 'ref')
+    new = os.path.join(folder, 'new')
+    uids = [generate_uid() for _ in range(3)]
+    for i, uid in enumerate(uids):
+        write_header(os.path.join(ref, 'g', f'img{i}.dcm'), uid)
+        write_header(os.path.join(new, 'g', f'conv_{2 - i}.dcm'), uid)
+    return ref, new, uids
+
+
+def teste_pareamento_por_nome(folder):
+    """Pareamento por nome: só caminhos relativos iguais formam par"""
+    ref, new, _ = make_folders(folder)
+    write_header(os.path.join(ref, 'g', 'conv_0.dcm'), generate_uid())
+
+    pairs, unpaired_ref, unpaired_new, duplicates = pair_files(ref, new)
+    assert [name for name, _, _ in pairs] == [os.path.join('g', 'conv_0.dcm')], pairs
+    assert len(unpaired_ref) == 3 and len(unpaired_new) == 2
+    assert duplicates == []
+
+
+def teste_pareamento_por_uid(folder):
+    """Pareamento por SOPInstanceUID: nomes diferentes, mesmo UID"""
+    ref, new, uids = make_folders(folder)
+    with ThreadPoolExecutor(2) as executor:
+        pairs, unpaired_ref, unpaired_new, duplicates = pair_files(ref, new, True, executor)
+
+    assert len(pairs) == 3 and not unpaired_ref and not unpaired_new and not duplicates
+    for name, ref_path, new_path in pairs:
+        i = int(name[-5])
+        assert os.path.basename(new_path) == f'conv_{2 - i}.dcm', (name, new_path)
+        assert pydicom.dcmread(new_path).SOPInstanceUID == uids[i]
+
+
+def teste_uid_duplicado(folder):
+    """UID repetido na pasta nova: uma cópia pareia, a outra fica sem par e é reportada"""
+    ref, new, uids = make_folders(folder)
+    write_header(os.path.join(new, 'g', 'copia.dcm'), uids[0])
+
+    with ThreadPoolExecutor(2) as executor:
+        pairs, unpaired_ref, unpaired_new, duplicates = pair_files(ref, new, True, executor)
+
+    assert len(pairs) == 3 and not unpaired_ref
+    assert duplicates == [uids[0]]
+    # Cópia pareada na ordem dos nomes ('conv_2' vem antes de 'copia')
+    paired = {os.path.basename(new_path) for _, _, new_path in pairs}
+    assert 'conv_2.dcm' in paired and 'copia.dcm' not in paired, paired
+    assert unpaired_new == [os.path.join('g', 'copia.dcm')]
+
+
+def teste_resumo_compare_folders(folder):
+    """compare_folders: diferença de tag contada e UID repetido no relatório JSON"""
+    ref, new, uids = make_folders(folder)
+    write_header(os.path.join(new, 'g', 'conv_0.dcm'), uids[2], patient="Outro^Nome")
+    write_header(os.path.join(new, 'g', 'copia.dcm'), uids[1])
+    report = os.path.join(folder, 'relatorio.json')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = compare_folders(ref, new, report, by_uid=True, workers=2)
+
+    assert summary['pairs'] == 3 and summary['files_with_differences'] == 1
+    assert summary['duplicate_uids'] == [uids[1]]
+    assert summary['unpaired_new'] == [os.path.join('g', 'copia.dcm')]
+    with open(report, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert saved['tags']['PatientName']['different'] == 1
+    assert saved['summary']['duplicate_uids'] == [uids[1]]
+
+
+def main():
+    print("="*80)
+    print("TESTES DO PAREAMENTO PASTA-VS-PASTA")
+    print("="*80)
+
+    tests = [obj for name, obj in globals().items() if name.startswith('teste_') and callable(obj)]
+    failures = 0
+    for test in tests:
+        folder = tempfile.mkdtemp(prefix="teste_compare_")
+        try:
+            test(folder)
+            print(f"  ✓ {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ {test.__doc__}\n      {type(e).__name__}: {e}")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print("="*80)
+    print(f"{len(tests) - failures}/{len(tests)} testes passaram")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes das funções do conversor unificado (sem interface gráfica)
+
+Cada teste usa dados sintéticos e verifica um comportamento das funções de
+pixels e de planejamento do conversor em lote.
+
+Uso:
+  python teste_conversor_unificado.py
+"""
+
+import numpy as np
+from PIL import Image
+import pydicom
+import asyncio
+import tempfile
+import json
+import shutil
+import time
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from conversor_dicom_unificado import (
+    stored_pixels, crop_box, bin_pixels, reduce_frame, frame_to_rt_image,
+    FileLock, TemplateRepository, plan_conversion_jobs, integrate_frames,
+    load_manifest, plan_session, MANIFEST_SESSION_DEFAULTS, BatchPipeline, preflight_check,
+)
+
+
+def template_items(angles):
+    """Itens de template com um gantry por item"""
+    return [{'name': f"g{a}", 'gantry': a, 'coll': 0, 'couch': 0} for a in angles]
+
+
+def teste_plan_conversion_jobs_paginas():
+    """plan_conversion_jobs: um item por arquivo ou por página (template e passo angular)"""
+    files = ["a.tif", "b.tif"]
+    pages = {"a.tif": 3, "b.tif": 1}.get
+    items = template_items([0, 90, 180, 270])
+
+    jobs = plan_conversion_jobs(files, items, pages)
+    assert [(j['tiff_file'], j['page'], j['name'], j['gantry']) for j in jobs] == \
+        [("a.tif", None, "g0", 0.0), ("b.tif", None, "g90", 90.0)]
+
+    # Template: cada página consome o próximo item
+    jobs = plan_conversion_jobs(files, items, pages, split_pages=True)
+    assert [(j['tiff_file'], j['page'], j['name'], j['gantry']) for j in jobs] == [
+        ("a.tif", 0, "g0", 0.0), ("a.tif", 1, "g90", 90.0),
+        ("a.tif", 2, "g180", 180.0), ("b.tif", 0, "g270", 270.0)]
+    # Itens acabam antes das páginas: só as páginas com item são convertidas
+    jobs = plan_conversion_jobs(files, items[:2], pages, split_pages=True)
+    assert [(j['tiff_file'], j['page']) for j in jobs] == [("a.tif", 0), ("a.tif", 1)]
+
+    # Passo angular: gantry incrementado por página, módulo 360
+    jobs = plan_conversion_jobs(files, template_items([270, 0]), pages,
+                                split_pages=True, page_angles="Passo angular", page_step=60)
+    assert [(j['page'], j['name'], j['gantry']) for j in jobs] == [
+        (0, "g270_f000", 270.0), (1, "g270_f001", 330.0), (2, "g270_f002", 30.0), (0, "g0", 0.0)]
+
+
+def teste_plan_conversion_jobs_integracao():
+    """plan_conversion_jobs: integração por arquivo e da pasta inteira"""
+    files = ["a.tif", "b.tif", "c.tif"]
+    items = template_items([0, 90])
+    pages = lambda f: 5
+
+    jobs = plan_conversion_jobs(files, items, pages, integration=("sum", "file"), split_pages=True)
+    assert [(j['sources'], j['page'], j['integrate'], j['name']) for j in jobs] == [
+        (["a.tif"], None, "sum", "g0"), (["b.tif"], None, "sum", "g90")]
+
+    jobs = plan_conversion_jobs(files, items, pages, integration=("mean", "folder"))
+    assert len(jobs) == 1
+    assert jobs[0]['sources'] == files and jobs[0]['tiff_file'] == "a.tif"
+    assert (jobs[0]['integrate'], jobs[0]['name'], jobs[0]['gantry']) == ("mean", "g0", 0.0)
+    assert plan_conversion_jobs([], items, pages, integration=("sum", "folder")) == []
+
+
+def teste_stored_pixels_bits_reduzidos():
+    """stored_pixels: uint16 acima de 12/14 bits não estoura perto de 65535"""
+    for bits in (12, 14):
+        max_stored = (1 << bits) - 1
+        original = np.array([[0, 100, 65535, 65530]], dtype=np.uint16)
+        array = original.copy()
+        pixels, slope, intercept = stored_pixels(array, bits)
+
+        assert pixels.dtype == np.uint16
+        assert np.array_equal(array, original), "array de entrada foi modificado"
+        assert int(pixels.max()) <= max_stored, f"{bits} bits: máximo {pixels.max()}"
+        # Pixels saturados continuam os mais claros (antes voltavam a 0)
+        assert pixels[0, 2] >= pixels[0, 3] > pixels[0, 1] > pixels[0, 0], f"{bits} bits: {pixels.tolist()}"
+        assert intercept == 0.0
+        restored = pixels.astype(np.float64) * slope + intercept
+        assert np.all(np.abs(restored - original) <= slope / 2), f"{bits} bits: {pixels.tolist()}"
+
+
+def teste_stored_pixels_soma_e_float():
+    """stored_pixels: soma uint32 exata e float32 reescalado sem alterar a entrada"""
+    soma = np.array([[0, 65535 * 4, 131072]], dtype=np.uint32)
+    pixels, slope, intercept = stored_pixels(soma)
+    assert (slope, intercept) == (4.0, 0.0)
+    assert pixels.tolist() == [[0, 65535, 32768]]
+    assert soma[0, 1] == 65535 * 4, "array de entrada foi modificado"
+
+    valores = np.array([[-1.5, 0.0, 2.5]], dtype=np.float32)
+    entrada = valores.copy()
+    pixels, slope, intercept = stored_pixels(entrada)
+    assert np.array_equal(entrada, valores), "array de entrada foi modificado"
+    assert pixels.tolist() == [[0, 24576, 65535]]
+    assert np.allclose(pixels * slope + intercept, valores, atol=slope)
+
+    uint16 = np.array([[1, 2, 4095]], dtype=np.uint16)
+    pixels, slope, intercept = stored_pixels(uint16, 12)
+    assert pixels is uint16 and (slope, intercept) == (1.0, 0.0)
+
+
+def teste_integrate_frames():
+    """integrate_frames: soma uint32 sem estouro, média arredondada e frames inválidos"""
+    frames = [np.full((2, 3), 65535, dtype=np.uint16), np.full((2, 3), 65535, dtype=np.uint16),
+              np.array([[0, 1, 2], [3, 4, 5]], dtype=np.uint16)]
+
+    total, count = integrate_frames(iter(frames), "sum")
+    assert count == 3 and total.dtype == np.uint32
+    assert total.tolist() == [[131070, 131071, 131072], [131073, 131074, 131075]]
+
+    mean, count = integrate_frames(iter(frames), "mean")
+    assert count == 3 and mean.dtype == np.uint16
+    assert mean.tolist() == [[43690, 43690, 43691], [43691, 43691, 43692]]
+
+    # Média exata mesmo com a soma acima de 2^24 (limite de inteiros exatos em float32)
+    rng = np.random.default_rng(0)
+    cine = [rng.integers(60000, 65536, (32, 32), dtype=np.uint16) for _ in range(400)]
+    mean, count = integrate_frames(iter(cine), "mean")
+    exact = (np.sum(np.array(cine, dtype=np.int64), axis=0) + 200) // 400
+    assert count == 400 and np.array_equal(mean, exact)
+
+    floats = [np.full((2, 2), 0.5, dtype=np.float32), np.full((2, 2), 1.0, dtype=np.float32)]
+    mean, count = integrate_frames(floats, "mean")
+    assert mean.dtype == np.float32 and np.allclose(mean, 0.75)
+
+    for frames, message in (([], "Nenhum frame"),
+                            ([np.zeros((2, 2), np.uint16), np.zeros((2, 3), np.uint16)], "dimensões")):
+        try:
+            integrate_frames(frames)
+            raise AssertionError("ValueError esperado")
+        except ValueError as e:
+            assert message in str(e), e
+
+
+def synthetic_field(shape=(1000, 800), field=(300, 700, 200, 600)):
+    """Frame uint16 com campo retangular claro sobre fundo escuro"""
+    array = np.full(shape, 1000, dtype=np.uint16)
+    array[field[0]:field[1], field[2]:field[3]] = 30000
+    return array
+
+
+def wl_field(size=256, bb=True, snr=100.0, level=30000, background=1000, seed=0, bb_contrast=0.5):
+    """Imagem WL sintética uint16: campo quadrado central, ruído gaussiano e BB opcional"""
+    rng = np.random.default_rng(seed)
+    image = np.full((size, size), float(background))
+    half = size // 8
+    center = size // 2
+    image[center - half:center + half, center - half:center + half] = level
+    if bb:
+        rows, cols = np.ogrid[:size, :size]
+        radius = max(3, size // 40)
+        image[(rows - center) ** 2 + (cols - center) ** 2 <= radius ** 2] = level - bb_contrast * (level - background)
+    image += rng.normal(0, (level - background) / snr, image.shape)
+    return np.clip(np.rint(image), 0, 65535).astype(np.uint16)
+
+
+def teste_preflight_bb():
+    """preflight_check: ruído no limite de SNR não conta como BB; BB fraca é detectada"""
+    for size in (256, 1024):
+        for seed in range(3):
+            result = preflight_check(wl_field(size=size, bb=False, snr=21, seed=seed))
+            assert not result['bb'], f"{size}px: BB falsa com SNR 21"
+            assert result['issues'] == ["BB não detectada no campo"], result['issues']
+
+            result = preflight_check(wl_field(size=size, snr=21, seed=seed, bb_contrast=0.15))
+            assert result['bb'] and result['ok'], (size, result['issues'])
+
+    # Campo escuro sobre fundo claro (imagem invertida)
+    inverted = 65535 - wl_field(size=512, snr=50, bb_contrast=0.15)
+    assert preflight_check(inverted)['bb']
+    assert not preflight_check(65535 - wl_field(size=512, bb=False, snr=50))['bb']
+
+
+def teste_preflight_saturacao():
+    """preflight_check: campo cortado em 4095/16383 (12/14 bits em uint16) é saturado"""
+    for bits in (12, 14):
+        ceiling = (1 << bits) - 1
+        image = wl_field(size=512, snr=50, level=int(ceiling * 1.1), background=100)
+        clipped = np.minimum(image, ceiling)
+        for kwargs in ({}, {'bits_stored': bits}):
+            result = preflight_check(clipped, **kwargs)
+            assert result['saturation'] > 0.5, (bits, kwargs, result['saturation'])
+            assert any("saturação" in issue for issue in result['issues'])
+
+        # Abaixo do teto: o máximo do frame não é confundido com saturação
+        result = preflight_check(wl_field(size=512, snr=50, level=int(ceiling * 0.8), background=100),
+                                 bits_stored=bits)
+        assert result['saturation'] < 0.01 and result['ok'], result['issues']
+
+
+def teste_crop_box():
+    """crop_box: margem em mm, quadrado centrado no campo e múltiplos do binning"""
+    dpi = 254.0   # 10 pixels por mm
+    bounds = (300, 700, 200, 600)
+    assert crop_box((1000, 800), dpi, bounds, margin_mm=5) == (250, 750, 150, 650)
+    assert crop_box((1000, 800), dpi, bounds, crop_mm=20) == (400, 600, 300, 500)
+    # Limitado à imagem e com lados múltiplos do binning
+    r0, r1, c0, c1 = crop_box((1000, 800), dpi, bounds, margin_mm=25, binning=3)
+    assert (r0, c0) == (50, 0) and c1 <= 800
+    assert (r1 - r0) % 3 == 0 and (c1 - c0) % 3 == 0
+
+
+def teste_bin_pixels():
+    """bin_pixels: média 2×2 arredondada no tipo original, sem estourar em uint16"""
+    array = np.array([[65535, 65535, 1, 2],
+                      [65535, 65534, 3, 4],
+                      [9, 9, 0, 0]], dtype=np.uint16)
+    binned = bin_pixels(array, 2)
+    assert binned.dtype == np.uint16
+    assert binned.tolist() == [[65535, 3]]
+
+    floats = np.arange(16, dtype=np.float32).reshape(4, 4)
+    assert bin_pixels(floats, 2).tolist() == [[2.5, 4.5], [10.5, 12.5]]
+
+
+def teste_reduce_frame_tags():
+    """reduce_frame: ImagePlanePixelSpacing e RTImagePosition em mm com e sem recorte"""
+    array = synthetic_field()
+    dpi = 254.0
+    pixel_mm = 25.4 / dpi
+
+    full = frame_to_rt_image(array, 1000, 0, 0, 0, dpi)
+    assert np.allclose([float(v) for v in full.ImagePlanePixelSpacing], [pixel_mm, pixel_mm])
+    expected = [(0.5 - 400) * pixel_mm, (0.5 - 500) * pixel_mm]
+    assert np.allclose([float(v) for v in full.RTImagePosition], expected), full.RTImagePosition
+
+    unchanged, same_dpi, position = reduce_frame(array, dpi)
+    assert unchanged is array and same_dpi == dpi and position is None
+
+    reduced, reduced_dpi, position = reduce_frame(array, dpi, crop=20, binning=2)
+    assert reduced.shape == (100, 100) and reduced_dpi == dpi / 2
+    ds = frame_to_rt_image(reduced, 1000, 0, 0, 0, reduced_dpi, position)
+    assert np.allclose([float(v) for v in ds.ImagePlanePixelSpacing], [2 * pixel_mm] * 2)
+    # Primeiro pixel binado: linha 400 / coluna 300 da original, centro a 1 pixel da borda
+    expected = [(300 + 1 - 400) * pixel_mm, (400 + 1 - 500) * pixel_mm]
+    assert np.allclose([float(v) for v in ds.RTImagePosition], expected), ds.RTImagePosition
+
+    # Com e sem recorte, a borda do recorte cai no mesmo ponto (mm) da imagem inteira
+    edge_full = np.array([float(v) for v in full.RTImagePosition]) + (np.array([300, 400]) - 0.5) * pixel_mm
+    edge_crop = np.array([float(v) for v in ds.RTImagePosition]) - pixel_mm
+    assert np.allclose(edge_full, edge_crop), (edge_full, edge_crop)
+
+
+def teste_template_repository_conflitos():
+    """TemplateRepository: conflito no mesmo template, mescla de templates diferentes"""
+    folder = tempfile.mkdtemp(prefix="teste_templates_")
+    try:
+        path = os.path.join(folder, "templates_wl.json")
+        station_a = TemplateRepository(path)
+        station_b = TemplateRepository(path)
+        # Sem arquivo: o padrão vem da memória e a leitura não cria o arquivo
+        assert "WL Standard 4" in station_a.all()
+        station_b.all()
+        assert os.listdir(folder) == []
+
+        # Templates diferentes: as duas gravações são preservadas
+        assert station_a.save({"A": {"items": []}}) == []
+        assert station_b.save({"B": {"items": []}}) == []
+        assert set(TemplateRepository(path).all()) == {"WL Standard 4", "A", "B"}
+
+        # Mesmo template alterado pelas duas estações: a segunda recebe o conflito
+        assert station_a.save({"WL Standard 4": {"items": [], "description": "A"}}) == []
+        assert station_b.save({"WL Standard 4": {"items": [], "description": "B"}}) == ["WL Standard 4"]
+        assert station_b.all()["WL Standard 4"]["description"] == "A"
+        assert station_b.save({"WL Standard 4": {"items": [], "description": "B"}}, overwrite=True) == []
+        assert TemplateRepository(path).all()["WL Standard 4"]["description"] == "B"
+
+        # Só os templates gravados entram no conflito: remover "B" (inalterado no
+        # disco) funciona mesmo com "WL Standard 4" desatualizado nesta estação
+        assert station_a.save({"B": None}) == []
+        templates = TemplateRepository(path).all()
+        assert "B" not in templates and templates["WL Standard 4"]["description"] == "B"
+        assert sorted(os.listdir(folder)) == ["templates_wl.json"]
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def teste_file_lock_abandonado():
+    """FileLock: lock abandonado é descartado, mas nunca o lock novo de outra estação"""
+    folder = tempfile.mkdtemp(prefix="teste_lock_")
+    try:
+        path = os.path.join(folder, "templates_wl.json")
+        lock_path = path + ".lock"
+        with open(lock_path, 'w', encoding='utf-8') as f:
+            f.write("estacao-travada 1")
+        old = time.time() - 3600
+        os.utime(lock_path, (old, old))
+
+        # A e B veem o mesmo lock abandonado; B o descarta e cria o seu
+        stale_owner = FileLock.read_owner(lock_path)
+        station_a = FileLock(path, timeout=0.3)
+        station_b = FileLock(path)
+        station_b.__enter__()
+        station_a.break_stale(stale_owner)   # A, atrasada, não pode apagar o lock de B
+        assert station_b.held()
+        try:
+            station_a.__enter__()
+            raise AssertionError("duas estações com o lock")
+        except TimeoutError:
+            pass
+        station_b.__exit__(None, None, None)
+
+        with station_a:
+            assert station_a.held()
+        assert os.listdir(folder) == []
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def write_manifest(folder, manifest):
+    """Gravar manifesto JSON na pasta e retornar o caminho"""
+    path = os.path.join(folder, "manifesto.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return path
+
+
+def teste_manifesto_padroes_e_validacao():
+    """load_manifest: valores padrão, caminhos relativos ao manifesto e chaves inválidas"""
+    folder = tempfile.mkdtemp(prefix="teste_manifesto_")
+    try:
+        path = write_manifest(folder, {"templates": "t.json", "sessions": [
+            {"folder": "jan", "template": "WL Standard 4", "output": "saida/jan", "dpi": 300},
+            {"name": "Fev", "folder": "/dados/fev", "template": "WL", "output": "saida/fev",
+             "flatfield": {"dark": "dark.tif", "flood": "flood.tif"}},
+        ]})
+        manifest = load_manifest(path)
+        jan, fev = manifest['sessions']
+        assert manifest['templates'] == os.path.join(folder, "t.json")
+        assert jan['name'] == "01 jan" and fev['name'] == "Fev"
+        assert jan['folder'] == os.path.join(folder, "jan") and fev['folder'] == "/dados/fev"
+        assert jan['output'] == os.path.join(folder, "saida/jan")
+        assert jan['dpi'] == 300 and fev['dpi'] == MANIFEST_SESSION_DEFAULTS['dpi']
+        assert all(jan[key] == value for key, value in MANIFEST_SESSION_DEFAULTS.items() if key != 'dpi')
+        assert fev['flatfield'] == {"dark": os.path.join(folder, "dark.tif"),
+                                    "flood": os.path.join(folder, "flood.tif")}
+
+        invalid = [
+            ({"sessions": []}, "sem sessões"),
+            ({"sessions": [{"folder": "a", "template": "WL"}]}, "faltam as chaves output"),
+            ({"sessions": [{"folder": "a", "template": "WL", "output": "b", "gantry": 90}]},
+             "chaves desconhecidas gantry"),
+            ({"sessions": [{"name": "Mar", "folder": "a", "template": "WL", "output": "b",
+                            "flatfield": {"dark": "dark.tif"}}]},
+             "Sessão Mar: 'flatfield' precisa das chaves dark e flood"),
+            ({"sessions": [{"folder": "a", "template": "WL", "output": "b", "flatfield": "flood.tif"}]},
+             "Sessão 01 a: 'flatfield'"),
+        ]
+        for manifest, message in invalid:
+            try:
+                load_manifest(write_manifest(folder, manifest))
+                raise AssertionError(f"ValueError esperado: {manifest}")
+            except ValueError as e:
+                assert message in str(e), e
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def teste_plan_session():
+    """plan_session: configurações da sessão, regras do template e erros por sessão"""
+    folder = tempfile.mkdtemp(prefix="teste_sessao_")
+    try:
+        os.makedirs(os.path.join(folder, "jan"))
+        for angle in (0, 90):
+            Image.fromarray(synthetic_field((40, 30), (10, 30, 5, 25))).save(
+                os.path.join(folder, "jan", f"g{angle:03d}.tif"))
+        templates = {"WL": {"items": [{"name": f"g{a}", "gantry": a, "coll": 0, "couch": 0}
+                                      for a in (0, 90, 180)],
+                            "orientation": "Girar 180°", "crop_mm": 30}}
+        path = write_manifest(folder, {"sessions": [
+            {"folder": "jan", "template": "WL", "output": "saida", "crop": "template", "sid": 1000},
+            {"folder": "jan", "template": "Outro", "output": "saida"},
+            {"folder": "fev", "template": "WL", "output": "saida"},
+            {"folder": "jan", "template": "WL", "output": "saida", "dpi": 0},
+        ]})
+        sessions = load_manifest(path)['sessions']
+
+        jobs, settings = plan_session(0, sessions[0], templates)
+        assert [(j['tiff_file'], j['name'], j['gantry']) for j in jobs] == \
+            [("g000.tif", "g0", 0.0), ("g090.tif", "g90", 90.0)]
+        assert all(j['session'] == 0 and j['settings'] is settings for j in jobs)
+        assert jobs[0]['label'] == "01 jan: g0"
+        assert settings['crop'] == 30.0 and settings['orientation'] == "Girar 180°"
+        assert (settings['sid'], settings['dpi']) == (1000.0, 400.0)
+        assert settings['output_folder'] == os.path.join(folder, "saida")
+
+        for session, message in zip(sessions[1:], ("não encontrado", "pasta não encontrada", "maiores que 0")):
+            try:
+                plan_session(1, session, templates)
+                raise AssertionError(f"ValueError esperado: {session['name']}")
+            except ValueError as e:
+                assert message in str(e), e
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def teste_batch_pipeline():
+    """BatchPipeline.run: arquivos gravados, reprovados na verificação prévia e blocos devolvidos"""
+    folder = tempfile.mkdtemp(prefix="teste_pipeline_")
+    try:
+        input_folder = os.path.join(folder, "tiff")
+        output_folder = os.path.join(folder, "dicom")
+        os.makedirs(input_folder)
+        os.makedirs(output_folder)
+        for angle in (0, 90, 180):
+            Image.fromarray(wl_field(seed=angle)).save(os.path.join(input_folder, f"g{angle:03d}.tif"))
+        blank = np.random.default_rng(9).normal(1000, 5, (256, 256)).astype(np.uint16)
+        Image.fromarray(blank).save(os.path.join(input_folder, "g270.tif"))
+
+        files = sorted(os.listdir(input_folder))
+        jobs = plan_conversion_jobs(files, template_items([0, 90, 180, 270]), lambda f: 1)
+        settings = {
+            'sid': 1000.0, 'dpi': 254.0, 'input_folder': input_folder, 'output_folder': output_folder,
+            'preflight': True, 'crop': None, 'binning': 2, 'calibration': None, 'bits_stored': 16,
+            'orientation': "Original",
+        }
+        shm_before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        pipeline = BatchPipeline(jobs, settings, workers=2, depth=1)
+        results = asyncio.run(pipeline.run())
+
+        assert [r['index'] for r in results] == [0, 1, 2, 3]
+        for result in results[:3]:
+            assert result['error'] is None, result['error']
+            ds = pydicom.dcmread(result['output'])
+            assert (ds.Rows, ds.Columns) == (128, 128)
+            assert result['stats']['bb_offset'] is not None
+        assert "verificação prévia" in results[3]['error']
+        assert sorted(os.listdir(output_folder)) == ["g0.dcm", "g180.dcm", "g90.dcm"]
+
+        # Todos os blocos voltaram ao pool e nenhum segmento ficou em /dev/shm
+        for pool in (pipeline.input_pool, pipeline.output_pool):
+            assert pool.free.qsize() == 3 and pool.blocks == []
+        if os.path.isdir("/dev/shm"):
+            assert set(os.listdir("/dev/shm")) <= shm_before
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main():
+    print("="*80)
+    print("TESTES DO CONVERSOR UNIFICADO")
+    print("="*80)
+
+    tests = [obj for name, obj in globals().items() if name.startswith('teste_') and callable(obj)]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ {test.__doc__}\n      {type(e).__name__}: {e}")
+
+    print("="*80)
+    print(f"{len(tests) - failures}/{len(tests)} testes passaram")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
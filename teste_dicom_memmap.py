@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do leitor memmap (dicom_memmap.py) contra ds.pixel_array do pydicom
+
+Gera DICOMs sintéticos em cada Transfer Syntax não comprimida e confere
+que o memmap tem os mesmos pixels, forma e tipo que o pydicom.
+
+Uso:
+  python teste_dicom_memmap.py
+"""
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import (
+    ImplicitVRLittleEndian,
+    ExplicitVRLittleEndian,
+    ExplicitVRBigEndian,
+    RLELossless,
+    generate_uid,
+)
+from pydicom.encaps import encapsulate
+import tempfile
+import shutil
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dicom_memmap import open_dicom_memmap, open_raw_memmap, roi_statistics
+
+
+def write_dicom(path, pixels, syntax, frames=1):
+    """Gravar DICOM mínimo com os pixels (Rows × Columns, ou frames × Rows × Columns)"""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = syntax
+    ds.file_meta.MediaStorageSOPClassUID = pydicom.uid.RTImageStorage
+    ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds.SOPClassUID = ds.file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+    ds.PatientName = "Teste^Memmap"
+    ds.Rows, ds.Columns = pixels.shape[-2:]
+    if frames > 1:
+        ds.NumberOfFrames = frames
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = pixels.dtype.itemsize * 8
+    ds.BitsStored = ds.BitsAllocated
+    ds.HighBit = ds.BitsAllocated - 1
+    ds.PixelRepresentation = 1 if pixels.dtype.kind == 'i' else 0
+    ds.is_implicit_VR = syntax == ImplicitVRLittleEndian
+    ds.is_little_endian = syntax != ExplicitVRBigEndian
+    endian = '<' if ds.is_little_endian else '>'
+    ds.PixelData = pixels.astype(pixels.dtype.newbyteorder(endian)).tobytes()
+    ds.save_as(path, write_like_original=False)
+
+
+def check_against_pydicom(path):
+    """Memmap e pixel_array devem ter o mesmo conteúdo, forma e valor numérico"""
+    mapped, header = open_dicom_memmap(path)
+    try:
+        expected = pydicom.dcmread(path).pixel_array
+        assert mapped.shape == expected.shape, (mapped.shape, expected.shape)
+        assert mapped.dtype.kind == expected.dtype.kind and mapped.dtype.itemsize == expected.dtype.itemsize
+        assert np.array_equal(np.asarray(mapped), expected)
+        assert 'PixelData' not in header, "header não deve carregar os pixels"
+    finally:
+        mapped._mmap.close()
+    return expected
+
+
+def teste_transfer_syntaxes(folder):
+    """open_dicom_memmap: Implicit/Explicit Little Endian e Explicit Big Endian"""
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 65535, size=(37, 53), dtype=np.uint16)
+    for syntax in (ImplicitVRLittleEndian, ExplicitVRLittleEndian, ExplicitVRBigEndian):
+        path = os.path.join(folder, f"{syntax.name}.dcm".replace(' ', '_'))
+        write_dicom(path, pixels, syntax)
+        expected = check_against_pydicom(path)
+        assert np.array_equal(expected, pixels), syntax.name
+
+
+def teste_com_sinal_e_multiframe(folder):
+    """open_dicom_memmap: pixels com sinal (int16) e NumberOfFrames > 1"""
+    signed = np.arange(-600, 600, dtype=np.int16).reshape(30, 40)
+    path = os.path.join(folder, "signed.dcm")
+    write_dicom(path, signed, ExplicitVRLittleEndian)
+    check_against_pydicom(path)
+
+    frames = np.arange(3 * 8 * 6, dtype=np.uint16).reshape(3, 8, 6)
+    path = os.path.join(folder, "multiframe.dcm")
+    write_dicom(path, frames, ExplicitVRLittleEndian, frames=3)
+    assert check_against_pydicom(path).shape == (3, 8, 6)
+
+
+def teste_rejeita_sem_memmap(folder):
+    """open_dicom_memmap: ValueError para Transfer Syntax comprimida e arquivo sem pixels"""
+    path = os.path.join(folder, "rle.dcm")
+    write_dicom(path, np.zeros((4, 4), np.uint16), ExplicitVRLittleEndian)
+    ds = pydicom.dcmread(path)
+    header_only = os.path.join(folder, "sem_pixels.dcm")
+    del ds.PixelData
+    ds.save_as(header_only)
+
+    ds.file_meta.TransferSyntaxUID = RLELossless
+    ds.PixelData = encapsulate([b"\0" * 32])
+    ds['PixelData'].VR = 'OB'
+    ds.save_as(path)
+
+    for target, message in ((path, "comprimida"), (header_only, "sem dados de pixel")):
+        try:
+            open_dicom_memmap(target)
+            raise AssertionError("ValueError esperado")
+        except ValueError as e:
+            assert message in str(e), e
+
+
+def teste_raw_e_estatisticas(folder):
+    """open_raw_memmap e roi_statistics por blocos iguais ao NumPy no frame inteiro"""
+    rng = np.random.default_rng(2)
+    pixels = rng.integers(0, 4096, size=(300, 200), dtype=np.uint16)
+    path = os.path.join(folder, "frame.raw")
+    with open(path, 'wb') as f:
+        f.write(b"\0" * 64)
+        f.write(pixels.astype('<u2').tobytes())
+
+    mapped = open_raw_memmap(path, 300, 200, offset=64)
+    assert np.array_equal(mapped, pixels)
+    stats = roi_statistics(mapped, chunk_rows=7)
+    assert stats['count'] == pixels.size
+    assert (stats['min'], stats['max']) == (pixels.min(), pixels.max())
+    assert np.isclose(stats['mean'], pixels.mean()) and np.isclose(stats['std'], pixels.std())
+
+    roi = roi_statistics(mapped, roi=(10, 20, 50, 30))
+    assert np.isclose(roi['mean'], pixels[10:60, 20:50].mean()) and roi['count'] == 1500
+    del mapped
+
+
+def main():
+    print("="*80)
+    print("TESTES DO LEITOR MEMMAP")
+    print("="*80)
+
+    tests = [obj for name, obj in globals().items() if name.startswith('teste_') and callable(obj)]
+    failures = 0
+    for test in tests:
+        folder = tempfile.mkdtemp(prefix="teste_memmap_")
+        try:
+            test(folder)
+            print(f"  ✓ {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ {test.__doc__}\n      {type(e).__name__}: {e}")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print("="*80)
+    print(f"{len(tests) - failures}/{len(tests)} testes passaram")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do reparo de header e da transcodificação (fix_dicom_header.py)
+
+Gera DICOMs sintéticos (com e sem File Meta, em Implicit VR LE e Explicit
+VR Big Endian) e confere que o reparo e a transcodificação para Explicit VR
+Little Endian preservam os pixels e as tags numéricas.
+
+Uso:
+  python teste_fix_dicom_header.py
+"""
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import (
+    ImplicitVRLittleEndian,
+    ExplicitVRLittleEndian,
+    ExplicitVRBigEndian,
+    generate_uid,
+)
+import tempfile
+import shutil
+import os
+import sys
+
+# Configurar codificação UTF-8
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fix_dicom_header import transcode_to_explicit_le, repair_header_raw
+
+
+def make_dataset(pixels, syntax):
+    """Dataset mínimo de RT Image com os pixels uint16 na codificação indicada"""
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = syntax
+    ds.file_meta.MediaStorageSOPClassUID = pydicom.uid.RTImageStorage
+    ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds.SOPClassUID = ds.file_meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID
+    ds.PatientName = "Teste^Header"
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.RTImageSID = 1500.0
+    ds.is_implicit_VR = syntax == ImplicitVRLittleEndian
+    ds.is_little_endian = syntax != ExplicitVRBigEndian
+    endian = '<' if ds.is_little_endian else '>'
+    ds.PixelData = pixels.astype(pixels.dtype.newbyteorder(endian)).tobytes()
+    return ds
+
+
+def write_dicom(path, pixels, syntax):
+    """Gravar DICOM Part 10 (preâmbulo + File Meta)"""
+    make_dataset(pixels, syntax).save_as(path, write_like_original=False)
+
+
+def write_headerless(path, pixels, syntax):
+    """Gravar apenas o dataset, sem preâmbulo nem File Meta (como os arquivos a reparar)"""
+    ds = make_dataset(pixels, syntax)
+    del ds.file_meta
+    ds.preamble = None
+    ds.save_as(path, write_like_original=True)
+    with open(path, 'rb') as f:
+        assert f.read(132)[128:132] != b'DICM'
+
+
+def check_output(path, pixels, syntax):
+    """Arquivo lido sem force, com a Transfer Syntax, pixels e tags esperados"""
+    ds = pydicom.dcmread(path)
+    assert ds.file_meta.TransferSyntaxUID == syntax, ds.file_meta.TransferSyntaxUID
+    assert ds.file_meta.MediaStorageSOPInstanceUID == ds.SOPInstanceUID
+    assert (ds.Rows, ds.Columns) == pixels.shape and float(ds.RTImageSID) == 1500.0
+    assert np.array_equal(ds.pixel_array, pixels)
+
+
+def sample_pixels():
+    """Pixels com bytes alto e baixo diferentes (troca de ordem de bytes visível)"""
+    rng = np.random.default_rng(3)
+    return rng.integers(0, 65535, size=(29, 41), dtype=np.uint16)
+
+
+def teste_transcode_big_endian(folder):
+    """transcode_to_explicit_le: Explicit VR Big Endian → LE preserva os pixels"""
+    pixels = sample_pixels()
+    source_path = os.path.join(folder, 'be.dcm')
+    output_path = os.path.join(folder, 'le.dcm')
+    write_dicom(source_path, pixels, ExplicitVRBigEndian)
+
+    ds = pydicom.dcmread(source_path)
+    assert transcode_to_explicit_le(ds) == ExplicitVRBigEndian
+    ds.save_as(output_path, write_like_original=False)
+
+    check_output(output_path, pixels, ExplicitVRLittleEndian)
+    with open(output_path, 'rb') as f:
+        assert pixels.astype('<u2').tobytes() in f.read(), "Pixel Data deve estar em Little Endian no arquivo"
+
+
+def teste_transcode_implicit(folder):
+    """transcode_to_explicit_le: Implicit VR LE → Explicit VR LE preserva os pixels"""
+    pixels = sample_pixels()
+    source_path = os.path.join(folder, 'implicit.dcm')
+    output_path = os.path.join(folder, 'explicit.dcm')
+    write_dicom(source_path, pixels, ImplicitVRLittleEndian)
+
+    ds = pydicom.dcmread(source_path)
+    assert transcode_to_explicit_le(ds) == ImplicitVRLittleEndian
+    ds.save_as(output_path, write_like_original=False)
+    check_output(output_path, pixels, ExplicitVRLittleEndian)
+
+
+def teste_transcode_comprimido_rejeitado(folder):
+    """transcode_to_explicit_le: Transfer Syntax comprimida gera ValueError"""
+    ds = make_dataset(sample_pixels(), ExplicitVRLittleEndian)
+    ds.file_meta.TransferSyntaxUID = pydicom.uid.RLELossless
+    try:
+        transcode_to_explicit_le(ds)
+    except ValueError:
+        return
+    raise AssertionError("transcodificação de sintaxe comprimida deveria falhar")
+
+
+def teste_reparo_raw(folder):
+    """repair_header_raw: dataset sem header recebe File Meta e mantém os bytes originais"""
+    pixels = sample_pixels()
+    for syntax in (ImplicitVRLittleEndian, ExplicitVRLittleEndian, ExplicitVRBigEndian):
+        source_path = os.path.join(folder, 'raw.img')
+        output_path = os.path.join(folder, 'raw.dcm')
+        write_headerless(source_path, pixels, syntax)
+
+        assert repair_header_raw(source_path, output_path) == 'raw', syntax.name
+        check_output(output_path, pixels, syntax)
+        with open(source_path, 'rb') as f:
+            original = f.read()
+        with open(output_path, 'rb') as f:
+            assert f.read().endswith(original), "dataset deve ser copiado sem reserializar"
+
+
+def teste_reparo_transcodificado(folder):
+    """repair_header_raw(transcode=True): Big Endian sem header → Explicit VR LE"""
+    pixels = sample_pixels()
+    source_path = os.path.join(folder, 'be.img')
+    output_path = os.path.join(folder, 'le.dcm')
+    write_headerless(source_path, pixels, ExplicitVRBigEndian)
+
+    assert repair_header_raw(source_path, output_path, transcode=True) == 'completo'
+    check_output(output_path, pixels, ExplicitVRLittleEndian)
+
+
+def teste_reparo_part10_existente(folder):
+    """repair_header_raw: arquivo já Part 10 usa o caminho completo"""
+    pixels = sample_pixels()
+    source_path = os.path.join(folder, 'ok.dcm')
+    output_path = os.path.join(folder, 'ok_reparado.dcm')
+    write_dicom(source_path, pixels, ExplicitVRLittleEndian)
+
+    assert repair_header_raw(source_path, output_path) == 'completo'
+    check_output(output_path, pixels, ExplicitVRLittleEndian)
+
+
+def main():
+    print("="*80)
+    print("TESTES DO REPARO DE HEADER E TRANSCODIFICAÇÃO")
+    print("="*80)
+
+    tests = [obj for name, obj in globals().items() if name.startswith('teste_') and callable(obj)]
+    failures = 0
+    for test in tests:
+        folder = tempfile.mkdtemp(prefix="teste_header_")
+        try:
+            test(folder)
+            print(f"  ✓ {test.__doc__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ {test.__doc__}\n      {type(e).__name__}: {e}")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print("="*80)
+    print(f"{len(tests) - failures}/{len(tests)} testes passaram")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())